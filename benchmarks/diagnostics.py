@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""diagnostics.py
+
+On: October 2026
+
+Measures how long it takes to convert the syntax errors in an error-heavy
+document to Diagnostics:
+  * searching each error's line with a freshly built regular expression, the
+    way the server used to,
+  * looking the error up in spans scanned from its line (validate_syntax),
+  * looking the error up in the document's span map (the server).
+Every other line of the generated document refers to a macro that was never
+defined, by a different name each time so that no pattern is ever reused.
+
+Usage:
+
+python benchmarks/diagnostics.py [--lines <number of lines>] [--runs <number of runs>]
+
+"""
+import argparse
+import re
+import statistics
+import time
+from typing import Callable, List
+
+from MEDFORD.medford_detail import detail
+from MEDFORD.medford_error_mngr import error_mngr, mfd_syntax_err
+
+from mfdls.medford_syntax import syntax_errors_to_diagnostics
+from mfdls.span_map import SpanMap
+
+
+def generate(lines: int) -> List[str]:
+    """Generates a document where every other line has an undefined macro
+    Parameters: The number of lines
+       Returns: The document, split into lines
+       Effects: None
+    """
+    source = ["@MEDFORD Benchmark", "`@Lab Tufts BCB"]
+    for i in range(lines // 2):
+        source.append("@Keyword `@Lab")
+        source.append(f"@Keyword `@Missing{i} and more")
+    return source
+
+
+def collect_errors(source: List[str]) -> List[mfd_syntax_err]:
+    """Tokenizes a document, collecting its syntax errors"""
+    detail.macro_dictionary = {}
+    err_mngr = error_mngr("ALL", "LINE")
+    detail_ret = None
+    for line_num, line in enumerate(source):
+        if line.strip() != "":
+            detail_ret = detail.FromLine(line, line_num + 1, detail_ret, err_mngr)
+    return [err for row in err_mngr.return_syntax_errors().values() for err in row]
+
+
+def fresh_regex(errors: List[mfd_syntax_err], source: List[str]) -> None:
+    """Finds each undefined macro the way the server used to"""
+    for error in errors:
+        macro = error.substr
+        re.search(
+            f"(?:(?<=`@){macro}|(?<=`@{{){macro}(?=}}))", source[error.lineno - 1]
+        )
+
+
+def best_of(function: Callable[[], object], runs: int) -> float:
+    """Times a function
+    Parameters: The function and the number of times to run it
+       Returns: The median time, in seconds
+       Effects: Runs the function
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main() -> None:
+    """The Driver"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--lines", type=int, default=10000, help="Document length")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per measurement")
+    args = parser.parse_args()
+
+    source = generate(args.lines)
+    errors = collect_errors(source)
+    spans = SpanMap()
+    spans.update(source)
+
+    regex = best_of(lambda: fresh_regex(errors, source), args.runs)
+    scanned = best_of(
+        lambda: syntax_errors_to_diagnostics(errors, source, "file:///a.mfd"),
+        args.runs,
+    )
+    mapped = best_of(
+        lambda: syntax_errors_to_diagnostics(errors, source, "file:///a.mfd", spans),
+        args.runs,
+    )
+
+    print(f"{len(errors)} errors in {len(source)} lines")
+    print(f"  fresh regex, ranges only: {regex * 1000:8.1f} ms")
+    print(f"  scanned spans:            {scanned * 1000:8.1f} ms")
+    print(f"  span map:                 {mapped * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""generate.py
+
+On: October 2026
+
+Generates MEDFORD documents for the benchmarks. A document is a run of blocks,
+each a major token followed by some of its minor tokens, built from the token
+dictionary that the server uses for completion. Values refer to macros defined
+at the top of the document and spill onto continuation lines, in the
+proportions asked for. A share of the lines can be made to
+contain errors: references to macros that are never defined, macros defined
+twice, and dates that aren't dates.
+
+The same arguments always generate the same document.
+
+Usage:
+
+python benchmarks/generate.py [--lines <number of lines>] [--macros <number of macros>]
+                              [--continuation <rate>] [--errors <rate>] [--seed <seed>]
+
+"""
+import argparse
+import random
+from typing import Dict, List
+
+from mfdls.token_cache import load_available_tokens
+
+_WORDS = (
+    "coral reef sample collected from the northern transect at low tide "
+    "sequenced with paired end reads assembled and annotated by the lab"
+).split()
+
+# Values the models check, by minor token. Everything else takes free text.
+_VALUES = {
+    "Version": "1.0",
+    "ORCID": "0000000218250097",
+    "PMID": "35012345",
+    "Volume": "12",
+    "Issue": "3",
+    "ID": "1934567",
+    "Link": "https://example.org/record",
+    "URI": "https://example.org/data",
+    "DOI": "2022-06-01",
+    "Path": "data/reads.fastq",
+    "Destination": "archive/reads.fastq",
+    "Filename": "reads.fastq",
+}
+_DATE = ("Date", "")
+_DATES = {_DATE: "2022-06-01"}
+
+# Minor tokens the models require, which every block of their major token gets
+_REQUIRED = {
+    "Paper_Ref": ("URI", "Filename"),
+    "Journal": ("Volume", "Issue"),
+    "Date": ("Note",),
+    "Species": ("Loc", "ReefCollection", "Cultured", "CultureCollection"),
+    "Method": ("Type",),
+    "Software_Ref": ("URI", "Filename", "Type"),
+    "Software_Copy": ("Path", "Type"),
+    "Software_Primary": ("Path", "Type"),
+    "Data_Ref": ("URI", "Filename"),
+    "Data_Copy": ("Path",),
+    "Data_Primary": ("Path",),
+    "File": ("Path",),
+}
+
+# Minor tokens the parser rejects, or only takes instead of a required one
+_AVOIDED = {"File": ("Destination", "URI")}
+
+
+def generate(
+    tokens: Dict[str, List[str]],
+    lines: int,
+    macros: int = 10,
+    continuation: float = 0.1,
+    errors: float = 0.0,
+    seed: int = 0,
+) -> str:
+    """Generates a MEDFORD document
+    Parameters: The token dictionary, the number of lines to generate, the
+                number of macros to define, the share of values that continue
+                onto another line, the share of lines with an error, and the
+                seed for the random choices
+       Returns: The document. It ends at the end of a block, so it can run a
+                few lines past the number asked for.
+       Effects: None
+    """
+    rng = random.Random(seed)
+    majors = [major for major in tokens if major != "MEDFORD"]
+
+    # Comments only go at the top, the parser mixes up the blocks around them
+    out = ["@MEDFORD Benchmark", "@MEDFORD-Version 1.0"]
+    out.extend(f"# {_text(rng, 6)}" for _ in range(3))
+    names = [f"Macro{i}" for i in range(macros)]
+    for name in names:
+        out.append(f"`@{name} {_text(rng, 3)}")
+
+    while len(out) < lines:
+        major = rng.choice(majors)
+        always = [minor for minor in tokens[major] if minor in _REQUIRED.get(major, ())]
+        others = [
+            minor
+            for minor in tokens[major]
+            if minor not in always and minor not in _AVOIDED.get(major, ())
+        ]
+        minors = always + rng.sample(others, rng.randint(0, len(others)))
+
+        for minor in [""] + minors:
+            token = f"@{major}-{minor}" if minor else f"@{major}"
+            # Only free text can take macros and continuation lines
+            value = _DATES.get((major, minor)) or _VALUES.get(minor)
+            free = value is None
+            if value is None:
+                value = _text(rng, rng.randint(2, 8))
+                if names and rng.random() < 0.2:
+                    value += f" `@{rng.choice(names)}"
+
+            if rng.random() < errors:
+                (token, value) = _error(
+                    rng, token, value, (major, minor), len(out), bool(names)
+                )
+                free = False
+
+            out.append(f"{token} {value}")
+
+            if free and rng.random() < continuation:
+                out.append(f"    {_text(rng, rng.randint(3, 10))}")
+
+    return "\n".join(out) + "\n"
+
+
+def _text(rng: random.Random, words: int) -> str:
+    """Some words of free text"""
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def _error(
+    rng: random.Random,
+    token: str,
+    value: str,
+    field: tuple,
+    line: int,
+    has_macros: bool,
+) -> tuple:
+    """Breaks a line
+    Parameters: The random number generator, the line's token, value and field,
+                the line number, for unique macro names, and whether the
+                document defines macros that could be defined again
+       Returns: The broken line's token and value
+       Effects: None
+    """
+    if field == _DATE:
+        return (token, "sometime last summer")
+    if not has_macros or rng.random() < 0.5:
+        return (token, value + f" `@Undefined{line}")
+    return ("`@Macro0", value)
+
+
+def main() -> None:
+    """The Driver"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--lines", type=int, default=1000, help="Document length")
+    parser.add_argument("--macros", type=int, default=10, help="Macros defined")
+    parser.add_argument(
+        "--continuation", type=float, default=0.1, help="Share of continued values"
+    )
+    parser.add_argument(
+        "--errors", type=float, default=0.0, help="Share of lines with errors"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    print(
+        generate(
+            load_available_tokens(),
+            args.lines,
+            args.macros,
+            args.continuation,
+            args.errors,
+            args.seed,
+        ),
+        end="",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""memory.py
+
+On: October 2026
+
+Measures how much memory a tokenized document takes up, in bytes per line of
+generated documents (see generate.py):
+  * the document itself,
+  * the tokenization as detail objects, the way the parser builds them,
+  * the same tokenization compacted (see compact_details.py),
+  * everything the incremental tokenizer keeps between versions,
+  * the details pickled, as they are sent to the validation workers,
+  * the most memory validate_syntax has allocated at once while running.
+Memory is measured with tracemalloc, as what is still allocated once the
+structure is built, so it includes the objects' own overhead.
+
+Usage:
+
+python benchmarks/memory.py [--sizes <lines> ...] [--macros <number of macros>]
+
+"""
+import argparse
+import gc
+import pickle
+import sys
+import tracemalloc
+from typing import Callable, Dict, List, Tuple, TypeVar
+
+from pygls.workspace import Document
+
+from generate import generate
+from mfdls.compact_details import CompactDetails
+from mfdls.medford_incremental import IncrementalTokenizer
+from mfdls.medford_syntax import validate_syntax
+from mfdls.token_cache import load_available_tokens
+
+_URI = "file:///benchmark.mfd"
+
+T = TypeVar("T")
+
+
+def retained(function: Callable[[], T]) -> Tuple[T, int]:
+    """Measures the memory a function leaves allocated
+    Parameters: The function
+       Returns: What it returned, and the bytes still allocated once it has
+       Effects: Runs the function
+    """
+    (result, size, _) = traced(function)
+    return (result, size)
+
+
+def traced(function: Callable[[], T]) -> Tuple[T, int, int]:
+    """Measures the memory a function allocates
+    Parameters: The function
+       Returns: What it returned, the bytes still allocated once it has, and
+                the most bytes it had allocated at once
+       Effects: Runs the function
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = function()
+        gc.collect()
+        (size, peak) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (result, size, peak)
+
+
+def measure(source: str) -> Dict[str, float]:
+    """Measures the memory taken up by a document's tokenization
+    Parameters: The document
+       Returns: The bytes per line of each of the structures
+       Effects: None
+    """
+    lines = source.splitlines()
+    doc = Document(_URI, source)
+
+    # Once to fill the parser's caches, so that they aren't counted
+    validate_syntax(doc)
+
+    (objects, objects_size, validation_peak) = traced(lambda: validate_syntax(doc)[0])
+    (compact, compact_size) = retained(
+        lambda: CompactDetails.from_details(source, lines, objects)
+    )
+
+    def tokenize() -> IncrementalTokenizer:
+        tokenizer = IncrementalTokenizer()
+        tokenizer.update(source.splitlines(), source)
+        return tokenizer
+
+    (_, tokenizer_size) = retained(tokenize)
+
+    sizes = {
+        "document": sys.getsizeof(source),
+        "detail objects": objects_size,
+        "compact details": compact_size,
+        "tokenizer": tokenizer_size,
+        "pickled objects": len(pickle.dumps(objects)),
+        "pickled compact": len(pickle.dumps(compact)),
+        "validation peak": validation_peak,
+    }
+    return {name: size / len(lines) for (name, size) in sizes.items()}
+
+
+def main() -> None:
+    """Measures the documents and prints a table of the results"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="Document lengths",
+    )
+    parser.add_argument(
+        "--macros", type=int, default=10, help="Macros defined by each document"
+    )
+    args = parser.parse_args()
+
+    tokens = load_available_tokens()
+    results: List[Tuple[int, Dict[str, float]]] = [
+        (size, measure(generate(tokens, size, macros=args.macros)))
+        for size in args.sizes
+    ]
+
+    names = list(results[0][1])
+    width = max(map(len, names))
+    print(
+        f"{'bytes per line':<{width}}" + "".join(f"{size:>10}" for (size, _) in results)
+    )
+    for name in names:
+        print(
+            f"{name:<{width}}"
+            + "".join(f"{sizes[name]:>10.1f}" for (_, sizes) in results)
+        )
+
+
+if __name__ == "__main__":
+    main()
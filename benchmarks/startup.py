@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""startup.py
+
+On: October 2026
+
+Measures how long the server takes to start:
+  * how long it takes to answer the initialize request, with the parser loaded
+    lazily (as the server does) and eagerly (as it used to),
+  * what importing the server costs, summarized from python -X importtime,
+  * how long it takes to get the token dictionary, extracting it from the
+    parser's schema and loading it from the on-disk cache.
+Each measurement runs in a fresh interpreter, since most of the cost is in
+importing modules.
+
+Usage:
+
+python benchmarks/startup.py [--runs <number of runs>] [--top <number of packages>]
+
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+_ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that the server should not need to answer initialize
+_HEAVY = ("pydantic", "MEDFORD.medford_models", "MEDFORD.medford")
+
+# Each snippet prints how long the interesting part took, in seconds. The server
+# has pygls (and with it most of the standard library) loaded by the time it
+# needs the tokens, so that is loaded before the clock starts.
+_EXTRACT = """
+import time
+import pygls.server
+start = time.perf_counter()
+from mfdls.medford_tokens import get_available_tokens
+get_available_tokens()
+print(time.perf_counter() - start)
+"""
+
+_FILL = """
+from mfdls.token_cache import load_available_tokens
+load_available_tokens()
+print(0)
+"""
+
+_CACHED = """
+import sys, time
+import pygls.server
+start = time.perf_counter()
+from mfdls.token_cache import load_available_tokens
+load_available_tokens()
+print(time.perf_counter() - start)
+assert "pydantic" not in sys.modules
+"""
+
+# The server, and the server with everything imported up front
+_LAZY = ["-m", "mfdls", "--workers", "0"]
+_EAGER = [
+    "-c",
+    "import runpy, sys;"
+    "from mfdls.medford_validation import load_parser;"
+    "from mfdls.token_cache import load_available_tokens;"
+    "load_parser();"
+    "load_available_tokens();"
+    "sys.argv = ['mfdls', '--workers', '0'];"
+    "runpy.run_module('mfdls', run_name='__main__')",
+]
+
+_INITIALIZE = {
+    "jsonrpc": "2.0",
+    "id": 1,
+    "method": "initialize",
+    "params": {"processId": None, "rootUri": None, "capabilities": {}},
+}
+
+
+def time_snippet(snippet: str, env: dict, runs: int) -> float:
+    """Runs a snippet in fresh interpreters
+    Parameters: The snippet, the environment to run it in and the number of runs
+       Returns: The median time the snippet reported, in seconds
+       Effects: Spawns the interpreters
+    """
+    times = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", snippet],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        times.append(float(result.stdout.split()[-1]))
+    return statistics.median(times)
+
+
+def time_initialize(args: List[str], env: dict, cwd: str, runs: int) -> float:
+    """Starts the server and times how long it takes to answer initialize
+    Parameters: The interpreter's arguments, the environment and working
+                directory to run it in, and the number of runs
+       Returns: The median time from spawning the server to reading the
+                response, in seconds
+       Effects: Spawns and kills the servers
+    """
+    body = json.dumps(_INITIALIZE).encode("utf-8")
+    request = f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body
+
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        with subprocess.Popen(
+            [sys.executable, *args],
+            env=env,
+            cwd=cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        ) as server:
+            assert server.stdin and server.stdout
+            server.stdin.write(request)
+            server.stdin.flush()
+
+            length = 0
+            while True:
+                header = server.stdout.readline().strip()
+                if not header:
+                    break
+                if header.lower().startswith(b"content-length:"):
+                    length = int(header.split(b":")[1])
+            server.stdout.read(length)
+            times.append(time.perf_counter() - start)
+
+            server.kill()
+    return statistics.median(times)
+
+
+def import_report(env: dict) -> Tuple[float, Dict[str, float], List[str]]:
+    """Imports the server with python -X importtime
+    Parameters: The environment to run the interpreter in
+       Returns: The total import time in seconds, the time spent importing each
+                top level package in seconds, and the heavy modules that were
+                imported
+       Effects: Spawns the interpreter
+    """
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            f"import sys, mfdls.server; print([m for m in {_HEAVY!r} "
+            "if m in sys.modules])",
+        ],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+    packages: Dict[str, float] = defaultdict(float)
+    total = 0.0
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        (self_us, _, name) = line[len("import time:") :].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] += int(self_us) / 1e6
+        total += int(self_us) / 1e6
+
+    heavy = json.loads(result.stdout.strip().replace("'", '"'))
+    return (total, packages, heavy)
+
+
+def main() -> None:
+    """The Driver"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--runs", type=int, default=5, help="Runs per measurement")
+    parser.add_argument("--top", type=int, default=8, help="Packages to report")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache:
+        python_path = os.pathsep.join(
+            filter(None, [str(_ROOT), os.environ.get("PYTHONPATH")])
+        )
+        env = dict(os.environ, MFDLS_CACHE_DIR=cache, PYTHONPATH=python_path)
+
+        extract = time_snippet(_EXTRACT, env, args.runs)
+
+        # Fill the cache, then measure loading from it
+        time_snippet(_FILL, env, 1)
+        cached = time_snippet(_CACHED, env, args.runs)
+
+        lazy = time_initialize(_LAZY, env, cache, args.runs)
+        eager = time_initialize(_EAGER, env, cache, args.runs)
+
+        (total, packages, heavy) = import_report(env)
+
+    print("initialize response")
+    print(f"  lazy parser:         {lazy * 1000:8.1f} ms")
+    print(f"  eager parser:        {eager * 1000:8.1f} ms")
+    print(f"import mfdls.server:   {total * 1000:8.1f} ms")
+    for (package, seconds) in sorted(packages.items(), key=lambda p: -p[1])[: args.top]:
+        print(f"  {package:20} {seconds * 1000:8.1f} ms")
+    print(f"  heavy modules loaded: {', '.join(heavy) or 'none'}")
+    print("token dictionary")
+    print(f"  extract from schema: {extract * 1000:8.1f} ms")
+    print(f"  load from cache:     {cached * 1000:8.1f} ms")
+    print(f"  speedup:             {extract / cached:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""suite.py
+
+On: October 2026
+
+Times the server's main operations on generated documents (see generate.py) of
+1k, 10k and 100k lines:
+  * validate_syntax,
+  * validate_data, in each validation mode,
+  * completion and hover, each request following an edit to the document, the
+    way they arrive from a text editor.
+The results are compared against the baselines stored in baselines.json, and
+the suite fails if anything got slower than the threshold allows. Baselines
+only mean something on the machine they were recorded on, so record them again
+(with --save) before comparing on another one.
+
+Usage:
+
+python benchmarks/suite.py [--sizes <lines> ...] [--runs <number of runs>]
+                           [--errors <rate>] [--filter <substring>]
+                           [--threshold <fraction>] [--save]
+
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from lsprotocol.types import (
+    Position,
+    Range,
+    TextDocumentContentChangeEvent_Type1,
+    TextDocumentItem,
+    TextDocumentSyncKind,
+    VersionedTextDocumentIdentifier,
+)
+from pygls.workspace import Document, Workspace
+
+from generate import generate
+from mfdls.completions import generate_token_list
+from mfdls.hover import resolve_hover
+from mfdls.medford_syntax import validate_syntax
+from mfdls.medford_validation import ValidationMode, load_parser, validate_data
+from mfdls.pip_helpers import installed_version
+from mfdls.span_map import SpanMap
+from mfdls.token_cache import load_available_tokens
+from mfdls.token_index import TokenIndex
+
+BASELINES = Path(__file__).with_name("baselines.json")
+
+# How much slower than its baseline a benchmark can get before the suite fails
+DEFAULT_THRESHOLD = 0.2
+
+# Differences smaller than this are noise, whatever the ratio
+_NOISE = 0.00002
+
+_URI = "file:///benchmark.mfd"
+
+# Requests per completion and hover measurement
+_REQUESTS = 200
+
+
+def median_time(function: Callable[[], object], runs: int) -> float:
+    """Times a function
+    Parameters: The function and the number of times to run it
+       Returns: The median time, in seconds
+       Effects: Runs the function
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def time_requests(source: str, tokens: TokenIndex, request: str) -> float:
+    """Times completion or hover requests on a document that is being edited
+    Parameters: The document, the token index and the request, "completion" or
+                "hover"
+       Returns: The median time to answer a request, in seconds. Applying the
+                edits is not timed; bringing the spans up to date and answering
+                the request are, the way the server's handlers do.
+       Effects: None
+    """
+    workspace = Workspace("file:///", TextDocumentSyncKind.Incremental)
+    workspace.put_document(
+        TextDocumentItem(uri=_URI, language_id="medford", version=0, text=source)
+    )
+    spans = SpanMap()
+
+    lines = source.splitlines()
+    token_lines = [i for (i, line) in enumerate(lines) if line.startswith("@")]
+    rng = random.Random(0)
+
+    times = []
+    for version in range(1, _REQUESTS + 1):
+        # Type a character at the end of some line
+        edited = rng.choice(token_lines)
+        end = Position(line=edited, character=len(lines[edited]))
+        workspace.update_document(
+            VersionedTextDocumentIdentifier(uri=_URI, version=version),
+            TextDocumentContentChangeEvent_Type1(
+                range=Range(start=end, end=end), text="x"
+            ),
+        )
+        lines[edited] += "x"
+
+        # Then ask about the major token of another
+        line = rng.choice(token_lines)
+        position = Position(line=line, character=3)
+
+        start = time.perf_counter()
+        doc = workspace.get_document(_URI)
+        if doc.version != spans.version:
+            spans.update(doc.source.splitlines(), doc.version)
+        if request == "completion":
+            generate_token_list(tokens, spans[line], position.character)
+        else:
+            resolve_hover(spans[line], position, tokens)
+        times.append(time.perf_counter() - start)
+
+    return statistics.median(times)
+
+
+def run_suite(
+    sizes: List[int], runs: int, errors: float, name_filter: str
+) -> Dict[str, Optional[float]]:
+    """Runs the benchmarks
+    Parameters: The document sizes, in lines, the number of runs per benchmark,
+                the share of lines with errors, and a substring the benchmarks'
+                names must contain
+       Returns: The median time of each benchmark in seconds, None for the ones
+                the parser could not run
+       Effects: Prints each result as it comes in
+    """
+    load_parser()
+    tokens = load_available_tokens()
+    index = TokenIndex(tokens)
+
+    results: Dict[str, Optional[float]] = {}
+    for size in sizes:
+        source = generate(tokens, size, errors=errors)
+        doc = Document(_URI, source)
+
+        benchmarks: Dict[str, Callable[[], float]] = {
+            f"validate_syntax/{size}": lambda: median_time(
+                lambda: validate_syntax(doc), runs
+            ),
+            f"completion/{size}": lambda: time_requests(source, index, "completion"),
+            f"hover/{size}": lambda: time_requests(source, index, "hover"),
+        }
+        for mode in ValidationMode:
+            benchmarks[f"validate_data/{mode}/{size}"] = lambda mode=mode: median_time(
+                lambda: validate_data(doc, mode), runs
+            )
+
+        for (name, benchmark) in benchmarks.items():
+            if name_filter not in name:
+                continue
+            try:
+                results[name] = benchmark()
+            # The parser has bugs of its own, which shouldn't stop the suite
+            # pylint: disable-next=W0703
+            except Exception as err:
+                print(f"{name}: failed, {err!r}", file=sys.stderr)
+                results[name] = None
+            _print_result(name, results[name])
+
+    return results
+
+
+def compare(
+    results: Dict[str, Optional[float]], baselines: Dict[str, float], threshold: float
+) -> List[str]:
+    """Compares results against their baselines
+    Parameters: The results, the baselines and the allowed slowdown, as a
+                fraction of the baseline
+       Returns: The names of the benchmarks that regressed
+       Effects: Prints the comparison
+    """
+    regressions = []
+    print(f"\n{'benchmark':32} {'now':>10} {'baseline':>10} {'change':>8}")
+    for (name, seconds) in results.items():
+        baseline = baselines.get(name)
+        if seconds is None or baseline is None:
+            continue
+
+        change = (seconds - baseline) / baseline if baseline else 0.0
+        regressed = change > threshold and seconds - baseline > _NOISE
+        if regressed:
+            regressions.append(name)
+        print(
+            f"{name:32} {seconds * 1000:8.3f}ms {baseline * 1000:8.3f}ms "
+            f"{change:+8.1%}{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def _print_result(name: str, seconds: Optional[float]) -> None:
+    """Prints a single result"""
+    if seconds is not None:
+        print(f"{name:32} {seconds * 1000:10.3f} ms")
+
+
+def _machine() -> Dict[str, str]:
+    """Describes what the baselines were recorded on"""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "medford": installed_version("medford"),
+        "pygls": installed_version("pygls"),
+    }
+
+
+def main() -> None:
+    """The Driver"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="Document lengths",
+    )
+    parser.add_argument("--runs", type=int, default=3, help="Runs per measurement")
+    parser.add_argument(
+        "--errors", type=float, default=0.0, help="Share of lines with errors"
+    )
+    parser.add_argument("--filter", default="", help="Only run matching benchmarks")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Allowed slowdown, as a fraction of the baseline",
+    )
+    parser.add_argument(
+        "--save", action="store_true", help="Record the results as the baselines"
+    )
+    args = parser.parse_args()
+
+    results = run_suite(args.sizes, args.runs, args.errors, args.filter)
+
+    stored = {}
+    if BASELINES.exists():
+        stored = json.loads(BASELINES.read_text(encoding="utf-8"))
+
+    if args.save:
+        # Keep the baselines that weren't run this time, if they are comparable
+        baselines = {}
+        if stored.get("machine") == _machine():
+            baselines = dict(stored.get("results", {}))
+        baselines.update(
+            {name: round(seconds, 6) for (name, seconds) in results.items() if seconds}
+        )
+        BASELINES.write_text(
+            json.dumps({"machine": _machine(), "results": baselines}, indent=2) + "\n",
+            encoding="utf-8",
+        )
+        print(f"\nSaved {len(baselines)} baselines to {BASELINES}")
+        return
+
+    if not stored:
+        print("\nNo baselines to compare against, record them with --save")
+        return
+
+    if stored.get("machine") != _machine():
+        print(
+            "\nThe baselines were recorded on another machine, or with other "
+            f"versions: {stored.get('machine')}"
+        )
+
+    regressions = compare(results, stored.get("results", {}), args.threshold)
+    if regressions:
+        print(
+            f"\n{len(regressions)} benchmarks regressed by more than "
+            f"{args.threshold:.0%}: {', '.join(regressions)}"
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,14 @@ medford-language-server repository.
 Usage:
 
 pythom -m mfdls [--ws | --tcp [--port <port number>] [--host <host ip>]]
+                [--workers <number of validation processes>] [--threads]
+                [--profile [<directory>]]
+
+python -m mfdls check [--jobs <number of processes>] [--mode <mode>]
+                      [--format json|sarif] [--output <file>] <paths...>
+
+The check subcommand validates files without starting a server, see check.py.
+--profile profiles every request from startup, see profiler.py.
 
 """
 import argparse
@@ -28,9 +36,7 @@ try:
 except ModuleNotFoundError:
     sys.path.append(os.path.join(os.getcwd(), "..", "medford-parser", "src"))
 
-from mfdls.server import medford_server
-
-logging.basicConfig(filename="pygls.log", level=logging.DEBUG, filemode="w")
+from mfdls import check, profiler
 
 
 def add_arguments(parser: argparse.ArgumentParser) -> None:
@@ -45,6 +51,29 @@ def add_arguments(parser: argparse.ArgumentParser) -> None:
     parser.add_argument("--ws", action="store_true", help="Use WebSocket server")
     parser.add_argument("--host", default="127.0.0.1", help="Bind to this address")
     parser.add_argument("--port", type=int, default=2087, help="Bind to this port")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of processes to validate in, 0 to validate in the server",
+    )
+    parser.add_argument(
+        "--threads",
+        action="store_true",
+        help="Validate on threads of the server rather than in processes",
+    )
+
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="DIRECTORY",
+        help="Profile every request, writing .pstats files to the directory",
+    )
+
+    subcommands = parser.add_subparsers(dest="command")
+    check.add_arguments(subcommands.add_parser("check"))
 
 
 def main() -> None:
@@ -53,6 +82,25 @@ def main() -> None:
     add_arguments(parser)
     args = parser.parse_args()
 
+    if args.command == "check":
+        sys.exit(check.main(args))
+
+    # The check subcommand runs without the server, and without its log, so
+    # they are only set up here
+    # pylint: disable-next=C0415
+    from mfdls.server import medford_server
+
+    logging.basicConfig(filename="pygls.log", level=logging.DEBUG, filemode="w")
+
+    if args.profile is not None:
+        profiler.start(directory=args.profile or None)
+
+    # Start the validation workers before the server starts any threads
+    if args.workers is not None or args.threads:
+        workers = medford_server.pool.workers if args.workers is None else args.workers
+        medford_server.pool.resize(workers, args.threads)
+    medford_server.pool.start()
+
     if args.tcp:
         medford_server.start_tcp(args.host, args.port)
     elif args.ws:
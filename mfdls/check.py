@@ -0,0 +1,498 @@
+"""check.py
+
+On: October 2026
+
+Validates MEDFORD files from the command line, without a text editor or any of
+the Language Server Protocol, for use in CI pipelines:
+
+python -m mfdls check [--jobs <number of processes>] [--mode <mode>]
+                      [--format json|sarif] [--output <file>]
+                      [--cache <file> | --no-cache] <paths...>
+
+Directories are searched for .mfd files the same way the validateWorkspace
+command searches the workspace. Files are validated across a pool of worker
+processes, and the results are kept in an on-disk cache keyed on each file's
+contents, the mode and the parser's version, so files that haven't changed
+since the last run are not validated again.
+
+Exits with 0 if there were no problems, 1 if there were Diagnostics, and 2 if
+some files could not be read or validated.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from lsprotocol.converters import get_converter
+from lsprotocol.types import Diagnostic, DiagnosticSeverity
+from pygls.uris import from_fs_path
+
+from mfdls.document_state import hash_source
+from mfdls.medford_validation import ValidationMode
+from mfdls.pip_helpers import installed_version
+from mfdls.token_cache import atomic_write_json, cache_dir
+from mfdls.validation_cache import retarget
+from mfdls.validation_pool import ValidationPool
+from mfdls.workspace import batches, find_medford_files, validate_source
+
+# Exit codes
+EXIT_CLEAN = 0
+EXIT_DIAGNOSTICS = 1
+EXIT_FAILED = 2
+
+# The most results the on-disk cache holds, the least recently used are dropped
+DEFAULT_CACHE_ENTRIES = 100_000
+
+_SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+_SARIF_LEVELS = {
+    DiagnosticSeverity.Error: "error",
+    DiagnosticSeverity.Warning: "warning",
+    DiagnosticSeverity.Information: "note",
+    DiagnosticSeverity.Hint: "note",
+}
+_INFORMATION_URI = "https://github.com/liam-strand/medford-language-server/"
+
+_converter = get_converter()
+
+
+class FileReport(NamedTuple):
+    """The results of checking a single file"""
+
+    path: str
+    uri: str
+    diagnostics: List[Diagnostic]
+
+    # Why the file could not be checked, None if it was
+    error: Optional[str] = None
+
+    # Whether the results came from the cache
+    cached: bool = False
+
+
+# A file's uri and contents, as sent to the workers
+_Source = Tuple[str, str]
+
+# A file's Diagnostics, or why it could not be validated, as sent back
+_Result = Tuple[Optional[List[Diagnostic]], Optional[str]]
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Configures the argument parser for the check subcommand
+    Parameters: The argument parser to configure
+       Returns: None
+       Effects: Adds arguments to the argument parser
+    """
+    parser.description = "Validate MEDFORD files"
+
+    parser.add_argument("paths", nargs="+", help="Files and directories to check")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of processes to validate in, 0 to validate in this one",
+    )
+    parser.add_argument(
+        "--mode",
+        type=str.upper,
+        choices=[str(mode) for mode in ValidationMode],
+        default=str(ValidationMode.OTHER),
+        help="Validation mode",
+    )
+    parser.add_argument(
+        "--format", choices=("json", "sarif"), default="json", help="Output format"
+    )
+    parser.add_argument(
+        "-o", "--output", default="-", help="File to write the results to"
+    )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        default=None,
+        help="Result cache file, in the server's cache directory by default",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Validate every file, every time"
+    )
+
+
+def main(args: argparse.Namespace) -> int:
+    """Checks the files, and writes out the results
+    Parameters: The parsed arguments
+       Returns: The exit code
+       Effects: Reads and writes the cache, writes the results
+    """
+    start = time.perf_counter()
+
+    cache = None
+    if not args.no_cache:
+        cache = ResultCache(args.cache or cache_dir() / "check.json")
+
+    mode = ValidationMode(args.mode)
+    reports = check(_expand(args.paths), mode, args.jobs, cache)
+
+    if cache is not None:
+        cache.save()
+
+    if args.format == "sarif":
+        results = to_sarif(reports)
+    else:
+        results = to_json(reports, mode, time.perf_counter() - start)
+
+    if args.output == "-":
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if any(report.error for report in reports):
+        return EXIT_FAILED
+    if any(report.diagnostics for report in reports):
+        return EXIT_DIAGNOSTICS
+    return EXIT_CLEAN
+
+
+def check(
+    paths: List[str],
+    mode: ValidationMode,
+    jobs: int,
+    cache: Optional["ResultCache"] = None,
+) -> List[FileReport]:
+    """Validates a set of files
+    Parameters: The paths of the files, the mode to validate in, the number of
+                worker processes to use, and the cache of earlier results
+       Returns: A report for each file, in the order the files were given
+       Effects: Reads the files, and adds new results to the cache
+    """
+    reports: Dict[str, FileReport] = {}
+    sources: List[_Source] = []
+
+    # Files with the same contents are only validated once, the rest get copies
+    # of the first one's results
+    duplicates: Dict[str, List[str]] = {}
+    hashes: Dict[str, str] = {}
+
+    for path in paths:
+        uri = from_fs_path(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                source = f.read()
+        except (OSError, UnicodeDecodeError) as err:
+            reports[uri] = FileReport(path, uri, [], error=str(err))
+            continue
+
+        source_hash = hash_source(source)
+        cached = cache.get(uri, source_hash, mode) if cache is not None else None
+        if cached is not None:
+            reports[uri] = FileReport(path, uri, cached, cached=True)
+            continue
+
+        reports[uri] = FileReport(path, uri, [])
+        if source_hash in duplicates:
+            duplicates[source_hash].append(uri)
+        else:
+            duplicates[source_hash] = []
+            hashes[uri] = source_hash
+            sources.append((uri, source))
+
+    for (uri, (diagnostics, error)) in asyncio.run(_validate(sources, mode, jobs)):
+        source_hash = hashes[uri]
+        for other in [uri] + duplicates[source_hash]:
+            if diagnostics is None:
+                reports[other] = reports[other]._replace(error=error)
+            else:
+                reports[other] = reports[other]._replace(
+                    diagnostics=retarget(diagnostics, uri, other)
+                )
+
+        if cache is not None and diagnostics is not None:
+            cache.put(uri, source_hash, mode, diagnostics)
+
+    return list(reports.values())
+
+
+async def _validate(
+    sources: List[_Source], mode: ValidationMode, jobs: int
+) -> List[Tuple[str, _Result]]:
+    """Validates files across a pool of worker processes
+    Parameters: The uris and contents of the files, the mode to validate in and
+                the number of worker processes
+       Returns: The uri and results of each file
+       Effects: Starts and stops the worker processes
+    """
+    pool = ValidationPool(jobs)
+    try:
+        done = await asyncio.gather(
+            *(
+                pool.run(_validate_batch, batch, mode)
+                for batch in batches(sources, pool.workers)
+            )
+        )
+    finally:
+        pool.shutdown()
+    return [result for batch in done for result in batch]
+
+
+def _validate_batch(
+    sources: List[_Source], mode: ValidationMode
+) -> List[Tuple[str, _Result]]:
+    """Validates a batch of files on a worker process
+    Parameters: The uris and contents of the files, and the mode to validate in
+       Returns: The uri of each file, and its Diagnostics or why it could not be
+                validated
+       Effects: None
+    """
+    results: List[Tuple[str, _Result]] = []
+    for (uri, source) in sources:
+        try:
+            results.append((uri, (validate_source(uri, source, (mode,)), None)))
+        # pylint: disable-next=W0703
+        except Exception as err:
+            logging.warning(f"Could not validate {uri}: {err!r}")
+            results.append((uri, (None, f"Could not validate: {err!r}")))
+    return results
+
+
+def _expand(paths: List[str]) -> List[str]:
+    """Replaces the directories in a list of paths with the MEDFORD files in them
+    Parameters: The paths
+       Returns: The paths of the files, without duplicates
+       Effects: None
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(find_medford_files([path]))
+        else:
+            files.append(path)
+    return list(dict.fromkeys(os.path.abspath(f) for f in files))
+
+
+class ResultCache:
+    """The Diagnostics of files that have been checked before, kept in a JSON
+    file between runs"""
+
+    def __init__(self, path: Path, max_entries: int = DEFAULT_CACHE_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._version = installed_version("medford")
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+        self._dirty = False
+
+    def get(
+        self, uri: str, source_hash: str, mode: ValidationMode
+    ) -> Optional[List[Diagnostic]]:
+        """Looks up the results of checking a file
+        Parameters: The file's uri, the hash of its contents and the mode
+           Returns: The file's Diagnostics, or None if it hasn't been checked.
+                    Results cached for another file with the same contents are
+                    changed to point at this one.
+           Effects: Marks the entry as recently used
+        """
+        key = f"{mode}:{source_hash}"
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self._entries[key] = entry
+        self._dirty = True
+
+        try:
+            diagnostics = _converter.structure(entry["diagnostics"], List[Diagnostic])
+        except (KeyError, TypeError, ValueError):
+            return None
+        return retarget(diagnostics, entry.get("uri", uri), uri)
+
+    def put(
+        self,
+        uri: str,
+        source_hash: str,
+        mode: ValidationMode,
+        diagnostics: List[Diagnostic],
+    ) -> None:
+        """Caches the results of checking a file
+        Parameters: The file's uri, the hash of its contents, the mode and the
+                    file's Diagnostics
+           Returns: None
+           Effects: May drop the least recently used entries
+        """
+        key = f"{mode}:{source_hash}"
+        self._entries.pop(key, None)
+        self._entries[key] = {
+            "uri": uri,
+            "diagnostics": _converter.unstructure(diagnostics),
+        }
+        while len(self._entries) > max(0, self.max_entries):
+            del self._entries[next(iter(self._entries))]
+        self._dirty = True
+
+    def save(self) -> None:
+        """Writes the cache back to disk, if anything changed
+        Parameters: None
+           Returns: None
+           Effects: Replaces the cache file atomically. Failures are logged, the
+                    next run just has more to validate.
+        """
+        if not self._dirty:
+            return
+
+        contents = {"parser": self._version, "entries": self._entries}
+        if atomic_write_json(self.path, contents):
+            self._dirty = False
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Reads the cache file
+        Parameters: None
+           Returns: The entries, empty if the file is missing, malformed, or was
+                    written for another version of the parser
+           Effects: None
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                contents = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if (
+            not isinstance(contents, dict)
+            or contents.get("parser") != self._version
+            or not isinstance(contents.get("entries"), dict)
+        ):
+            return {}
+        return contents["entries"]
+
+
+def to_json(
+    reports: List[FileReport], mode: ValidationMode, seconds: float
+) -> Dict[str, Any]:
+    """Formats the results of a check as JSON
+    Parameters: The reports, the mode the files were validated in and how long
+                the check took
+       Returns: A JSON-compatible dict, with the Diagnostics in their LSP form
+       Effects: None
+    """
+    return {
+        "mode": str(mode),
+        "files": [
+            {
+                "path": report.path,
+                "uri": report.uri,
+                "diagnostics": _converter.unstructure(report.diagnostics),
+                "error": report.error,
+                "cached": report.cached,
+            }
+            for report in reports
+        ],
+        "summary": {
+            "files": len(reports),
+            "diagnostics": sum(len(report.diagnostics) for report in reports),
+            "failed": sum(1 for report in reports if report.error),
+            "cached": sum(1 for report in reports if report.cached),
+            "seconds": seconds,
+        },
+    }
+
+
+def to_sarif(reports: List[FileReport]) -> Dict[str, Any]:
+    """Formats the results of a check as a SARIF 2.1.0 log
+    Parameters: The reports
+       Returns: A JSON-compatible dict
+       Effects: None
+         Notes: Files under the working directory are given relative paths,
+                which is what code scanning services expect
+    """
+    rules: Dict[str, None] = {}
+    results = []
+    notifications = []
+
+    for report in reports:
+        location = _sarif_artifact(report.path)
+        if report.error:
+            notifications.append(
+                {
+                    "level": "error",
+                    "message": {"text": report.error},
+                    "locations": [{"physicalLocation": location}],
+                }
+            )
+
+        for diag in report.diagnostics:
+            rule = str(diag.code) if diag.code is not None else "medford"
+            rules[rule] = None
+            start = diag.range.start
+            end = diag.range.end
+            results.append(
+                {
+                    "ruleId": rule,
+                    "level": (
+                        _SARIF_LEVELS.get(diag.severity, "error")
+                        if diag.severity
+                        else "error"
+                    ),
+                    "message": {"text": diag.message},
+                    "locations": [
+                        {
+                            "physicalLocation": {
+                                **location,
+                                "region": {
+                                    "startLine": start.line + 1,
+                                    "startColumn": start.character + 1,
+                                    "endLine": end.line + 1,
+                                    "endColumn": end.character + 1,
+                                },
+                            }
+                        }
+                    ],
+                }
+            )
+
+    return {
+        "$schema": _SARIF_SCHEMA,
+        "version": "2.1.0",
+        "runs": [
+            {
+                "tool": {
+                    "driver": {
+                        "name": "mfdls",
+                        "version": installed_version("mfdls"),
+                        "informationUri": _INFORMATION_URI,
+                        "rules": [{"id": rule} for rule in rules],
+                    }
+                },
+                "invocations": [
+                    {
+                        "executionSuccessful": not notifications,
+                        "toolExecutionNotifications": notifications,
+                    }
+                ],
+                "results": results,
+            }
+        ],
+    }
+
+
+def _sarif_artifact(path: str) -> Dict[str, Any]:
+    """Builds a SARIF artifact location for a file
+    Parameters: The path to the file
+       Returns: The artifact location, relative to the working directory if the
+                file is under it
+       Effects: None
+    """
+    try:
+        relative = os.path.relpath(path)
+    except ValueError:
+        # On another drive
+        relative = os.pardir
+    if relative.startswith(os.pardir):
+        return {"artifactLocation": {"uri": from_fs_path(os.path.abspath(path))}}
+    return {
+        "artifactLocation": {
+            "uri": Path(relative).as_posix(),
+            "uriBaseId": "%SRCROOT%",
+        }
+    }
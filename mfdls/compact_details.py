@@ -0,0 +1,393 @@
+"""compact_details.py
+
+On: October 2026
+
+A compact representation of a tokenized document. The medford parser tokenizes
+a document into a detail object per novel line, each with its own list of major
+tokens and its own copy of the value, which comes to several times the size of
+the document itself. CompactDetails keeps the same information in arrays:
+
+  * the offset of each line in the document, in an array('I'),
+  * the line, depth and (interned) major and minor token of each detail,
+  * the value of each detail, as slices of the document's lines ("pieces"),
+    one for the token line and one for each of its continuation lines.
+
+The document's contents are shared, not copied, and the few values that are not
+slices of the document (where a macro was substituted in) are kept as strings.
+Detail objects are only built when something asks for them, which is usually
+detailparser, by indexing or iterating over the details.
+"""
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from MEDFORD.medford_detail import detail
+
+from mfdls.line_source import line_starts
+
+# The parser's markers, as far as finding a detail's lines is concerned
+_BLOCK_HEADS = (detail.detail_head, detail.macro_head, "'@")
+
+
+class Names:
+    """An append-only table of token names, so that details can refer to their
+    major and minor tokens by index. Tables are shared between successive
+    tokenizations of a document, since the names hardly ever change. Every
+    partly typed name stays in the table, so a long session can intern more
+    names than a 16-bit index holds, and indices are kept in 32 bits."""
+
+    def __init__(self) -> None:
+        self._names: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __getitem__(self, index: int) -> str:
+        return self._names[index]
+
+    def index(self, name: str) -> int:
+        """Looks up the index of a name
+        Parameters: The name
+           Returns: Its index in the table
+           Effects: Adds the name to the table, if it is new
+        """
+        found = self._index.get(name)
+        if found is None:
+            found = self._index[name] = len(self._names)
+            self._names.append(name)
+        return found
+
+
+class CompactDetails(Sequence[detail]):
+    """The tokenized details of a document, as arrays over its contents"""
+
+    # pylint: disable-next=R0902
+    def __init__(self, source: str = "", names: Optional[Names] = None):
+        # The document, and the offset of each of its lines, found the first
+        # time a value is read
+        self.source = source
+        self._offsets: Optional[array] = None
+
+        self.names = names if names is not None else Names()
+
+        # Each detail's (0-indexed) line, interned major and minor tokens and
+        # depth, and the index of its first piece
+        self.lines = array("I")
+        self.majors = array("I")
+        self.minors = array("I")
+        self.depths = array("H")
+        self.first_pieces = array("I", [0])
+
+        # Each piece's line, relative to its detail's, and its columns
+        self.piece_lines = array("I")
+        self.piece_starts = array("I")
+        self.piece_ends = array("I")
+
+        # The values that could not be described by pieces, by detail
+        self.overrides: Dict[int, str] = {}
+
+    @classmethod
+    def from_details(
+        cls,
+        source: str,
+        lines: List[str],
+        details: Iterable[detail],
+        names: Optional[Names] = None,
+    ) -> "CompactDetails":
+        """Compacts the details the parser produced
+        Parameters: The document, its lines (as str.splitlines splits them), the
+                    details the parser tokenized them into, and the table to
+                    intern token names in
+           Returns: The compacted details
+           Effects: Adds new names to the table
+        """
+        compact = cls(source, names)
+        for item in details:
+            compact.append(item, lines)
+        return compact
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    @property
+    def offsets(self) -> array:
+        """The offset of each line of the document, see line_source.line_starts"""
+        if self._offsets is None:
+            self._offsets = line_starts(self.source)
+        return self._offsets
+
+    def __getitem__(self, index: Union[int, slice]):  # type: ignore[override]
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("detail index out of range")
+
+        return detail(
+            self.major(index).split("_"),
+            self.minor(index),
+            self.lines[index] + 1,
+            self.depths[index],
+            self.value(index),
+        )
+
+    def __iter__(self) -> Iterator[detail]:
+        names = self.names
+        for (index, (line, major, minor, depth)) in enumerate(
+            zip(self.lines, self.majors, self.minors, self.depths)
+        ):
+            yield detail(
+                names[major].split("_"),
+                names[minor],
+                line + 1,
+                depth,
+                self.value(index),
+            )
+
+    def __reduce__(self):
+        # The names are shared with the tokenizer, but only the ones in use
+        # need to go along when the details are sent to another process
+        return (_rebuild, (self._state(),))
+
+    def to_details(self) -> List[detail]:
+        """Builds the detail objects, for the parts of the parser that need them
+        Parameters: None
+           Returns: A detail object for each detail, as the parser built them
+           Effects: None
+        """
+        return list(self)
+
+    def major(self, index: int) -> str:
+        """The combined major token of a detail"""
+        return self.names[self.majors[index]]
+
+    def minor(self, index: int) -> str:
+        """The minor token of a detail"""
+        return self.names[self.minors[index]]
+
+    def value(self, index: int) -> str:
+        """The value of a detail, joined from its pieces"""
+        override = self.overrides.get(index)
+        if override is not None:
+            return override
+
+        line = self.lines[index]
+        (first, last) = (self.first_pieces[index], self.first_pieces[index + 1])
+        if last == first + 1:
+            return self._piece(line + self.piece_lines[first], first)
+        return " ".join(
+            self._piece(line + self.piece_lines[piece], piece)
+            for piece in range(first, last)
+        )
+
+    def _piece(self, line: int, piece: int) -> str:
+        """The text of a piece, on its (absolute) line"""
+        offset = self.offsets[line]
+        return self.source[
+            offset + self.piece_starts[piece] : offset + self.piece_ends[piece]
+        ]
+
+    def append(self, item: detail, lines: List[str]) -> None:
+        """Adds a detail that the parser produced
+        Parameters: The detail, and the lines of the document it came from
+           Returns: None
+           Effects: Adds the detail, and any new names, to the tables
+         Notes: Most values are found on their token line as they are. The
+                rest are found by following the parser's rules for token and
+                continuation lines, and if the pieces do not add up to the
+                value (a macro was substituted in), it is kept as it is.
+        """
+        line = item.Line_Number - 1
+        data = item.Data
+        text = lines[line]
+
+        self.majors.append(self.names.index(item.Combined_Major_Token))
+        self.minors.append(self.names.index(item.Minor_Token))
+        self.depths.append(item.Depth)
+
+        start = text.rfind(data)
+        if start >= 0:
+            self.piece_lines.append(0)
+            self.piece_starts.append(start)
+            self.piece_ends.append(start + len(data))
+        elif detail.macro_flag in text or not self._append_pieces(lines, line, data):
+            self.overrides[len(self.lines)] = data
+
+        self.lines.append(line)
+        self.first_pieces.append(len(self.piece_lines))
+
+    def _append_pieces(self, lines: List[str], line: int, data: str) -> bool:
+        """Adds the pieces of a value that spans several lines
+        Parameters: The document's lines, the line the detail begins on and its
+                    value
+           Returns: True if the pieces add up to the value, and were added
+           Effects: Adds the pieces
+        """
+        pieces = list(_pieces(lines, line))
+        text = " ".join(lines[line + ln][start:end] for (ln, start, end) in pieces)
+        if not pieces or text != data:
+            return False
+
+        for (ln, start, end) in pieces:
+            self.piece_lines.append(ln)
+            self.piece_starts.append(start)
+            self.piece_ends.append(end)
+        return True
+
+    def extend(
+        self, other: "CompactDetails", start: int, stop: int, delta: int = 0
+    ) -> None:
+        """Adds details from another tokenization of the document
+        Parameters: The other details, the range of them to add, and the number
+                    of lines to shift them by
+           Returns: None
+           Effects: Adds the details, and any new names, to the tables
+         Notes: The other details' lines must be the same in this document,
+                once shifted, since their pieces are read from it.
+        """
+        if start >= stop:
+            return
+
+        index = len(self.lines)
+        self.lines.extend(_shifted(other.lines[start:stop], delta))
+
+        if other.names is self.names:
+            self.majors.extend(other.majors[start:stop])
+            self.minors.extend(other.minors[start:stop])
+        else:
+            self.majors.extend(
+                self.names.index(other.major(i)) for i in range(start, stop)
+            )
+            self.minors.extend(
+                self.names.index(other.minor(i)) for i in range(start, stop)
+            )
+        self.depths.extend(other.depths[start:stop])
+
+        (first, last) = (other.first_pieces[start], other.first_pieces[stop])
+        shift = len(self.piece_lines) - first
+        self.first_pieces.extend(
+            _shifted(other.first_pieces[start + 1 : stop + 1], shift)
+        )
+        self.piece_lines.extend(other.piece_lines[first:last])
+        self.piece_starts.extend(other.piece_starts[first:last])
+        self.piece_ends.extend(other.piece_ends[first:last])
+
+        for (i, value) in other.overrides.items():
+            if start <= i < stop:
+                self.overrides[index + i - start] = value
+
+    def find(self, line: int) -> int:
+        """Finds the first detail on or after a line
+        Parameters: The (0-indexed) line
+           Returns: The detail's index, or the number of details if there is none
+           Effects: None
+        """
+        (low, high) = (0, len(self.lines))
+        while low < high:
+            middle = (low + high) // 2
+            if self.lines[middle] < line:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def nbytes(self) -> int:
+        """The memory taken up by the tables, not counting the document itself"""
+        arrays = (
+            self._offsets or array("I"),
+            self.lines,
+            self.majors,
+            self.minors,
+            self.depths,
+            self.first_pieces,
+            self.piece_lines,
+            self.piece_starts,
+            self.piece_ends,
+        )
+        return sum(len(table) * table.itemsize for table in arrays) + sum(
+            len(value) for value in self.overrides.values()
+        )
+
+    def _state(self) -> Tuple:
+        """The details as plain data, with only the names they use"""
+        used = sorted(set(self.majors) | set(self.minors))
+        names = Names()
+        remap = {old: names.index(self.names[old]) for old in used}
+        return (
+            self.source,
+            [names[i] for i in range(len(names))],
+            self.lines,
+            array("I", (remap[i] for i in self.majors)),
+            array("I", (remap[i] for i in self.minors)),
+            self.depths,
+            self.first_pieces,
+            self.piece_lines,
+            self.piece_starts,
+            self.piece_ends,
+            self.overrides,
+        )
+
+
+def _rebuild(state: Tuple) -> CompactDetails:
+    """Rebuilds details sent from another process, see CompactDetails._state"""
+    (source, names, *tables, overrides) = state
+    compact = CompactDetails(source)
+    for name in names:
+        compact.names.index(name)
+    (
+        compact.lines,
+        compact.majors,
+        compact.minors,
+        compact.depths,
+        compact.first_pieces,
+        compact.piece_lines,
+        compact.piece_starts,
+        compact.piece_ends,
+    ) = tables
+    compact.overrides = overrides
+    return compact
+
+
+def _shifted(table: array, delta: int) -> array:
+    """Adds a number to everything in an array"""
+    if delta == 0:
+        return table
+    return array(table.typecode, map(delta.__add__, table))
+
+
+def _pieces(lines: List[str], line: int) -> Iterator[Tuple[int, int, int]]:
+    """Finds the pieces of the value of a detail, following detail.FromLine
+    Parameters: The document's lines, and the line the detail begins on
+       Returns: The line of each piece, relative to the detail's, and its columns
+       Effects: None
+    """
+    (start, end) = _content(lines[line])
+    space = lines[line].find(" ", start, end)
+    if space < 0:
+        return
+    yield (0, space + 1, end)
+
+    for following in range(line + 1, len(lines)):
+        text = lines[following]
+        (start, end) = _content(text)
+        if text.startswith(_BLOCK_HEADS, start, end):
+            return
+        # Blank lines and comments are skipped
+        if start < end and text[start] != detail.comment_head:
+            yield (following - line, start, end)
+
+
+def _content(text: str) -> Tuple[int, int]:
+    """Finds the columns of a line that the parser reads: the line stripped of
+    whitespace and of any inline comment
+    Parameters: The line
+       Returns: The start and end columns
+       Effects: None
+    """
+    start = len(text) - len(text.lstrip())
+    end = len(text.rstrip())
+    comment = text.find(detail.comment_flag, start, end)
+    if comment >= 0:
+        end = max(start, len(text[:comment].rstrip()))
+    return (start, end)
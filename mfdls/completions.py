@@ -8,71 +8,50 @@ and macros found in the document and parser, and reports them to the text editor
 as completion lists.
 
 """
-from string import whitespace
-from typing import Dict, List, Optional, Tuple
+from typing import Optional
 
 from lsprotocol.types import CompletionItem, CompletionList
 
-NO_COMPLETIONS = CompletionList(is_incomplete=False, items=[])
-
+from mfdls.macro_index import MacroIndex
+from mfdls.span_map import LineKind, LineSpans
+from mfdls.token_index import TokenIndex
 
-def generate_major_token_list(token_dict: Dict[str, List[str]]) -> CompletionList:
-    """Generate a completion list of the defined major tokens
-    Parameters: The current token dictionary
-       Returns: The token dict's major tokens in CompletionList form
-       Effects: None
-    """
-    clist = [CompletionItem(label=major) for major in token_dict.keys()]
-    return CompletionList(is_incomplete=False, items=clist)
+NO_COMPLETIONS = CompletionList(is_incomplete=False, items=[])
 
 
-def generate_macro_list(macros: Dict[str, Tuple[int, str]], pos: int) -> CompletionList:
+def generate_macro_list(macros: MacroIndex, pos: int) -> CompletionList:
     """Generate a completion list of defined macros, along with their definitions
-    Parameters: The working macro dictionary
-       Returns: The macro dictionary in CompletionList form
+    Parameters: The document's macro index, and the line the completion was
+                requested on
+       Returns: The macros defined above the line in CompletionList form
        Effects: None
     """
 
     clist = []
-    for macro, replacement in macros.items():
-        if replacement[0] <= pos:
-            clist.append(CompletionItem(label=macro, detail=replacement[1]))
+    for macro, replacement in macros.visible(pos).items():
+        clist.append(CompletionItem(label=macro, detail=replacement[1]))
 
     return CompletionList(is_incomplete=False, items=clist)
 
 
-def is_requesting_minor_token(line: str, pos: int) -> bool:
-    """Determine if an instance of the "-" character is cause to get minor token completions
-    Parameters: The line and position of the querey
-       Returns: True if we should emit completions, false otherwise
-       Effects: None
-    """
-    subline = line[:pos]
-
-    if subline[0] == "@":
-        for char in subline[:-1]:
-            if char in (whitespace + "-"):
-                return False
-        return True
-
-    return False
-
-
-def generate_minor_token_list(
-    tokens: Dict[str, List[str]], line: str, pos: int
+def generate_token_list(
+    tokens: TokenIndex, spans: LineSpans, pos: int
 ) -> Optional[CompletionList]:
-    """Handle a request for the minor tokens associated with a major token
-    Parameters: The working token dictionary,
-                the line that triggered the completion request,
-                and the position in that line where the request was triggered
-       Returns: If the major token is defined, a CompletionList with the minor tokens
-                None if the major token is user-defined.
+    """Handle a request to complete the token under the cursor. Typing the "@" or
+    the "-" of a token asks for every major or minor token, and asking for
+    completions partway through a token narrows them to what has been typed.
+    Parameters: The token index,
+                the spans of the line the completion was requested on,
+                and the position in that line where it was requested
+       Returns: A CompletionList with the major or minor tokens that start with
+                what has been typed, or None if the cursor is not on a token or
+                the major token is user-defined
        Effects: None
     """
-    subline = line[1 : pos - 1]
+    if spans.kind != LineKind.TOKEN or not spans.start < pos <= spans.token_end:
+        return None
+
+    if pos <= spans.major_end:
+        return tokens.complete_major(spans.major[: pos - spans.start - 1])
 
-    if subline in tokens.keys():
-        clist = [CompletionItem(label=minor) for minor in tokens[subline]]
-        return CompletionList(is_incomplete=False, items=clist)
-    else:
-        return CompletionList(is_incomplete=False, items=[])
+    return tokens.complete_minor(spans.major, spans.minor[: pos - spans.major_end - 1])
@@ -0,0 +1,202 @@
+"""document_state.py
+
+On: October 2026
+
+Keeps track of what the server knows about each document: the version and
+contents that were last validated, the tokenized details (compacted, see
+compact_details.py), the macros they define, the parser's exported dict and
+the diagnostics that were published. The store is bounded, both in the number
+of documents and in (roughly estimated) memory, and evicts the least recently
+used documents first.
+"""
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from lsprotocol.types import Diagnostic
+
+from mfdls.compact_details import CompactDetails
+from mfdls.medford_incremental import IncrementalTokenizer
+from mfdls.medford_validation import ExportedDict, Modes, ValidationMode
+from mfdls.semantic_tokens import SemanticTokenCache
+from mfdls.span_map import SpanMap
+from mfdls.symbols import Symbol
+
+# Defaults for the size of the store
+DEFAULT_MAX_DOCUMENTS = 64
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Rough costs used to estimate how much memory a document's state takes up.
+# They don't need to be accurate, only proportional.
+_BYTES_PER_LINE = 150
+_BYTES_PER_SPANS = 150
+_EXPORT_FACTOR = 2
+
+# The lines a client is assumed to show until it asks for the semantic tokens of
+# a range, which is what clients ask for when they scroll
+_VISIBLE_LINES = 100
+
+
+class DocumentState:
+    """Everything the server knows about a single document"""
+
+    # pylint: disable-next=R0902
+    def __init__(self, uri: str):
+        self.uri = uri
+
+        # The version and hash of the contents that were last validated. The
+        # hash is None while only the syntax of this version has been checked.
+        self.version: Optional[int] = None
+        self.source_hash: Optional[str] = None
+
+        # The results of the last validation
+        self.details = CompactDetails()
+        self.macros: Dict[str, Tuple[int, str]] = {}
+        self.exported: Optional[ExportedDict] = None
+
+        # The syntax Diagnostics from the last tokenization, the semantic
+        # Diagnostics of the same contents in each mode they were validated in,
+        # and the complete set of Diagnostics that was last published
+        self.syntax_diagnostics: List[Diagnostic] = []
+        self.semantic: Dict[ValidationMode, List[Diagnostic]] = {}
+        self.diagnostics: List[Diagnostic] = []
+
+        # The modes the published diagnostics were generated in, None if they
+        # only reflect the syntax of the document
+        self.modes: Optional[Modes] = None
+
+        self.tokenizer = IncrementalTokenizer()
+
+        # Where the tokens and macros are on each line of the latest version
+        self.spans = SpanMap()
+
+        # The semantic tokens last sent, encoded from the spans
+        self.semantic_tokens = SemanticTokenCache()
+
+        # The first and last lines the client is showing, and the tokenization
+        # of a large document running in the background, if there is one
+        self.visible: Tuple[int, int] = (0, _VISIBLE_LINES)
+        self.background: Optional[asyncio.Future] = None
+
+        # The version last outlined for workspace symbols, and its outline
+        self.outline: Optional[Tuple[Optional[int], List[Symbol]]] = None
+
+        self.size = 0
+
+    def is_validated(self, source_hash: str, modes: Modes) -> bool:
+        """Determines if the stored diagnostics are up to date
+        Parameters: The hash of the document's current contents, and the modes
+                    the server is validating in
+           Returns: True if the document does not need to be validated again
+           Effects: None
+        """
+        return self.source_hash == source_hash and self.modes == modes
+
+    @property
+    def result_id(self) -> Optional[str]:
+        """Identifies the stored diagnostics for pull diagnostics, see
+        diagnostic_result_id, None until the document has been validated"""
+        if self.source_hash is None or self.modes is None:
+            return None
+        return diagnostic_result_id(self.source_hash, self.modes)
+
+    def estimate_size(self, length: int) -> int:
+        """Estimates how much memory the state takes up
+        Parameters: The length of the document's contents
+           Returns: The estimate, in bytes
+           Effects: Remembers the estimate
+         Notes: The spans have one entry for every line, so the lines are not
+                counted again.
+        """
+        size = length + len(self.spans) * (_BYTES_PER_LINE + _BYTES_PER_SPANS)
+        size += self.details.nbytes()
+        if self.exported is not None:
+            size += length * _EXPORT_FACTOR
+
+        self.size = size
+        return size
+
+
+class DocumentStore:
+    """A least recently used cache of DocumentStates"""
+
+    def __init__(
+        self,
+        max_documents: int = DEFAULT_MAX_DOCUMENTS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self._states: "OrderedDict[str, DocumentState]" = OrderedDict()
+
+    def __contains__(self, uri: str) -> bool:
+        return uri in self._states
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def get(self, uri: str) -> DocumentState:
+        """Retrieves the state of a document, creating it if needed
+        Parameters: The document's uri
+           Returns: The document's state
+           Effects: Marks the document as the most recently used
+        """
+        if uri in self._states:
+            self._states.move_to_end(uri)
+        else:
+            self._states[uri] = DocumentState(uri)
+        return self._states[uri]
+
+    def peek(self, uri: str) -> Optional[DocumentState]:
+        """Retrieves the state of a document, if there is one
+        Parameters: The document's uri
+           Returns: The document's state, or None
+           Effects: None
+        """
+        return self._states.get(uri)
+
+    def remove(self, uri: str) -> None:
+        """Forgets a document
+        Parameters: The document's uri
+           Returns: None
+           Effects: Removes the document's state
+        """
+        self._states.pop(uri, None)
+
+    def evict(self) -> None:
+        """Evicts the least recently used documents until the store fits in its
+        limits. The most recently used document is never evicted.
+        Parameters: None
+           Returns: None
+           Effects: Removes document states
+        """
+        total = self.total_size()
+
+        while len(self._states) > 1 and (
+            len(self._states) > self.max_documents or total > self.max_bytes
+        ):
+            (_, state) = self._states.popitem(last=False)
+            total -= state.size
+
+    def total_size(self) -> int:
+        """The estimated memory used by all of the stored states, in bytes"""
+        return sum(state.size for state in self._states.values())
+
+
+def hash_source(source: str) -> str:
+    """Hashes the contents of a document
+    Parameters: The document's contents
+       Returns: A hex digest of the contents
+       Effects: None
+    """
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+
+def diagnostic_result_id(source_hash: str, modes: Modes) -> str:
+    """Identifies the Diagnostics of some contents validated in some modes
+    Parameters: The hash of the contents, and the validation modes
+       Returns: The id, which is the same whenever the Diagnostics would be
+       Effects: None
+    """
+    return f"{'+'.join(map(str, modes))}:{source_hash}"
@@ -0,0 +1,234 @@
+"""macro_index.py
+
+On: October 2026
+
+Indexes the macros of a document: where each one is defined, in the order they
+are defined, and every place each one is used (`@Name or `@{Name}). The index
+is kept by the document's SpanMap and brought up to date with the lines that
+changed whenever the spans are, so completion, go to definition and find
+references look macros up by bisection, rather than going through the lines of
+the document or the whole macro dictionary.
+
+Places are kept sorted by line in arrays, one for the lines and one for the
+columns. An edit replaces the places on the lines it changed, for the macros on
+those lines before or after it, and moves the places below it by the number of
+lines it added or removed.
+"""
+from array import array
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from mfdls.span_map import LineSpans
+
+# Mirrors MEDFORD.medford_detail.detail
+_MACRO_HEAD = "`@"
+
+# Where something is in a document: its (0-indexed) line, and the columns it
+# starts and ends at
+Place = Tuple[int, int, int]
+
+# The columns of a place are packed into one integer, start in the high bits
+_COLUMN_BITS = 32
+_COLUMN_MASK = (1 << _COLUMN_BITS) - 1
+
+
+class _Places:
+    """The places of something in a document, sorted by line"""
+
+    def __init__(self) -> None:
+        self.lines = array("I")
+        self.columns = array("Q")
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def __getitem__(self, index: int) -> Place:
+        columns = self.columns[index]
+        return (self.lines[index], columns >> _COLUMN_BITS, columns & _COLUMN_MASK)
+
+    def before(self, line: int) -> int:
+        """The number of places above a line"""
+        return bisect_left(self.lines, line)
+
+    def to_list(self) -> List[Place]:
+        """Every place, in order"""
+        return [self[index] for index in range(len(self))]
+
+    def splice(
+        self, prefix: int, old_end: int, new_end: int, added: Iterable[Place]
+    ) -> None:
+        """Brings the places up to date with an edit
+        Parameters: The region the edit changed (see span_map.changed_region),
+                    and the places in the region after the edit, in order
+           Returns: None
+           Effects: Replaces the places in the region, and moves the places
+                    below it
+        """
+        (first, last) = (self.before(prefix), self.before(old_end))
+        added = list(added)
+        self.lines[first:] = array("I", (line for (line, _, _) in added)) + _moved(
+            self.lines[last:], new_end - old_end
+        )
+        self.columns[first:last] = array(
+            "Q", ((start << _COLUMN_BITS) | end for (_, start, end) in added)
+        )
+
+    def move(self, old_end: int, new_end: int) -> None:
+        """Brings the places up to date with an edit that has none of them in
+        the region it changed, see splice"""
+        if self.lines and self.lines[-1] >= old_end:
+            first = self.before(old_end)
+            self.lines[first:] = _moved(self.lines[first:], new_end - old_end)
+
+
+def _moved(lines: array, delta: int) -> array:
+    """Moves lines down by a number of lines"""
+    if delta == 0:
+        return lines
+    return array("I", map(delta.__add__, lines))
+
+
+class MacroIndex:
+    """The definitions and uses of the macros in a document"""
+
+    def __init__(self) -> None:
+        # Every definition in the document, and the name and replacement of each
+        self._definitions = _Places()
+        self._names: List[str] = []
+        self._bodies: List[str] = []
+
+        # The definitions of each macro, by index, and the places it is used
+        self._defined: Dict[str, List[int]] = {}
+        self._used: Dict[str, _Places] = {}
+
+    def __len__(self) -> int:
+        return len(self._definitions)
+
+    def update(
+        self,
+        region: Tuple[int, int, int],
+        lines: Sequence[str],
+        spans: Sequence["LineSpans"],
+        old_spans: Sequence["LineSpans"],
+    ) -> None:
+        """Brings the index up to date with an edit
+        Parameters: The region the edit changed (see span_map.changed_region),
+                    the lines in the region after the edit and their spans, and
+                    the spans of the lines it replaced
+           Returns: None
+           Effects: Updates the index
+        """
+        (prefix, old_end, new_end) = region
+
+        definitions: List[Tuple[Place, str, str]] = []
+        used: Dict[str, List[Place]] = {}
+        for (line, (text, line_spans)) in enumerate(zip(lines, spans), prefix):
+            if line_spans.macro:
+                place = (
+                    line,
+                    line_spans.start + len(_MACRO_HEAD),
+                    line_spans.token_end,
+                )
+                body = text[line_spans.value_start : line_spans.end]
+                definitions.append((place, line_spans.macro, body))
+
+            for reference in line_spans.macros:
+                if reference.name:
+                    used.setdefault(reference.name, []).append(
+                        (line, reference.start, reference.end)
+                    )
+
+        (first, last) = (
+            self._definitions.before(prefix),
+            self._definitions.before(old_end),
+        )
+        self._definitions.splice(
+            prefix, old_end, new_end, [place for (place, _, _) in definitions]
+        )
+        if first != last or definitions:
+            self._names[first:last] = [name for (_, name, _) in definitions]
+            self._bodies[first:last] = [body for (_, _, body) in definitions]
+            self._defined = {}
+            for (index, name) in enumerate(self._names):
+                self._defined.setdefault(name, []).append(index)
+
+        # Only the macros used in the region have places to replace, the rest
+        # at most move
+        replaced = set(used).union(
+            reference.name
+            for line_spans in old_spans
+            for reference in line_spans.macros
+            if reference.name
+        )
+        for name in replaced:
+            places = self._used.get(name)
+            if places is None:
+                places = self._used[name] = _Places()
+            places.splice(prefix, old_end, new_end, used.get(name, ()))
+            if not places:
+                del self._used[name]
+
+        if old_end != new_end:
+            for (name, places) in self._used.items():
+                if name not in replaced:
+                    places.move(old_end, new_end)
+
+    def visible(self, line: int) -> Dict[str, Tuple[int, str]]:
+        """The macros that can be used on a line
+        Parameters: The (0-indexed) line
+           Returns: The macros defined above the line, as the parser's macro
+                    dictionary holds them: by name, the (1-indexed) line of the
+                    latest definition and its replacement
+           Effects: None
+        """
+        count = self._definitions.before(line)
+        return {
+            name: (self._definitions.lines[index] + 1, body)
+            for (index, name, body) in zip(range(count), self._names, self._bodies)
+        }
+
+    def definition(self, name: str, line: int) -> Optional[Place]:
+        """Finds the definition a use of a macro refers to
+        Parameters: The macro's name, and the (0-indexed) line it is used on
+           Returns: The latest definition on or above the line, the first
+                    definition if the macro is only defined further down, or
+                    None if the macro is not defined
+           Effects: None
+        """
+        indices = self._defined.get(name)
+        if not indices:
+            return None
+
+        # The number of definitions on or above the line
+        (low, high) = (0, len(indices))
+        while low < high:
+            middle = (low + high) // 2
+            if self._definitions.lines[indices[middle]] <= line:
+                low = middle + 1
+            else:
+                high = middle
+        return self._definitions[indices[max(low - 1, 0)]]
+
+    def definitions(self, name: str) -> List[Place]:
+        """Every definition of a macro, in order"""
+        return [self._definitions[index] for index in self._defined.get(name, ())]
+
+    def uses(self, name: str) -> List[Place]:
+        """Every use of a macro, in order"""
+        places = self._used.get(name)
+        return places.to_list() if places else []
+
+
+def macro_at(spans: "LineSpans", character: int) -> Optional[str]:
+    """Finds the macro a position is on, whether it is being defined or used
+    Parameters: The spans of the position's line, and its column
+       Returns: The macro's name, or None if the position isn't on a macro
+       Effects: None
+    """
+    if spans.macro and spans.token_at(character):
+        return spans.macro
+    reference = spans.macro_at(character)
+    if reference is not None and reference.name:
+        return reference.name
+    return None
@@ -0,0 +1,443 @@
+"""medford_incremental.py
+
+On: October 2026
+
+Incremental tokenization of MEDFORD documents. The tokenizer remembers the
+state of the medford parser after every line of the last version of a document
+that it saw (what kind of detail_return it had, the major tokens of its detail
+and the macro dictionary), so that when the document changes only the edited
+region needs to be run back through detail.FromLine. Once the tokenizer has
+moved past the edited region and finds itself in the same state that the
+previous parse was in, it reuses the rest of the previous parse, shifting line
+numbers if lines were added or removed.
+
+The details are kept compactly (see compact_details.py), so the tokenizer
+holds on to a few bytes a line rather than a detail object for each of them.
+The results are identical to medford_syntax.validate_syntax.
+"""
+
+from array import array
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from MEDFORD.medford_detail import detail, detail_return
+from MEDFORD.medford_error_mngr import error_mngr, mfd_syntax_err
+from lsprotocol.types import Diagnostic
+from pygls.workspace import Document
+
+from mfdls.compact_details import CompactDetails, Names
+from mfdls.medford_syntax import syntax_errors_to_diagnostics
+from mfdls.metrics import timed
+from mfdls.parse_context import MacroDict, ParseContext
+from mfdls.span_map import SpanMap, changed_region
+
+# The kinds of detail_return a line can leave the parser with
+(_NONE, _DETAIL, _MACRO) = range(3)
+
+
+class IncrementalTokenizer:
+    """Tokenizes successive versions of a single document, only running the
+    medford parser over the lines that changed between versions.
+    """
+
+    def __init__(self) -> None:
+        # The lines of the last version of the document we tokenized
+        self._lines: List[str] = []
+
+        # The kind of detail_return that the parser had after each line, and
+        # the combined major token of its detail, as an index into the names
+        self._kinds = array("B")
+        self._majors = array("I")
+
+        # The macro dictionary after each line. Lines share a snapshot until
+        # a macro is defined, so this costs one pointer per line.
+        self._macros: List[MacroDict] = []
+
+        # The details of the last version, and the names they are interned in
+        self._names = Names()
+        self._details = CompactDetails(names=self._names)
+
+        # The syntax errors raised by each line, keyed by (0-indexed) line
+        self._errors: Dict[int, List[mfd_syntax_err]] = {}
+
+        # The lines that raised a major parsing error
+        self._major: Set[int] = set()
+
+        # How many lines were retokenized by the last update, for the curious
+        self.last_retokenized = 0
+
+    @property
+    def macros(self) -> MacroDict:
+        """The macros defined by the last version of the document"""
+        return self._macros[-1] if self._macros else {}
+
+    @property
+    def line_count(self) -> int:
+        """The number of lines in the last version of the document, 0 until the
+        first is tokenized"""
+        return len(self._lines)
+
+    def validate(
+        self,
+        text_doc: Document,
+        spans: Optional[SpanMap] = None,
+        lines: Optional[List[str]] = None,
+    ) -> Tuple[CompactDetails, List[Diagnostic]]:
+        """Evaluates the syntax of a medford file, reusing as much of the previous
+        tokenization as possible
+        Parameters: A text document reference, its spans if they are known, and
+                    its lines without line endings if they were already split
+           Returns: A tuple containing the tokens and the diagnostics, exactly
+                    as validate_syntax would
+           Effects: Updates the tokenizer's checkpoints
+        """
+        text = text_doc.source
+        source = text.splitlines() if lines is None else lines
+
+        self.update(source, text)
+
+        errors = [err for row in _group_by_lineno(self._errors).values() for err in row]
+        diagnostics = syntax_errors_to_diagnostics(errors, source, text_doc.uri, spans)
+
+        if self._major:
+            return (CompactDetails(), diagnostics)
+
+        return (self._details, diagnostics)
+
+    @timed("phase/tokenize")
+    def update(self, source: List[str], text: Optional[str] = None) -> None:
+        """Brings the checkpoints up to date with a new version of the document
+        Parameters: The new document, split into lines, and its contents, which
+                    the details refer to (the lines, joined, if not given)
+           Returns: None
+           Effects: Replaces the checkpoints. If the medford parser raises, the
+                    checkpoints are left as they were.
+         Notes: The parser runs in a context of its own, so documents can be
+                tokenized on several threads at once.
+        """
+        with ParseContext() as context:
+            self._update(source, "\n".join(source) if text is None else text, context)
+
+    # pylint: disable-next=R0914
+    def _update(self, source: List[str], text: str, context: ParseContext) -> None:
+        """Brings the checkpoints up to date, see update
+        Parameters: The new document, split into lines and whole, and the parse
+                    context
+           Returns: None
+           Effects: Replaces the checkpoints, and uses the context's macros
+        """
+        # Find the region of the document that changed. Everything before
+        # prefix and everything after the ends is untouched.
+        (prefix, old_end, new_end) = changed_region(self._lines, source)
+
+        if prefix == len(self._lines) == len(source):
+            self.last_retokenized = 0
+            return
+
+        delta = new_end - old_end
+
+        start = self._restart_line(source, prefix)
+
+        # Copy the untouched checkpoints
+        kinds = self._kinds[:start]
+        majors = self._majors[:start]
+        macros = self._macros[:start]
+        errors = {line: errs for line, errs in self._errors.items() if line < start}
+        major = {line for line in self._major if line < start}
+
+        # And the details that end before the restart
+        details = CompactDetails(text, self._names)
+        details.extend(self._details, 0, self._details.find(start))
+        fresh: List[detail] = []
+
+        detail_ret = self._checkpoint(start - 1)
+        snapshot: MacroDict = macros[-1] if macros else {}
+        context.macros = dict(snapshot)
+
+        translate = _line_translator(prefix, old_end, delta)
+
+        line_num = start
+        while line_num < len(source):
+            line = source[line_num]
+
+            # Past the edit, we are done as soon as we are in the same state that
+            # the previous parse was in at the same line.
+            if (
+                line_num >= new_end
+                and _is_block_start(line)
+                and self._converged(
+                    line_num - delta, detail_ret, context.macros, translate
+                )
+            ):
+                self._splice(line_num - delta, delta, translate)
+                kinds.extend(self._kinds[line_num - delta :])
+                majors.extend(self._majors[line_num - delta :])
+                macros.extend(self._macros[line_num - delta :])
+                for item in fresh:
+                    details.append(item, source)
+                fresh = []
+                details.extend(
+                    self._details,
+                    self._details.find(line_num - delta),
+                    len(self._details),
+                    delta,
+                )
+                major.update(
+                    major_line + delta
+                    for major_line in self._major
+                    if major_line >= line_num - delta
+                )
+                for err_line in sorted(self._errors):
+                    if err_line >= line_num - delta:
+                        errors[err_line + delta] = (
+                            self._replay(
+                                source, err_line + delta, kinds, majors, macros
+                            )
+                            if delta
+                            else self._errors[err_line]
+                        )
+                break
+
+            if line.strip() != "":
+                err_mngr = error_mngr("ALL", "LINE")
+                detail_ret = detail.FromLine(line, line_num + 1, detail_ret, err_mngr)
+
+                if isinstance(detail_ret, detail_return):
+                    if detail_ret.is_novel:
+                        fresh.append(detail_ret.detail)
+                    if detail_ret.type == "macro_return":
+                        snapshot = dict(context.macros)
+
+                row = [
+                    err
+                    for errs in err_mngr.return_syntax_errors().values()
+                    for err in errs
+                ]
+                if row:
+                    errors[line_num] = row
+                if err_mngr.has_major_parsing:
+                    major.add(line_num)
+
+            (kind, major_index) = self._kind_of(detail_ret)
+            kinds.append(kind)
+            majors.append(major_index)
+            macros.append(snapshot)
+            line_num += 1
+
+        # The details are only compacted once their continuation lines are in
+        for item in fresh:
+            details.append(item, source)
+
+        self.last_retokenized = line_num - start
+
+        self._lines = source
+        self._kinds = kinds
+        self._majors = majors
+        self._macros = macros
+        self._details = details
+        self._errors = errors
+        self._major = major
+
+    def _restart_line(self, source: List[str], prefix: int) -> int:
+        """Determines the line to start tokenizing from
+        Parameters: The new document and the first line that changed
+           Returns: The last line at or before the change that begins a detail
+                    in both versions of the document, or 0.
+           Effects: None
+         Notes: A continuation line modifies the detail above it, so we can
+                only restart on a line that begins a new detail. If the
+                changed line itself used to be a continuation, its block
+                has to be retokenized from the top.
+        """
+        line_num = prefix
+        if (
+            line_num < len(source)
+            and _is_block_start(source[line_num])
+            and (line_num >= len(self._lines) or _is_block_start(self._lines[line_num]))
+        ):
+            return line_num
+
+        line_num -= 1
+        while line_num > 0 and not _is_block_start(source[line_num]):
+            line_num -= 1
+
+        return max(line_num, 0)
+
+    def _kind_of(self, detail_ret: Optional[detail_return]) -> Tuple[int, int]:
+        """Boils a detail_return down to what the checkpoints keep of it
+        Parameters: The detail_return
+           Returns: Its kind, and the index of its detail's combined major token
+                    (0 if it has no detail)
+           Effects: Interns the major token
+        """
+        if not isinstance(detail_ret, detail_return):
+            return (_NONE, 0)
+        if detail_ret.type == "macro_return":
+            return (_MACRO, 0)
+        return (_DETAIL, self._names.index(detail_ret.detail.Combined_Major_Token))
+
+    def _checkpoint(
+        self,
+        line_num: int,
+        kinds: Optional[array] = None,
+        majors: Optional[array] = None,
+    ) -> Optional[detail_return]:
+        """Rebuilds the detail_return the parser had after a line
+        Parameters: The (0-indexed) line, or -1 for the start of the document,
+                    and the checkpoints to read it from (the stored ones, if not
+                    given)
+           Returns: The detail_return, as far as the next line can tell
+           Effects: None
+         Notes: A line only looks back at the kind of the previous return and
+                the major tokens of its detail, unless it continues the detail,
+                and then it only adds to the detail's value. The rebuilt detail
+                has the right major tokens, and nothing else.
+        """
+        kinds = self._kinds if kinds is None else kinds
+        majors = self._majors if majors is None else majors
+        if line_num < 0 or kinds[line_num] == _NONE:
+            return None
+        if kinds[line_num] == _MACRO:
+            return detail_return("macro_return", None, None, None)
+
+        major_tokens = self._names[majors[line_num]].split("_")
+        stand_in = detail(major_tokens, "desc", line_num + 1, 1, "")
+        return detail_return("detail_return", False, stand_in, None)
+
+    def _replay(
+        self,
+        source: List[str],
+        line_num: int,
+        kinds: array,
+        majors: array,
+        macros: List[MacroDict],
+    ) -> List[mfd_syntax_err]:
+        """Runs a line back through the parser to regenerate its syntax errors
+        Parameters: The document, the (0-indexed) line to replay, and the
+                    checkpoints for the lines above it
+           Returns: The syntax errors raised by the line
+           Effects: None
+         Notes: The error messages have line numbers baked into them, so errors
+                on lines that moved have to be regenerated rather than shifted.
+        """
+        previous = self._checkpoint(line_num - 1, kinds, majors)
+
+        with ParseContext(macros[line_num - 1] if line_num > 0 else None) as context:
+            detail.FromLine(source[line_num], line_num + 1, previous, context.err_mngr)
+
+        errors = context.err_mngr.return_syntax_errors()
+        return [err for errs in errors.values() for err in errs]
+
+    def _converged(
+        self,
+        old_line: int,
+        detail_ret: Optional[detail_return],
+        macros: MacroDict,
+        translate: Callable[[int], int],
+    ) -> bool:
+        """Determines if the parser is in the same state that the previous parse
+        was in just before old_line
+        Parameters: The corresponding line in the old document, the current
+                    detail_return and macros, and the old-to-new line number
+                    translator
+           Returns: True if the rest of the previous parse can be reused
+           Effects: None
+        """
+        if old_line >= len(self._kinds):
+            return False
+
+        old_macros = self._macros[old_line - 1] if old_line > 0 else {}
+
+        # A new detail only looks back at the type and major tokens of the
+        # previous return.
+        old_kind = (
+            (self._kinds[old_line - 1], self._majors[old_line - 1])
+            if old_line > 0
+            else (_NONE, 0)
+        )
+        if old_kind != self._kind_of(detail_ret):
+            return False
+
+        # And macros are substituted out of the macro dictionary
+        if len(old_macros) != len(macros):
+            return False
+        for name, (lineno, body) in old_macros.items():
+            if macros.get(name) != (translate(lineno), body):
+                return False
+
+        return True
+
+    def _splice(
+        self, old_line: int, delta: int, translate: Callable[[int], int]
+    ) -> None:
+        """Shifts the previous parse from old_line onwards by delta lines
+        Parameters: The first line to keep from the previous parse, the number of
+                    lines added (or removed, if negative) by the edit, and the
+                    old-to-new line number translator
+           Returns: None
+           Effects: Replaces the stored macros from old_line onwards with
+                    shifted copies
+         Notes: The details are shifted as they are copied, see
+                CompactDetails.extend.
+        """
+        if delta == 0:
+            return
+
+        snapshots: Dict[int, MacroDict] = {}
+
+        for line_num in range(old_line, len(self._macros)):
+            macros = self._macros[line_num]
+            if id(macros) not in snapshots:
+                snapshots[id(macros)] = {
+                    name: (translate(lineno), body)
+                    for name, (lineno, body) in macros.items()
+                }
+            self._macros[line_num] = snapshots[id(macros)]
+
+
+def _is_block_start(line: str) -> bool:
+    """Determines if a line begins a new detail or macro, mirroring detail.FromLine
+    Parameters: A line of a medford document
+       Returns: True if the line does not depend on the lines above it
+       Effects: None
+    """
+    line = line.strip()
+    if detail.comment_flag in line:
+        line = line.split(detail.comment_flag)[0].strip()
+
+    return line[:1] == detail.detail_head or line[:2] in (detail.macro_head, "'@")
+
+
+def _line_translator(prefix: int, old_end: int, delta: int) -> Callable[[int], int]:
+    """Builds a function that maps (1-indexed) line numbers in the old document
+    to line numbers in the new one.
+    Parameters: The first changed line, the end of the changed region in the
+                old document, and the number of lines added by the edit
+       Returns: The translator. Lines inside the edit have no counterpart in
+                the new document, so they are mapped to 0.
+       Effects: None
+    """
+
+    def translate(lineno: int) -> int:
+        if lineno - 1 < prefix:
+            return lineno
+        if lineno - 1 >= old_end:
+            return lineno + delta
+        return 0
+
+    return translate
+
+
+def _group_by_lineno(
+    errors: Dict[int, List[mfd_syntax_err]],
+) -> Dict[int, List[mfd_syntax_err]]:
+    """Groups errors by the line number they report, the same way the medford
+    parser's error manager does
+    Parameters: The syntax errors raised by each line
+       Returns: The syntax errors, keyed by their reported line number
+       Effects: None
+    """
+    grouped: Dict[int, List[mfd_syntax_err]] = {}
+    for line_num in sorted(errors):
+        for err in errors[line_num]:
+            grouped.setdefault(err.lineno, []).append(err)
+    return grouped
@@ -8,11 +8,11 @@ supports reporting on syntax errors.
 """
 
 import re
-from typing import List, Optional, Tuple
+from functools import lru_cache
+from typing import Iterable, List, Optional, Pattern, Sequence, Tuple
 
 from MEDFORD.medford_detail import detail, detail_return
 from MEDFORD.medford_error_mngr import (
-    error_mngr,
     mfd_duplicated_macro,
     mfd_no_desc,
     mfd_remaining_template,
@@ -30,48 +30,62 @@ from lsprotocol.types import (
 )
 from pygls.workspace import Document
 
+from mfdls.line_source import Buffer, LineIndex, iter_lines
+from mfdls.metrics import timed, timer
+from mfdls.parse_context import ParseContext
+from mfdls.span_map import LineKind, LineSpans, SpanMap, scan_line
+
+# Patterns to fall back on if an error can't be found in the spans. The name the
+# error is about is escaped and substituted in for {}.
+_UNEXPECTED_MACRO = r"(?:(?<=`@){0}|(?<=`@{{){0}(?=}}))"
+_MACRO_DEFINITION = r"`@{0}"
+_TOKEN = r"@{0}"
+
+_MACRO_HEAD = "`@"
+_WRONG_MACRO_HEAD = "'@"
+
+# The lines that might define a macro, see validate_window
+_MACRO_LINE = re.compile(r"^[ \t]*`@", re.MULTILINE)
+
 
 def validate_syntax(
-    text_doc: Document,
+    text_doc: Document, spans: Optional[SpanMap] = None
 ) -> Tuple[List[detail], List[Diagnostic]]:
     """Evaluates the syntax of a medford file and generates a token list and
     diagnostic list
-    Parameters: A text document reference
+    Parameters: A text document reference, and its spans if they are known
     Returns: A tuple containing the tokens and the diagnostics
     Effects: None
     """
-    source = text_doc.source.splitlines()
+    return validate_buffer(text_doc.source, text_doc.uri, spans)
 
-    details = []
-    diagnostics = []
 
-    # The medford parser's macro dict is not reset or reinitilized
-    # when the parser starts, so we take care of that here.
-    detail.macro_dictionary = {}
-
-    # Set up the error manager
-    err_mngr = error_mngr("ALL", "LINE")
+def validate_buffer(
+    buffer: Buffer, uri: str, spans: Optional[SpanMap] = None
+) -> Tuple[List[detail], List[Diagnostic]]:
+    """Evaluates the syntax of a medford document's contents, a line at a time
+    Parameters: The document's contents, as text or the bytes of a memory-mapped
+                file (see line_source.py), its uri, and its spans if they are
+                known
+       Returns: A tuple containing the tokens and the diagnostics
+       Effects: None
+    """
+    # The parser gets a macro dictionary and an error manager of its own, so
+    # that other documents can be tokenized at the same time
+    context = ParseContext()
+    err_mngr = context.err_mngr
 
     # Tokenize the document
-    detail_ret = None
-    for line_num, line in enumerate(source):
-        if line.strip() != "":
-            detail_ret = detail.FromLine(line, line_num + 1, detail_ret, err_mngr)
-            if isinstance(detail_ret, detail_return):
-                if detail_ret.is_novel:
-                    details.append(detail_ret.detail)
-
-    # Convert the medford parser format errors into LSP format Diagnostics
-    # for err in err_mngr.get_syntax_errors_list():
-    #     diag = _syntax_error_to_diagnostic(err, source, text_doc.uri)
-    #     if diag:
-    #         diagnostics.append(diag)
-    # pylint: disable-next=W0212
-    for row in err_mngr.return_syntax_errors().values():
-        for err in row:
-            diag = _syntax_error_to_diagnostic(err, source, text_doc.uri)
-            if diag:
-                diagnostics.append(diag)
+    with timer("phase/tokenize"):
+        details = _tokenize(iter_lines(buffer), 0, context)
+
+    # Convert the medford parser format errors into LSP format Diagnostics. The
+    # lines are only indexed if there are errors to point at.
+    errors = [err for row in err_mngr.return_syntax_errors().values() for err in row]
+    diagnostics = []
+    if errors:
+        source = LineIndex(buffer)
+        diagnostics = syntax_errors_to_diagnostics(errors, source, uri, spans)
 
     # If something went really wrong, don't try to report a valid tokenization
     if err_mngr.has_major_parsing:
@@ -81,11 +95,112 @@ def validate_syntax(
     return (details, diagnostics)
 
 
+def validate_window(source: str, uri: str, first: int, last: int) -> List[Diagnostic]:
+    """Evaluates the syntax of part of a document, for a first look at a document
+    that is too large to tokenize right away
+    Parameters: The document's contents and uri, and the first and last
+                (0-indexed) lines to evaluate
+       Returns: The Diagnostics of those lines
+       Effects: None
+     Notes: Tokenizing starts at the beginning of the block the first line is
+            in, with the macros defined above it, so the errors found are the
+            ones the whole document would have on those lines, except for
+            macros defined again further down.
+    """
+    lines = LineIndex(source, last + 1)
+    start = min(first, len(lines) - 1)
+    while start > 0 and not _is_independent(lines[start]):
+        start -= 1
+    if start < 0:
+        return []
+
+    # Only the macro definitions above matter, and they are quick to find
+    above = ParseContext()
+    definitions = _MACRO_LINE.finditer(source, 0, lines.starts[start])
+    context = ParseContext()
+    try:
+        with above:
+            for line_num in sorted({lines.line_of(m.start()) for m in definitions}):
+                detail.FromLine(lines[line_num], line_num + 1, None, above.err_mngr)
+
+        context.macros.update(above.macros)
+        _tokenize(lines[start:], start, context)
+    except ValueError:
+        return []
+
+    errors = [
+        err
+        for row in context.err_mngr.return_syntax_errors().values()
+        for err in row
+        if first < err.lineno <= last + 1
+    ]
+    return syntax_errors_to_diagnostics(errors, lines, uri)
+
+
+def _tokenize(lines: Iterable[str], first: int, context: ParseContext) -> List[detail]:
+    """Runs the parser over the lines of a document
+    Parameters: The lines, the (0-indexed) line number of the first of them, and
+                the context to parse in
+       Returns: The details the lines were tokenized into
+       Effects: Adds the macros defined and the errors found to the context
+    """
+    details = []
+    detail_ret = None
+    with context:
+        for line_num, line in enumerate(lines, first + 1):
+            if line.strip() != "":
+                detail_ret = detail.FromLine(
+                    line, line_num, detail_ret, context.err_mngr
+                )
+                if isinstance(detail_ret, detail_return):
+                    if detail_ret.is_novel:
+                        details.append(detail_ret.detail)
+    return details
+
+
+def _is_independent(line: str) -> bool:
+    """Determines if the parser can start on a line with nothing before it: a
+    macro definition, or a major token without a minor token"""
+    spans = scan_line(line)
+    return spans.kind == LineKind.MACRO or (
+        spans.kind == LineKind.TOKEN and spans.token_end == spans.major_end
+    )
+
+
+@timed("phase/syntax_diagnostics")
+def syntax_errors_to_diagnostics(
+    errors: Iterable[mfd_syntax_err],
+    source: Sequence[str],
+    uri: str,
+    spans: Optional[SpanMap] = None,
+) -> List[Diagnostic]:
+    """Converts a collection of medford parser format syntax errors to LSP Diagnostics
+    Parameters: The syntax errors, the source document split into lines,
+                the document's uri, and the spans of the document if they are
+                known
+       Returns: A list of Diagnostics, in the same order as the errors
+       Effects: None
+    """
+    diagnostics = []
+
+    # Only use the spans if they are for this version of the document
+    if spans is not None and len(spans) != len(source):
+        spans = None
+
+    for err in errors:
+        diag = _syntax_error_to_diagnostic(err, source, uri, spans)
+        if diag:
+            diagnostics.append(diag)
+
+    return diagnostics
+
+
 def _syntax_error_to_diagnostic(
-    error: mfd_syntax_err, source: List[str], uri: str
+    error: mfd_syntax_err, source: Sequence[str], uri: str, spans: Optional[SpanMap]
 ) -> Optional[Diagnostic]:
     """Converts a medford parser format syntax error to a LSP diagnostic
-    Parameters: A medford syntax error, the source document, and the document's uri
+    Parameters: A medford syntax error, the source document, the document's uri,
+                and the spans of the document, if they are known
        Returns: A LSP Diagnostic containing the information in the syntax error
        Effects: None
     """
@@ -93,10 +208,11 @@ def _syntax_error_to_diagnostic(
     line_number = error.lineno - 1
     error_type = error.errtype
     line_text = source[line_number]
+    line_spans = _line_spans(line_number, source, spans)
     error_message = error.msg
 
-    # For all non-specific syntax errors, or if the regexing fails, we
-    # Start generating the Diagnostic
+    # For all non-specific syntax errors, or if the error can't be found in the
+    # line, we mark the entire line.
     diag = Diagnostic(
         # The first member, the range, describes the location of the syntax
         # error. It is comprised of two Positions, which are line:character
@@ -119,33 +235,31 @@ def _syntax_error_to_diagnostic(
         message=error_message,
     )
 
-    # For each error, we need to extract some information from the error message
-    # generated by the medford parser. Then we generate a regular expression
-    # that parses the erronious line and finds where in that line the error originates.
+    # For each error, we look up where in the line the error originates in the
+    # line's spans, which were recorded when the line was tokenized. If the
+    # spans don't have it (the parser and the span scanner disagree about the
+    # line), we fall back on searching the line with a regular expression.
 
     # The Diagnostic object is deeply nested, documentation is in the LSP specification at
     # microsoft.github.io/language-server-protocol/specifications/lsp/3.17/specification/#diagnostic
-    # and the actual python definition is at pygls/lsp/types/basic_structures.py on line 268.
+    # and the actual python definition is at lsprotocol/types.py.
     # Both of those resources have links to their nested objects.
 
     # If we were using python 3.10, we would us a match/case, but we need to
     # support 3.8+, so we use a big if elif block.
+    span: Optional[Tuple[int, int]] = None
 
-    # The other branches are very similar to this first one, so only this first
-    # branch will be heavily documented. Other branches will be documented in their
-    # novelty relative to this first branch
     if isinstance(error, mfd_unexpected_macro):
 
         # For most errors, we can extract the macro name from the error object
         macro = error.substr
 
-        # Scan through the erronious line, looking for the macro's position
-        match = re.search(f"(?:(?<=`@){macro}|(?<=`@{{){macro}(?=}}))", line_text)
-        if match:
-            diag.range = Range(
-                start=Position(line=line_number, character=match.start()),
-                end=Position(line=line_number, character=match.end()),
-            )
+        # Look for the reference among the line's macro references
+        reference = next((ref for ref in line_spans.macros if ref.name == macro), None)
+        if reference:
+            span = (reference.start, reference.end)
+        else:
+            span = _search(_UNEXPECTED_MACRO, macro, line_text)
 
     # Duplicated macros are a special case because we need to add some additional
     # information to the Diagnostic about the earlier definition of the macro.
@@ -158,15 +272,19 @@ def _syntax_error_to_diagnostic(
 
         # For this error, we also look for the other occourance of the macro,
         # so that we can reference it in the Diagnostic.
-        first_match = re.search(f"`@{macro}", source[first_occourance])
-        second_match = re.search(f"`@{macro}", line_text)
+        first_match = _macro_definition(
+            macro,
+            source[first_occourance],
+            _line_spans(first_occourance, source, spans),
+        )
+        second_match = _macro_definition(macro, line_text, line_spans)
 
         if first_match and second_match:
             diag.range = Range(
                 start=Position(
-                    line=first_occourance, character=first_match.start() + 2
+                    line=first_occourance, character=first_match[0] + len(_MACRO_HEAD)
                 ),
-                end=Position(line=first_occourance, character=first_match.end()),
+                end=Position(line=first_occourance, character=first_match[1]),
             )
 
             # The related information points to the prior "probably correct"
@@ -178,10 +296,10 @@ def _syntax_error_to_diagnostic(
                         uri=uri,
                         range=Range(
                             start=Position(
-                                line=line_number, character=second_match.start()
+                                line=line_number, character=second_match[0]
                             ),
                             end=Position(
-                                line=line_number, character=second_match.end()
+                                line=line_number, character=second_match[1]
                             ),
                         ),
                     ),
@@ -191,27 +309,67 @@ def _syntax_error_to_diagnostic(
             # fmt: on
     elif isinstance(error, mfd_remaining_template):
 
-        # This scan is much simpler because we only need to look for this
-        # sequence of characters in the erronious line.
-        match = re.search(r"\[..\]", line_text)
-        if match:
-            diag.range = Range(
-                start=Position(line=line_number, character=match.start()),
-                end=Position(line=line_number, character=match.end()),
-            )
+        # The template marker is always the same, so this is a plain search
+        start = line_text.find(detail.template_flag)
+        if start != -1:
+            span = (start, start + len(detail.template_flag))
     elif isinstance(error, mfd_no_desc):
-        match = re.search(f"@{error.substr}", line_text)
-        if match:
-            diag.range = Range(
-                start=Position(line=line_number, character=match.start()),
-                end=Position(line=line_number, character=match.end()),
-            )
+        if line_spans.kind == LineKind.TOKEN:
+            span = (line_spans.start, line_spans.token_end)
+        else:
+            span = _search(_TOKEN, error.substr, line_text)
     elif isinstance(error, mfd_wrong_macro_token):
-        match = re.search(r"'@", line_text)
-        if match:
-            diag.range = Range(
-                start=Position(line=line_number, character=match.start()),
-                end=Position(line=line_number, character=match.end()),
-            )
+        start = line_spans.start
+        if not line_text.startswith(_WRONG_MACRO_HEAD, start):
+            start = line_text.find(_WRONG_MACRO_HEAD)
+        if start != -1:
+            span = (start, start + len(_WRONG_MACRO_HEAD))
+
+    if span:
+        diag.range = Range(
+            start=Position(line=line_number, character=span[0]),
+            end=Position(line=line_number, character=span[1]),
+        )
 
     return diag
+
+
+def _line_spans(
+    line_number: int, source: Sequence[str], spans: Optional[SpanMap]
+) -> LineSpans:
+    """Looks up the spans of a line, scanning it if the document's spans are unknown"""
+    if spans is not None:
+        return spans[line_number]
+    return scan_line(source[line_number])
+
+
+def _macro_definition(
+    macro: str, line_text: str, line_spans: LineSpans
+) -> Optional[Tuple[int, int]]:
+    """Finds the `@Name that defines a macro on a line
+    Parameters: The macro's name, and the line and its spans
+       Returns: The start and end of the definition, or None if it isn't there
+       Effects: None
+    """
+    if line_spans.kind == LineKind.MACRO and line_spans.macro == macro:
+        return (line_spans.start, line_spans.token_end)
+    return _search(_MACRO_DEFINITION, macro, line_text)
+
+
+def _search(template: str, name: str, line_text: str) -> Optional[Tuple[int, int]]:
+    """Searches a line for a name, using one of the fallback patterns
+    Parameters: The pattern's template, the name to substitute in, and the line
+       Returns: The start and end of the first match, or None if there is none
+       Effects: None
+    """
+    match = _pattern(template, name).search(line_text)
+    if match:
+        return match.span()
+    return None
+
+
+@lru_cache(maxsize=256)
+def _pattern(template: str, name: str) -> Pattern[str]:
+    """Compiles a fallback pattern for a name, escaping the name. Documents tend
+    to repeat the same mistakes, so the compiled patterns are cached."""
+    return re.compile(template.format(re.escape(name)))
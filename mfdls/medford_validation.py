@@ -8,16 +8,12 @@ MEDFORD parser. Currently does not generate Diagnostic objects, only prints
 to the server's output.
 TODO: Parse medford errors into Diagnostics.
 """
-import sys
-from typing import List, Tuple
 
-from MEDFORD.medford import MFDMode as ValidationMode
-from MEDFORD.medford import ValidationError
-from MEDFORD.medford_BagIt import BagIt
+import logging
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
 from MEDFORD.medford_detail import detail
-from MEDFORD.medford_detailparser import detailparser
-from MEDFORD.medford_error_mngr import error_mngr, mfd_err
-from MEDFORD.medford_models import BCODMO, Entity
 from lsprotocol.types import (
     Diagnostic,
     DiagnosticSeverity,
@@ -27,6 +23,66 @@ from lsprotocol.types import (
 from pygls.workspace import Document
 
 from mfdls.medford_syntax import validate_syntax
+from mfdls.metrics import timed, timer
+from mfdls.parse_context import ParseContext
+from mfdls.span_map import LazySpans, LineKind, LineSpans, SpanMap
+
+# A semantic error boiled down to plain data (line number, error type, message,
+# and the tokens it is about, see _concerns), so that it can be sent between
+# processes.
+SemanticError = Tuple[int, str, str, Tuple[str, ...]]
+
+# The parser's exported representation of a document, which the models are
+# built from.
+ExportedDict = Dict[str, Any]
+
+# The semantic errors that are about a token, rather than about its value
+_TOKEN_ERRORS = ("missing_field", "incomplete_data")
+
+
+class ValidationMode(Enum):
+    """The modes the parser can validate in, mirroring MEDFORD.medford.MFDMode,
+    which cannot be imported without importing the rest of the parser"""
+
+    OTHER = "OTHER"
+    BCODMO = "BCODMO"
+    BAGIT = "BAGIT"
+
+    def __str__(self):
+        return self.value
+
+
+# The modes a document is validated in together, in the order they were asked
+# for, and the errors found in each of them
+Modes = Tuple[ValidationMode, ...]
+ModeErrors = Dict[ValidationMode, List[SemanticError]]
+
+
+def parse_modes(names: Union[str, Iterable[str]]) -> Modes:
+    """Reads the modes to validate in, as the client names them
+    Parameters: A mode's name, or a list of them, in any case
+       Returns: The modes, without duplicates
+       Effects: None
+         Notes: Raises ValueError if a name is not a mode, or there are none
+    """
+    if isinstance(names, str):
+        names = [names]
+    modes = tuple(dict.fromkeys(ValidationMode(str(name).upper()) for name in names))
+    if not modes:
+        raise ValueError("Expected at least one validation mode")
+    return modes
+
+
+def load_parser() -> None:
+    """Imports the parts of the parser that semantic validation needs. They
+    import pydantic and build the models, which takes long enough that the server
+    puts it off until after it has started.
+    Parameters: None
+       Returns: None
+       Effects: Imports the parser's models, detailparser and BagIt
+    """
+    # pylint: disable-next=C0415,W0611
+    import MEDFORD.medford
 
 
 def validate_data(
@@ -44,55 +100,254 @@ def validate_data(
     if not details:
         return (details, diagnostics)
 
-    err_mngr = error_mngr("ALL", "LINE")
-    parser = detailparser(details, err_mngr)
-    final_dict = parser.export()
+    return (details, validate_details(details, mode))
+
+
+def validate_details(
+    details: Sequence[detail], mode: ValidationMode
+) -> List[Diagnostic]:
+    """Performs a semantic validation on an already tokenized document
+    Parameters: The tokenized document, as returned by validate_syntax, and the
+                mode to validate in
+       Returns: A list of any Diagnostics that should be sent to the client
+       Effects: None
+    """
+    (_, errors) = semantic_validation(details, mode)
+    return semantic_errors_to_diagnostics(errors)
+
+
+def semantic_validation(
+    details: Sequence[detail], mode: ValidationMode
+) -> Tuple[ExportedDict, List[SemanticError]]:
+    """Performs a semantic validation on an already tokenized document
+    Parameters: The tokenized document, as returned by validate_syntax, and the
+                mode to validate in
+       Returns: A tuple containing the parser's exported dict and the errors
+                found, as plain data
+       Effects: Imports the rest of the parser, if it has not been already
+         Notes: Everything going in and out of this function can be pickled, so
+                it can be run in a worker process. The details can be compact
+                (see compact_details.py), detailparser builds the detail
+                objects as it goes through them.
+    """
+    (final_dict, errors) = validate_modes(details, (mode,))
+    return (final_dict, errors[mode])
+
+
+def validate_modes(
+    details: Sequence[detail], modes: Modes
+) -> Tuple[ExportedDict, ModeErrors]:
+    """Performs a semantic validation on an already tokenized document, in
+    several modes, from a single export
+    Parameters: The tokenized document, as returned by validate_syntax, and the
+                modes to validate in
+       Returns: A tuple containing the parser's exported dict and the errors
+                found in each mode, as plain data
+       Effects: Imports the rest of the parser, if it has not been already
+         Notes: See semantic_validation
+    """
+    final_dict = export_details(details)
+    return (final_dict, model_validation(final_dict, modes))
+
+
+def export_details(details: Sequence[detail]) -> ExportedDict:
+    """Exports a tokenized document the way the parser does, which is what the
+    models of every mode are built from
+    Parameters: The tokenized document, as returned by validate_syntax
+       Returns: The parser's exported dict
+       Effects: Imports the rest of the parser, if it has not been already
+    """
+    # pylint: disable-next=C0415
+    from MEDFORD.medford_detailparser import detailparser
+
+    # The parser prints what it finds, and stdout is the LSP's channel, so the
+    # parser runs in a context that captures its output
+    with ParseContext() as context:
+        with timer("phase/export"):
+            return detailparser(details, context.err_mngr).export()
 
-    # Pydantic is going to spew out an error here, it's the parser's job
-    # to parse it
+
+def model_validation(final_dict: ExportedDict, modes: Modes) -> ModeErrors:
+    """Builds the models of several modes from a document's exported dict, see
+    export_details
+    Parameters: The exported dict, and the modes to validate in
+       Returns: The errors found in each mode, as plain data
+       Effects: Imports the rest of the parser, if it has not been already
+         Notes: The models only read the exported dict, so it is shared between
+                the modes. With a single mode, whatever the parser raises is
+                raised, with several see mode_errors.
+    """
+    if len(modes) == 1:
+        return {modes[0]: _model_errors(final_dict, modes[0])}
+    return {mode: mode_errors(final_dict, mode) for mode in modes}
+
+
+def mode_errors(final_dict: ExportedDict, mode: ValidationMode) -> List[SemanticError]:
+    """Builds the model of one of several modes from a document's exported dict
+    Parameters: The exported dict, and the mode to validate in
+       Returns: The errors found, as plain data. If the parser can't validate the
+                document in the mode, that is a single error at the top of the
+                document, rather than something that hides the other modes'
+                errors.
+       Effects: Imports the rest of the parser, if it has not been already.
+                Failures are logged.
+    """
     try:
-        if mode == ValidationMode.BCODMO:
-            _ = BCODMO(**final_dict)
-        elif mode == ValidationMode.BAGIT:
-            _ = BagIt(**final_dict)
+        return _model_errors(final_dict, mode)
+    # pylint: disable-next=W0703
+    except Exception as err:
+        logging.warning(f"Could not validate in {mode} mode: {err!r}")
+        return [
+            (
+                -1,
+                "validation_failed",
+                f"Could not validate in {mode} mode: {err!r}",
+                (),
+            )
+        ]
+
+
+def _model_errors(
+    final_dict: ExportedDict, mode: ValidationMode
+) -> List[SemanticError]:
+    """Builds the model of a mode from a document's exported dict
+    Parameters: The exported dict, and the mode to validate in
+       Returns: The errors found, as plain data
+       Effects: Imports the rest of the parser, if it has not been already
+    """
+    # pylint: disable=C0415
+    from MEDFORD.medford import ValidationError
+    from MEDFORD.medford_BagIt import BagIt
+    from MEDFORD.medford_detailparser import detailparser
+    from MEDFORD.medford_models import BCODMO, Entity
+
+    with ParseContext() as context:
+        # Pydantic is going to spew out an error here, it's the parser's job
+        # to parse it
+        try:
+            with timer("phase/models"):
+                if mode == ValidationMode.BCODMO:
+                    _ = BCODMO(**final_dict)
+                elif mode == ValidationMode.BAGIT:
+                    _ = BagIt(**final_dict)
+                else:
+                    _ = Entity(**final_dict)
+
+        # parse_pydantic_errors loads the error manager's _error_collection with
+        # the errors it finds. It only needs a parser for the error manager, so
+        # each mode gets an empty one of its own.
+        except ValidationError as err:
+            with timer("phase/pydantic_errors"):
+                parser = detailparser([], context.err_mngr)
+                parser.parse_pydantic_errors(err, final_dict)
         else:
-            _ = Entity(**final_dict)
+            return []
+
+    logging.debug(f"Parser output: {context.output}")
+
+    errors = context.err_mngr.return_errors()
+
+    return [
+        (
+            error.line,
+            error.errtype,
+            error.msg,
+            tuple(getattr(error, "token_context", ())),
+        )
+        for error_list in errors.values()
+        for error in error_list
+    ]
+
 
-    # We have to do the stdout/stderr song and dance because parse_pydantic_errors
-    # prints to stdout and we need to keep that channel clear of non-LSP
-    # communication. parse_pydantic_errors loads the error manager's
-    # _error_collection with the errors it finds.
-    except ValidationError as err:
-        _helper = sys.stdout
-        sys.stdout = sys.stderr
-        parser.parse_pydantic_errors(err, final_dict)
-        sys.stdout = _helper
-    else:
-        return (details, [])
+def merge_mode_diagnostics(
+    diagnostics: Dict[ValidationMode, List[Diagnostic]], modes: Modes
+) -> List[Diagnostic]:
+    """Combines the semantic Diagnostics of several modes into one list
+    Parameters: The Diagnostics of each mode, and the modes to combine
+       Returns: The Diagnostics, in order of mode. With several modes, the same
+                Diagnostic found in more than one is only listed once, and each
+                Diagnostic's source names the modes it was found in.
+       Effects: None
+    """
+    if len(modes) == 1:
+        return diagnostics[modes[0]]
+
+    found: Dict[tuple, Tuple[Diagnostic, List[ValidationMode]]] = {}
+    for mode in modes:
+        # A mode can find the same error more than once, and each is only the
+        # same as the one found as many times before in another mode
+        seen: Dict[tuple, int] = {}
+        for diag in diagnostics[mode]:
+            (start, end) = (diag.range.start, diag.range.end)
+            key = (
+                start.line,
+                start.character,
+                end.line,
+                end.character,
+                diag.code,
+                diag.message,
+            )
+            seen[key] = seen.get(key, 0) + 1
+            found.setdefault(key + (seen[key],), (diag, []))[1].append(mode)
 
-    errors = parser.err_mngr.return_errors()
+    return [
+        Diagnostic(
+            range=diag.range,
+            severity=diag.severity,
+            code=diag.code,
+            source=f"MEDFORD ({', '.join(map(str, found_in))})",
+            message=diag.message,
+        )
+        for (diag, found_in) in found.values()
+    ]
 
-    diagnostics = []
 
-    for error_list in errors.values():
-        for error in error_list:
-            diagnostics.append(_parse_medford_error(error))
+@timed("phase/semantic_diagnostics")
+def semantic_errors_to_diagnostics(
+    errors: Iterable[SemanticError], spans: Optional[Union[SpanMap, LazySpans]] = None
+) -> List[Diagnostic]:
+    """Converts semantic errors to LSP Diagnostics
+    Parameters: The errors, as returned by semantic_validation, and the spans of
+                the document they were found in, if they are known
+       Returns: A Diagnostic for each error
+       Effects: None
+    """
+    return [_parse_medford_error(error, spans) for error in errors]
+
 
-    return (details, diagnostics)
+def _parse_medford_error(
+    err: SemanticError, spans: Optional[Union[SpanMap, LazySpans]]
+) -> Diagnostic:
 
+    (line, error_type, error_message, _) = err
+
+    # Errors the parser can't place are reported on line -1, put those at the top
+    line_number = max(line - 1, 0)
+
+    # Without spans, or if the line's token isn't the one the error is about,
+    # mark the entire line
+    diag_range = Range(
+        start=Position(line=line_number, character=0),
+        end=Position(line=line_number + 1, character=0),
+    )
 
-def _parse_medford_error(err: mfd_err) -> Diagnostic:
+    line_spans = spans[line_number] if spans is not None and line > 0 else None
+    if line_spans is not None and _concerns(line_spans, err):
+        # A field that is missing is missing from the token's block, anything
+        # else is wrong with the token's value
+        if error_type in _TOKEN_ERRORS or line_spans.value_start >= line_spans.end:
+            (start, end) = (line_spans.start, line_spans.token_end)
+        else:
+            (start, end) = (line_spans.value_start, line_spans.end)
 
-    line_number = err.line - 1
-    error_message = err.msg
-    error_type = err.errtype
+        diag_range = Range(
+            start=Position(line=line_number, character=start),
+            end=Position(line=line_number, character=end),
+        )
 
     # pylint: disable-next=R0801
     diag = Diagnostic(
-        range=Range(
-            start=Position(line=line_number, character=0),
-            end=Position(line=line_number + 1, character=0),
-        ),
+        range=diag_range,
         severity=DiagnosticSeverity.Error,
         code=error_type,
         source="MEDFORD",
@@ -100,3 +355,30 @@ def _parse_medford_error(err: mfd_err) -> Diagnostic:
     )
 
     return diag
+
+
+def _concerns(line_spans: LineSpans, err: SemanticError) -> bool:
+    """Checks whether an error is about the token on the line it is reported on
+    Parameters: The spans of the line, and the error
+       Returns: True if the line's token is the block a missing field is missing
+                from, or the field whose value is wrong
+       Effects: None
+     Notes: The parser reports some errors on another line than the field's,
+            like an invalid @MEDFORD-Version on the @MEDFORD line. Errors that
+            don't say which tokens they are about are matched by their message.
+    """
+    (_, error_type, error_message, tokens) = err
+    if line_spans.kind != LineKind.TOKEN:
+        return False
+
+    if not tokens:
+        name = line_spans.minor or line_spans.major
+        return bool(name) and name.lower() in error_message.lower()
+
+    # The tokens are the block's, then the field's for an error in a value. The
+    # value of the block's own line is its "desc" field.
+    if error_type in _TOKEN_ERRORS:
+        return "_".join(tokens) == line_spans.major and not line_spans.minor
+    return "_".join(tokens[:-1]) == line_spans.major and tokens[-1] == (
+        line_spans.minor or "desc"
+    )
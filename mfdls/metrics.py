@@ -0,0 +1,178 @@
+"""metrics.py
+
+On: October 2026
+
+Measures how long the server spends in each phase of validation (tokenizing,
+exporting, building the models, parsing pydantic's errors, converting errors
+to Diagnostics, publishing them) and in each LSP handler. Every measurement is
+kept in a rolling window per name, from which the latency percentiles are
+computed on demand.
+
+Phases that run on a validation worker are recorded in the worker and sent
+back with the results (see timed_call), so they end up in the server's
+windows like everything else.
+"""
+import asyncio
+import functools
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+# The number of measurements kept for each name
+WINDOW = 1024
+
+# Measurement names are "<kind>/<name>", so they can be grouped when reported
+PHASE = "phase"
+HANDLER = "handler"
+
+Sample = Tuple[str, float]
+
+
+class LatencyWindow:
+    """The most recent measurements of one phase or handler"""
+
+    def __init__(self, size: int = WINDOW):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, seconds: float) -> None:
+        """Records a measurement, dropping the oldest if the window is full"""
+        self._samples.append(seconds)
+        self.count += 1
+
+    def summary(self) -> Dict[str, float]:
+        """Summarizes the window
+        Parameters: None
+           Returns: The number of measurements ever taken, and the mean, 50th,
+                    95th and 99th percentiles and maximum of the window, in
+                    milliseconds
+           Effects: None
+        """
+        ordered = sorted(self._samples)
+        return {
+            "count": self.count,
+            "mean_ms": _ms(sum(ordered) / len(ordered)) if ordered else 0.0,
+            "p50_ms": _ms(_percentile(ordered, 0.50)),
+            "p95_ms": _ms(_percentile(ordered, 0.95)),
+            "p99_ms": _ms(_percentile(ordered, 0.99)),
+            "max_ms": _ms(ordered[-1]) if ordered else 0.0,
+        }
+
+
+_lock = threading.Lock()
+_windows: Dict[str, LatencyWindow] = {}
+
+# Where timed_call collects the measurements taken while it runs
+_recording = threading.local()
+
+
+def record(name: str, seconds: float) -> None:
+    """Records a measurement
+    Parameters: The measurement's name, "<kind>/<name>", and how long it took
+       Returns: None
+       Effects: Adds the measurement to its window
+    """
+    with _lock:
+        if name not in _windows:
+            _windows[name] = LatencyWindow()
+        _windows[name].add(seconds)
+
+    samples: Optional[List[Sample]] = getattr(_recording, "samples", None)
+    if samples is not None:
+        samples.append((name, seconds))
+
+
+@contextmanager
+def timer(name: str) -> Iterator[None]:
+    """Times the body of a with statement, even if it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    """A decorator that times every call of a function or coroutine function
+    Parameters: The measurement's name
+       Returns: The decorator
+       Effects: None
+         Notes: The wrapper keeps the wrapped function's signature, which pygls
+                looks at to decide whether to pass the server in.
+    """
+
+    def decorator(function: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with timer(name):
+                    return await function(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timer(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def timed_call(function: Callable[..., Any], *args: Any) -> Tuple[Any, List[Sample]]:
+    """Calls a function, collecting the measurements taken while it runs
+    Parameters: The function and its arguments
+       Returns: What the function returned, and the measurements
+       Effects: Calls the function
+         Notes: For validation workers, which send the measurements back to the
+                server to be recorded with merge.
+    """
+    _recording.samples = []
+    try:
+        return (function(*args), _recording.samples)
+    finally:
+        _recording.samples = None
+
+
+def merge(samples: List[Sample]) -> None:
+    """Records measurements taken somewhere else, see timed_call"""
+    for (name, seconds) in samples:
+        record(name, seconds)
+
+
+def stats() -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Summarizes every window
+    Parameters: None
+       Returns: The summaries, grouped by kind and then by name
+       Effects: None
+    """
+    grouped: Dict[str, Dict[str, Dict[str, float]]] = {PHASE: {}, HANDLER: {}}
+    with _lock:
+        for full_name in sorted(_windows):
+            (kind, _, name) = full_name.partition("/")
+            grouped.setdefault(kind, {})[name] = _windows[full_name].summary()
+    return grouped
+
+
+def reset() -> None:
+    """Forgets every measurement"""
+    with _lock:
+        _windows.clear()
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    """The nearest-rank percentile of a sorted list, 0 if it is empty"""
+    if not ordered:
+        return 0.0
+    rank = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def _ms(seconds: float) -> float:
+    """Converts seconds to milliseconds, rounded to the microsecond"""
+    return round(seconds * 1000, 3)
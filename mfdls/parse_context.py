@@ -0,0 +1,127 @@
+"""parse_context.py
+
+On: October 2026
+
+Isolates runs of the medford parser from one another, so that documents can be
+validated concurrently, on threads of one process. The parser keeps its macros
+in a dictionary on the detail class, shared by everything in the process, and
+prints what it finds while parsing pydantic's errors. A ParseContext gives each
+run its own macro dictionary, error manager and output:
+
+    with ParseContext() as context:
+        detail.FromLine(line, lineno, previous, context.err_mngr)
+
+The class's dictionary is replaced, once, by one that forwards to the context
+of the thread using it, and the parser's modules print into the context rather
+than to stdout (which is the LSP's channel). sys.stdout itself is left alone.
+Outside of a context, each thread gets a macro dictionary of its own, and the
+parser's output goes to stderr.
+"""
+import builtins
+import io
+import sys
+import threading
+from typing import Any, Dict, Iterator, MutableMapping, Optional, Tuple
+
+from MEDFORD.medford_detail import detail
+from MEDFORD.medford_error_mngr import error_mngr
+
+# A macro dictionary maps the macro's name to the line it was defined on
+# and its replacement text.
+MacroDict = Dict[str, Tuple[int, str]]
+
+# The parser's modules that print while validating. They are redirected as they
+# are imported, since some of them import the models, which is slow.
+_PRINTING_MODULES = ("MEDFORD.medford_error_mngr", "MEDFORD.medford_detailparser")
+
+_local = threading.local()
+
+
+class ParseContext:
+    """The state of a single run of the parser"""
+
+    def __init__(self, macros: Optional[MacroDict] = None):
+        self.macros: MacroDict = dict(macros) if macros else {}
+        self.err_mngr = error_mngr("ALL", "LINE")
+
+        # Where the parser prints to while the context is active
+        self.stream = io.StringIO()
+        self._previous: Optional[ParseContext] = None
+
+    @property
+    def output(self) -> str:
+        """What the parser printed while the context was active"""
+        return self.stream.getvalue()
+
+    def __enter__(self) -> "ParseContext":
+        _install()
+        self._previous = current()
+        _local.context = self
+        return self
+
+    def __exit__(self, *_exc_info: Any) -> None:
+        _local.context = self._previous
+        self._previous = None
+
+
+def current() -> Optional[ParseContext]:
+    """The context active on this thread, if there is one"""
+    return getattr(_local, "context", None)
+
+
+class _MacroDictionary(MutableMapping):
+    """Stands in for detail.macro_dictionary, forwarding to the macros of the
+    context active on the calling thread"""
+
+    @staticmethod
+    def _target() -> MacroDict:
+        context = current()
+        if context is not None:
+            return context.macros
+        if not hasattr(_local, "macros"):
+            _local.macros = {}
+        return _local.macros
+
+    def __getitem__(self, name: str) -> Tuple[int, str]:
+        return self._target()[name]
+
+    def __setitem__(self, name: str, value: Tuple[int, str]) -> None:
+        self._target()[name] = value
+
+    def __delitem__(self, name: str) -> None:
+        del self._target()[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._target())
+
+    def __len__(self) -> int:
+        return len(self._target())
+
+
+_MACROS = _MacroDictionary()
+
+
+def _print(*args: Any, **kwargs: Any) -> None:
+    """Stands in for print in the parser's modules, printing into the active
+    context, or to stderr outside of one"""
+    if kwargs.get("file") is None:
+        context = current()
+        kwargs["file"] = context.stream if context is not None else sys.stderr
+    builtins.print(*args, **kwargs)
+
+
+def _install() -> None:
+    """Redirects the parser's macro dictionary and output, if they aren't already
+    Parameters: None
+       Returns: None
+       Effects: Replaces detail.macro_dictionary, and print in the parser's
+                modules that have been imported
+    """
+    # The parser resets its dictionary by replacing it, so this is checked often
+    if detail.macro_dictionary is not _MACROS:
+        detail.macro_dictionary = _MACROS
+
+    for name in _PRINTING_MODULES:
+        module = sys.modules.get(name)
+        if module is not None and getattr(module, "print", None) is not _print:
+            setattr(module, "print", _print)
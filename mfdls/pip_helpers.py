@@ -3,11 +3,13 @@
 By: Liam Strand
 On: June 2022
 
-Provides an abstraction around running subprocesses that call pip
+Provides an abstraction around running subprocesses that call pip, and around
+looking up what pip has installed
 """
 
 import subprocess as sp
 import sys
+from functools import lru_cache
 
 
 def pip_install() -> bool:
@@ -75,3 +77,21 @@ def pip_uninstall() -> bool:
         return False
     else:
         return True
+
+
+@lru_cache(maxsize=None)
+def installed_version(package: str) -> str:
+    """Looks up the installed version of a package
+    Parameters: The name of the package
+       Returns: The version, or "unknown" if the package was not installed with pip
+       Effects: None
+         Notes: importlib.metadata takes a while to import, so it is only imported
+                the first time a version is needed.
+    """
+    # pylint: disable-next=C0415
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version(package)
+    except PackageNotFoundError:
+        return "unknown"
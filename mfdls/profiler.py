@@ -0,0 +1,182 @@
+"""profiler.py
+
+On: October 2026
+
+Profiles the server on demand, so slow cases can be captured from the session
+they happen in rather than reproduced. While profiling is on, each handler
+call and each semantic validation runs under cProfile, and its statistics are
+written to a .pstats file of its own, named after the handler:
+
+    textDocument_hover-1760760000123-4.pstats
+
+The files can be read with pstats, or with snakeviz and the like. Profiling
+stays on for a number of profiles, for a number of seconds, or both (whichever
+runs out first), or indefinitely if neither is given.
+
+Semantic validation usually runs on a worker process, so the worker profiles
+it and writes the file itself (see profiled_call). Coroutine handlers are not
+profiled: their time is spent waiting, and the work they wait on is profiled
+where it runs.
+"""
+import asyncio
+import cProfile
+import functools
+import itertools
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from mfdls.token_cache import cache_dir
+
+_lock = threading.Lock()
+_counter = itertools.count()
+
+
+# pylint: disable-next=R0903
+class _Session:
+    """Where profiles go, and how much is left to profile. Only used with _lock
+    held."""
+
+    def __init__(self) -> None:
+        # Profiling is on while the directory is set, and until the budget runs
+        # out
+        self.directory: Optional[Path] = None
+        self.remaining: Optional[int] = None
+        self.deadline: Optional[float] = None
+        self.written = 0
+
+    def active(self) -> bool:
+        """Determines if profiling is on"""
+        if self.directory is None:
+            return False
+        if self.remaining is not None and self.remaining <= 0:
+            return False
+        return self.deadline is None or time.monotonic() < self.deadline
+
+
+_session = _Session()
+
+# cProfile can only run one profiler at a time
+_busy = threading.local()
+
+
+def default_directory() -> Path:
+    """Where profiles go if no directory is given"""
+    return cache_dir() / "profiles"
+
+
+def start(
+    requests: Optional[int] = None,
+    seconds: Optional[float] = None,
+    directory: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Turns profiling on
+    Parameters: The number of profiles to take, the number of seconds to
+                profile for, and the directory to write them to. Profiling
+                stops when either limit runs out, or never if neither is given.
+       Returns: The profiler's status, see status
+       Effects: Creates the directory
+    """
+    path = Path(directory) if directory else default_directory()
+    path.mkdir(parents=True, exist_ok=True)
+
+    with _lock:
+        _session.directory = path
+        _session.remaining = requests
+        _session.deadline = time.monotonic() + seconds if seconds is not None else None
+        _session.written = 0
+    return status()
+
+
+def stop() -> Dict[str, Any]:
+    """Turns profiling off
+    Parameters: None
+       Returns: The profiler's status, see status
+       Effects: None
+    """
+    with _lock:
+        _session.directory = None
+    return status()
+
+
+def status() -> Dict[str, Any]:
+    """Reports on the profiler
+    Parameters: None
+       Returns: Whether profiling is on, where the profiles go, how many have
+                been written, and how many profiles and seconds are left
+       Effects: None
+    """
+    with _lock:
+        active = _session.active()
+        deadline = _session.deadline
+        return {
+            "active": active,
+            "directory": str(_session.directory) if _session.directory else None,
+            "written": _session.written,
+            "remaining": _session.remaining if active else None,
+            "seconds": max(0.0, deadline - time.monotonic())
+            if active and deadline is not None
+            else None,
+        }
+
+
+def claim(name: str) -> Optional[str]:
+    """Decides whether to profile something, and where its profile goes
+    Parameters: The name of what is about to run
+       Returns: The path to write its profile to, or None if profiling is off
+       Effects: Counts the profile against the budget
+    """
+    with _lock:
+        directory = _session.directory
+        if not _session.active() or directory is None:
+            return None
+        if _session.remaining is not None:
+            _session.remaining -= 1
+        _session.written += 1
+
+        stamp = int(time.time() * 1000)
+        safe = name.replace("/", "_").replace("$", "")
+        return str(directory / f"{safe}-{stamp}-{next(_counter)}.pstats")
+
+
+def profiled(name: str) -> Callable[[Callable], Callable]:
+    """A decorator that profiles a function's calls while profiling is on
+    Parameters: The name to give its profiles
+       Returns: The decorator, which leaves coroutine functions alone
+       Effects: None
+    """
+
+    def decorator(function: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(function):
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            path = None if getattr(_busy, "on", False) else claim(name)
+            if path is None:
+                return function(*args, **kwargs)
+            return profiled_call(path, function, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def profiled_call(path: str, function: Callable[..., Any], *args, **kwargs) -> Any:
+    """Calls a function under cProfile and writes out its profile
+    Parameters: The path to write the profile to, the function and its arguments
+       Returns: What the function returned
+       Effects: Writes the profile, failures are logged
+    """
+    profile = cProfile.Profile()
+    _busy.on = True
+    try:
+        return profile.runcall(function, *args, **kwargs)
+    finally:
+        _busy.on = False
+        try:
+            profile.dump_stats(path)
+        except OSError as err:
+            logging.warning(f"Could not write the profile {path}: {err}")
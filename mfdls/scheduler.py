@@ -0,0 +1,93 @@
+"""scheduler.py
+
+On: October 2026
+
+Coalesces the validation requests for each document. Every edit to a document
+reschedules its validation, so a burst of keystrokes only validates the
+document once, after the burst has settled down. Scheduling a validation
+cancels any validation of the same document that has not finished yet, and
+the scheduler remembers the latest version of each document so that results
+computed for an older version are never published.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional
+
+# The validation coroutine is given the document's uri and the version of the
+# document that the validation was scheduled for.
+Validator = Callable[[str, Optional[int]], Awaitable[None]]
+
+# Default time to wait for more edits before validating, in seconds
+DEFAULT_DEBOUNCE = 0.3
+
+
+class ValidationScheduler:
+    """Schedules at most one validation per document at a time"""
+
+    def __init__(self, validate: Validator, debounce: float = DEFAULT_DEBOUNCE):
+        self.debounce = debounce
+        self._validate = validate
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._latest: Dict[str, Optional[int]] = {}
+
+    def schedule(
+        self, uri: str, version: Optional[int], delay: Optional[float] = None
+    ) -> asyncio.Future:
+        """Schedules a validation of a document, superseding any previous one
+        Parameters: The document's uri and version, and how long to wait before
+                    validating (the scheduler's debounce by default)
+           Returns: The future that will run the validation
+           Effects: Cancels any pending or running validation of the document
+        """
+        self.cancel(uri)
+        self._latest[uri] = version
+
+        if delay is None:
+            delay = self.debounce
+
+        future = asyncio.ensure_future(self._run(uri, version, delay))
+        self._pending[uri] = future
+        future.add_done_callback(lambda done: self._forget(uri, done))
+
+        return future
+
+    def pending(self, uri: str) -> Optional[asyncio.Future]:
+        """The validation of a document that has not finished yet, if any"""
+        return self._pending.get(uri)
+
+    def cancel(self, uri: str) -> None:
+        """Cancels the pending or running validation of a document, if any
+        Parameters: The document's uri
+           Returns: None
+           Effects: Cancels the validation
+        """
+        future = self._pending.pop(uri, None)
+        if future is not None:
+            future.cancel()
+
+    def close(self, uri: str) -> None:
+        """Forgets a document entirely
+        Parameters: The document's uri
+           Returns: None
+           Effects: Cancels the document's validation and forgets its version
+        """
+        self.cancel(uri)
+        self._latest.pop(uri, None)
+
+    def is_latest(self, uri: str, version: Optional[int]) -> bool:
+        """Determines if a version of a document is the most recently scheduled one
+        Parameters: The document's uri and version
+           Returns: True if results for this version may still be published
+           Effects: None
+        """
+        return self._latest.get(uri) == version
+
+    async def _run(self, uri: str, version: Optional[int], delay: float) -> None:
+        """Waits out the debounce, then validates the document"""
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self._validate(uri, version)
+
+    def _forget(self, uri: str, future: asyncio.Future) -> None:
+        """Drops a finished validation, unless it has already been superseded"""
+        if self._pending.get(uri) is future:
+            del self._pending[uri]
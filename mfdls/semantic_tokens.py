@@ -0,0 +1,215 @@
+"""semantic_tokens.py
+
+On: October 2026
+
+Encodes the spans of a document (see span_map.py) as LSP semantic tokens, so
+clients can highlight MEDFORD without a grammar of their own: major tokens as
+keywords, minor tokens as properties, macro definitions and references as
+macros, comment lines as comments and template markers as strings.
+
+Each line's tokens are encoded on their own and kept, so that a new version of
+a document only re-encodes the lines that changed. The encoding of the last
+response is kept too, so a delta request is answered with a single edit that
+covers the changed lines, instead of the whole array.
+"""
+import itertools
+from typing import Iterable, List, Optional, Tuple, Union
+
+from lsprotocol.types import (
+    SemanticTokenModifiers,
+    SemanticTokens,
+    SemanticTokensDelta,
+    SemanticTokensEdit,
+    SemanticTokensLegend,
+    SemanticTokenTypes,
+)
+
+from mfdls.span_map import LineKind, LineSpans, SpanMap
+
+TOKEN_TYPES = [
+    SemanticTokenTypes.Keyword,
+    SemanticTokenTypes.Property,
+    SemanticTokenTypes.Macro,
+    SemanticTokenTypes.Comment,
+    SemanticTokenTypes.String,
+]
+TOKEN_MODIFIERS = [SemanticTokenModifiers.Declaration]
+
+LEGEND = SemanticTokensLegend(
+    token_types=[token_type.value for token_type in TOKEN_TYPES],
+    token_modifiers=[modifier.value for modifier in TOKEN_MODIFIERS],
+)
+
+(_KEYWORD, _PROPERTY, _MACRO, _COMMENT, _STRING) = range(len(TOKEN_TYPES))
+_DECLARATION = 1 << TOKEN_MODIFIERS.index(SemanticTokenModifiers.Declaration)
+
+_TEMPLATE_LENGTH = len("[..]")
+
+# A line's tokens, as the LSP encodes them (5 integers a token), except that
+# the first token's line and character are relative to the start of the line
+Row = Tuple[int, ...]
+
+
+class SemanticTokenCache:
+    """The semantic tokens of a single document, and the last response sent"""
+
+    def __init__(self) -> None:
+        self._rows: List[Row] = []
+        self._counter = itertools.count(1)
+
+        # The id of the last response, None until the first
+        self.result_id: Optional[str] = None
+
+    def full(self, spans: SpanMap) -> SemanticTokens:
+        """Encodes the whole document
+        Parameters: The document's spans, up to date
+           Returns: The semantic tokens
+           Effects: Re-encodes the lines that changed, and starts a new result
+        """
+        self._update(spans)
+        self.result_id = str(next(self._counter))
+        return SemanticTokens(data=_flatten(self._rows), result_id=self.result_id)
+
+    def delta(
+        self, spans: SpanMap, previous_result_id: str
+    ) -> Union[SemanticTokens, SemanticTokensDelta]:
+        """Encodes the changes to the document since a previous response
+        Parameters: The document's spans, up to date, and the id of the response
+                    the client has
+           Returns: The edit that brings the client's tokens up to date, or all
+                    of the tokens if the client's are not the last response's
+           Effects: Re-encodes the lines that changed, and starts a new result
+        """
+        if self.result_id is None or previous_result_id != self.result_id:
+            return self.full(spans)
+
+        old_rows = self._rows
+        changes = self._update(spans)
+        self.result_id = str(next(self._counter))
+        if changes is None:
+            return SemanticTokensDelta(edits=[], result_id=self.result_id)
+
+        (prefix, old_end, new_end) = changes
+
+        # The first line with tokens after the change is encoded relative to
+        # the last line with tokens before it, which may have moved
+        old_next = _next_row(old_rows, old_end)
+        new_next = old_next + (new_end - old_end)
+
+        edit = SemanticTokensEdit(
+            start=sum(map(len, old_rows[:prefix])),
+            delete_count=sum(map(len, old_rows[prefix:old_next])),
+            data=_flatten(
+                self._rows[prefix:new_next], prefix, _last_row(self._rows, prefix)
+            ),
+        )
+        return SemanticTokensDelta(edits=[edit], result_id=self.result_id)
+
+    def _update(self, spans: SpanMap) -> Optional[Tuple[int, int, int]]:
+        """Re-encodes the lines that changed since the last update
+        Parameters: The document's spans
+           Returns: The region that changed, see span_map.changed_region, or None
+                    if nothing did
+           Effects: Updates the rows
+        """
+        changes = spans.take_changes()
+        expected = len(self._rows)
+        if changes is not None:
+            expected += changes[2] - changes[1]
+
+        if self.result_id is None or expected != len(spans):
+            # Nothing to go on, or the rows have fallen out of step with the spans
+            old_length = len(self._rows)
+            self._rows = [encode_line(spans[line]) for line in range(len(spans))]
+            return (0, old_length, len(self._rows))
+
+        if changes is not None:
+            (prefix, old_end, new_end) = changes
+            self._rows = (
+                self._rows[:prefix]
+                + [encode_line(spans[line]) for line in range(prefix, new_end)]
+                + self._rows[old_end:]
+            )
+        return changes
+
+
+def encode_range(lines: Iterable[LineSpans], first_line: int) -> SemanticTokens:
+    """Encodes some of the lines of a document, for a range request. Ranges are
+    not kept, and don't start a new result.
+    Parameters: The spans of the lines, and the line the first of them is on
+       Returns: The lines' semantic tokens
+       Effects: None
+    """
+    return SemanticTokens(data=_flatten(list(map(encode_line, lines)), first_line))
+
+
+def encode_line(spans: LineSpans) -> Row:
+    """Encodes the tokens on a line
+    Parameters: The line's spans
+       Returns: The line's tokens, see Row
+       Effects: None
+    """
+    tokens: List[Tuple[int, int, int, int]] = []
+
+    if spans.kind == LineKind.COMMENT:
+        tokens.append((spans.start, spans.end - spans.start, _COMMENT, 0))
+
+    elif spans.kind == LineKind.MACRO:
+        tokens.append(
+            (spans.start, spans.token_end - spans.start, _MACRO, _DECLARATION)
+        )
+
+    elif spans.kind == LineKind.TOKEN:
+        tokens.append((spans.start, spans.major_end - spans.start, _KEYWORD, 0))
+        if spans.token_end > spans.major_end:
+            tokens.append(
+                (spans.major_end, spans.token_end - spans.major_end, _PROPERTY, 0)
+            )
+        tokens.extend(
+            (reference.start, reference.end - reference.start, _MACRO, 0)
+            for reference in spans.macros
+        )
+
+    tokens.extend((start, _TEMPLATE_LENGTH, _STRING, 0) for start in spans.templates)
+    tokens.sort()
+
+    row: List[int] = []
+    previous = 0
+    for (start, length, token_type, modifiers) in tokens:
+        if length > 0:
+            row.extend((0, start - previous, length, token_type, modifiers))
+            previous = start
+    return tuple(row)
+
+
+def _flatten(rows: List[Row], first_line: int = 0, last_line: int = 0) -> List[int]:
+    """Joins rows into the LSP's encoding
+    Parameters: The rows, the line the first of them is on, and the last line
+                with tokens before it (or 0)
+       Returns: The rows' tokens, each relative to the one before
+       Effects: None
+    """
+    data: List[int] = []
+    for (line, row) in enumerate(rows, first_line):
+        if row:
+            data.append(line - last_line)
+            data.extend(row[1:])
+            last_line = line
+    return data
+
+
+def _next_row(rows: List[Row], line: int) -> int:
+    """The end of the first row with tokens from a line on, or the last row"""
+    while line < len(rows):
+        if rows[line]:
+            return line + 1
+        line += 1
+    return line
+
+
+def _last_row(rows: List[Row], line: int) -> int:
+    """The last line with tokens before a line, or 0 if there is none"""
+    line -= 1
+    while line > 0 and not rows[line]:
+        line -= 1
+    return max(line, 0)
@@ -8,43 +8,144 @@ markup language. Validation is provided by Polina Shpilker's parser. LSP
 bindings are provided by the pygls library.
 
 """
+import asyncio
+import json
 import logging
-from typing import Optional, Union
+import os
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
 
 from lsprotocol.types import (
+    INITIALIZE,
+    INITIALIZED,
     TEXT_DOCUMENT_COMPLETION,
+    TEXT_DOCUMENT_DEFINITION,
+    TEXT_DOCUMENT_DIAGNOSTIC,
+    TEXT_DOCUMENT_DOCUMENT_SYMBOL,
     TEXT_DOCUMENT_HOVER,
     TEXT_DOCUMENT_DID_CHANGE,
+    TEXT_DOCUMENT_DID_CLOSE,
     TEXT_DOCUMENT_DID_OPEN,
     TEXT_DOCUMENT_DID_SAVE,
+    TEXT_DOCUMENT_PUBLISH_DIAGNOSTICS,
+    TEXT_DOCUMENT_REFERENCES,
+    TEXT_DOCUMENT_SEMANTIC_TOKENS_FULL,
+    TEXT_DOCUMENT_SEMANTIC_TOKENS_FULL_DELTA,
+    TEXT_DOCUMENT_SEMANTIC_TOKENS_RANGE,
+    WORKSPACE_DIAGNOSTIC,
+    WORKSPACE_DIAGNOSTIC_REFRESH,
+    WORKSPACE_DID_CHANGE_CONFIGURATION,
+    WORKSPACE_DID_CHANGE_WATCHED_FILES,
+    WORKSPACE_SYMBOL,
 )
 from lsprotocol.types import (
     CompletionList,
     CompletionOptions,
     CompletionParams,
+    DefinitionParams,
+    Diagnostic,
+    DiagnosticOptions,
+    DidChangeConfigurationParams,
     DidChangeTextDocumentParams,
+    DidChangeWatchedFilesParams,
+    DidChangeWatchedFilesRegistrationOptions,
+    DidCloseTextDocumentParams,
     DidOpenTextDocumentParams,
     DidSaveTextDocumentParams,
+    DocumentDiagnosticParams,
+    DocumentDiagnosticReport,
+    DocumentSymbol,
+    DocumentSymbolParams,
+    FileChangeType,
+    FileSystemWatcher,
     Hover,
     HoverParams,
+    InitializeParams,
+    InitializedParams,
+    Location,
+    Position,
+    PublishDiagnosticsParams,
+    Range,
+    ReferenceParams,
+    Registration,
+    RegistrationParams,
+    RelatedFullDocumentDiagnosticReport,
+    RelatedUnchangedDocumentDiagnosticReport,
+    SemanticTokens,
+    SemanticTokensDelta,
+    SemanticTokensDeltaParams,
+    SemanticTokensParams,
+    SemanticTokensRangeParams,
+    SymbolInformation,
+    TextDocumentSyncKind,
+    WorkDoneProgressBegin,
+    WorkDoneProgressEnd,
+    WorkDoneProgressReport,
+    WorkspaceDiagnosticParams,
+    WorkspaceDiagnosticReport,
+    WorkspaceDocumentDiagnosticReport,
+    WorkspaceFullDocumentDiagnosticReport,
+    WorkspaceSymbolParams,
+    WorkspaceUnchangedDocumentDiagnosticReport,
 )
 from pygls.server import LanguageServer
+from pygls.uris import from_fs_path, to_fs_path
+from pygls.workspace import Document
 
-from mfdls.completions import (
-    NO_COMPLETIONS,
-    generate_macro_list,
-    generate_major_token_list,
-    generate_minor_token_list,
-    is_requesting_minor_token,
+from mfdls.compact_details import CompactDetails
+from mfdls.completions import NO_COMPLETIONS, generate_macro_list, generate_token_list
+from mfdls.document_state import (
+    DocumentState,
+    DocumentStore,
+    diagnostic_result_id,
+    hash_source,
 )
 from mfdls.hover import resolve_hover
-from mfdls.medford_syntax import validate_syntax
-from mfdls.medford_tokens import get_available_tokens
-from mfdls.medford_validation import ValidationMode, validate_data
+from mfdls.line_source import LineIndex
+from mfdls.macro_index import Place, macro_at
+from mfdls.medford_incremental import IncrementalTokenizer
+from mfdls.medford_syntax import validate_window
+from mfdls.medford_validation import (
+    Modes,
+    ValidationMode,
+    load_parser,
+    merge_mode_diagnostics,
+    parse_modes,
+    semantic_errors_to_diagnostics,
+)
+from mfdls.scheduler import ValidationScheduler
+from mfdls.semantic_tokens import LEGEND, SemanticTokenCache, encode_range
+from mfdls import metrics, profiler
+from mfdls.span_map import BLANK_LINE, LineSpans, SpanMap, scan_line
+from mfdls.symbol_index import SymbolIndex, load_index
+from mfdls.symbols import Symbol, document_symbols, outline
+from mfdls.token_cache import load_available_tokens
+from mfdls.token_index import TokenIndex
+from mfdls.validation_cache import CachedValidation, ValidationCache
+from mfdls.validation_pool import ValidationPool
+from mfdls.workspace import (
+    MEDFORD_EXTENSION,
+    FileResult,
+    batches,
+    find_medford_files,
+    hash_files,
+    validate_files,
+)
 
 # Set up logging to pygls.log
 logging.basicConfig(filename="pygls.log", filemode="w", level=logging.WARNING)
 
+# The periodic statistics are informational, but still wanted in the log
+_stats_logger = logging.getLogger("mfdls.stats")
+_stats_logger.setLevel(logging.INFO)
+
+# Documents at least this big (in characters) are too slow to tokenize on the
+# event loop. The lines the client is showing are validated first, and the
+# document is tokenized in the background.
+LARGE_DOCUMENT_SIZE = 16 * 1024 * 1024
+
 
 class MEDFORDLanguageServer(LanguageServer):
     """An object we can pass around that contains the connection to the text
@@ -53,125 +154,1199 @@ class MEDFORDLanguageServer(LanguageServer):
 
     #### COMMANDS ####
 
+    CMD_CACHE_STATS = "medford/cacheStats"
+    CMD_PROFILE = "medford/profile"
+    CMD_SET_VALIDATION_MODES = "medford/setValidationModes"
+    CMD_STATS = "medford/stats"
+    CMD_VALIDATE_WORKSPACE = "medford/validateWorkspace"
+
     #### LS CONSTANTS ####
 
     CONFIGURATION_SECTION = "medfordServer"
 
     def __init__(self):
-        self.validation_mode = ValidationMode.OTHER
-        self.macros = {}
-        self.tokens = get_available_tokens()
+        # The modes documents are validated in, together, see
+        # set_validation_modes
+        self.validation_modes: Modes = (ValidationMode.OTHER,)
+        self._tokens: Optional[TokenIndex] = None
+        self.documents = DocumentStore()
+        self.cache = ValidationCache()
+        self.scheduler = ValidationScheduler(
+            lambda uri, version: _generate_semantic_diagnostics(self, uri, version)
+        )
+        self.pool = ValidationPool()
+
+        # Workspace sweeps get a pool of their own, as big as the machine allows,
+        # so they don't hold up the validation of the documents being edited.
+        self.workspace_workers = os.cpu_count() or 1
+
+        self._stats_log: Optional[asyncio.Future] = None
+
+        # Clients that pull Diagnostics (textDocument/diagnostic) don't get them
+        # pushed as well. The Diagnostics last pulled for each closed file are
+        # kept, with their result ids, so unchanged files needn't be validated.
+        self.pull_diagnostics = False
+        self.file_diagnostics: Dict[str, Tuple[str, List[Diagnostic]]] = {}
+
+        # A fingerprint of the Diagnostics last published for each uri, and how
+        # many publishes were sent, and skipped because nothing had changed
+        self._published: Dict[str, int] = {}
+        self.publishes = {"sent": 0, "skipped": 0}
+
+        # Where medford/profile writes the profiles, if the request doesn't say
+        self.profile_directory: Optional[str] = None
+
+        self.large_document_size = LARGE_DOCUMENT_SIZE
+
+        # The symbols of the MEDFORD files in the workspace, loaded off of the
+        # event loop when the client connects, see symbol_index.py
+        self.symbol_index: Optional[asyncio.Future] = None
+
         super().__init__("mfdls", "0.1.1")
 
+        # The tokenizers only retokenize the lines that changed, so there is
+        # no reason for the client to send us the whole document every time.
+        self.sync_kind = TextDocumentSyncKind.Incremental
+
+    @property
+    def tokens(self) -> TokenIndex:
+        """The token index, built the first time it is needed"""
+        if self._tokens is None:
+            self._tokens = TokenIndex(load_available_tokens())
+        return self._tokens
+
+    def warm_up(self) -> None:
+        """Loads the slow parts of the server in the background: the token index,
+        and the parser if validation is done in this process
+        Parameters: None
+           Returns: None
+           Effects: Starts a daemon thread to do the loading
+        """
+
+        def load() -> None:
+            _ = self.tokens
+            if self.pool.workers <= 0:
+                load_parser()
+
+        threading.Thread(target=load, name="mfdls-warm-up", daemon=True).start()
+
+    def configure(self, settings: Any) -> None:
+        """Applies the client's settings to the server
+        Parameters: The settings, either the medfordServer section itself or an
+                    object containing it
+           Returns: None
+           Effects: Updates the server's configuration
+        """
+        if not isinstance(settings, dict):
+            return
+        settings = settings.get(self.CONFIGURATION_SECTION, settings)
+
+        if "debounce" in settings:
+            # The client speaks milliseconds, the scheduler speaks seconds
+            self.scheduler.debounce = max(0.0, float(settings["debounce"]) / 1000)
+
+        if "validationWorkers" in settings:
+            self.pool.resize(int(settings["validationWorkers"]))
+
+        if "validationThreads" in settings:
+            self.pool.resize(self.pool.workers, bool(settings["validationThreads"]))
+
+        if "workspaceWorkers" in settings:
+            self.workspace_workers = max(0, int(settings["workspaceWorkers"]))
+
+        if "statsLogInterval" in settings:
+            # In seconds
+            self.log_stats_every(float(settings["statsLogInterval"]))
+
+        if "profileDirectory" in settings:
+            self.profile_directory = settings["profileDirectory"] or None
+
+        if "maxDocuments" in settings:
+            self.documents.max_documents = max(1, int(settings["maxDocuments"]))
+
+        if "validationCacheSize" in settings:
+            self.cache.max_entries = int(settings["validationCacheSize"])
+
+        if "maxDocumentMemory" in settings:
+            # In megabytes
+            self.documents.max_bytes = int(settings["maxDocumentMemory"]) * 1024 * 1024
+
+        if "largeDocumentSize" in settings:
+            # In megabytes
+            self.large_document_size = int(settings["largeDocumentSize"]) * 1024 * 1024
+
+        if "validationModes" in settings:
+            # A mode, or a list of them
+            self.set_validation_modes(parse_modes(settings["validationModes"]))
+
+    def set_validation_modes(self, modes: Modes) -> None:
+        """Changes the modes documents are validated in
+        Parameters: The new modes
+           Returns: None
+           Effects: Revalidates the open documents right away, or has a client
+                    that pulls Diagnostics pull them again. Documents that were
+                    validated since they last changed are not parsed again, see
+                    _generate_semantic_diagnostics.
+        """
+        if modes == self.validation_modes:
+            return
+        self.validation_modes = modes
+
+        # The workspace only exists once the client has connected
+        if self.workspace is None:
+            return
+
+        for uri in list(self.workspace.documents):
+            version = self.workspace.get_document(uri).version
+            self.scheduler.schedule(uri, version, delay=0)
+
+        if self.pull_diagnostics:
+            workspace = self.client_capabilities.workspace
+            diagnostics = workspace.diagnostics if workspace else None
+            if diagnostics and diagnostics.refresh_support:
+                self.lsp.send_request(WORKSPACE_DIAGNOSTIC_REFRESH)
+
+    def stats(self) -> dict:
+        """The latency percentiles of each validation phase and LSP handler, and
+        the number of diagnostic publishes sent and skipped"""
+        return {**metrics.stats(), "publishes": dict(self.publishes)}
+
+    def forget_published(self, uri: str) -> None:
+        """Forgets the Diagnostics published for a document, so the next ones are
+        sent even if they are the same"""
+        self._published.pop(uri, None)
+
+    def log_stats_every(self, interval: float) -> None:
+        """Logs the latency statistics periodically, as a line of JSON
+        Parameters: The time between log lines in seconds, 0 to stop logging
+           Returns: None
+           Effects: Replaces the logging task, if there was one
+        """
+        if self._stats_log is not None:
+            self._stats_log.cancel()
+            self._stats_log = None
+
+        if interval > 0:
+            self._stats_log = asyncio.ensure_future(_log_stats(self, interval))
+
+    def shutdown(self):
+        """Shuts down the server, and the validation workers with it"""
+        self.log_stats_every(0)
+        self.pool.shutdown()
+        super().shutdown()
+
+    def publish_diagnostics(
+        self, doc_uri: str, diagnostics: List[Diagnostic], version: Optional[int] = None
+    ):
+        """Sends diagnostic notification to the client, tagged with the version
+        of the document they were generated from, unless the client pulls them."""
+        if self.pull_diagnostics:
+            return
+
+        # While typing inside a value the Diagnostics rarely change, and there
+        # is no point sending (or even serializing) the same ones again
+        fingerprint = _fingerprint(diagnostics)
+        if self._published.get(doc_uri) == fingerprint:
+            self.publishes["skipped"] += 1
+            return
+        self._published[doc_uri] = fingerprint
+        self.publishes["sent"] += 1
+
+        with metrics.timer("phase/publish"):
+            self.lsp.notify(
+                TEXT_DOCUMENT_PUBLISH_DIAGNOSTICS,
+                PublishDiagnosticsParams(
+                    uri=doc_uri, diagnostics=diagnostics, version=version
+                ),
+            )
+
+
+def _handler(name: str) -> Callable[[Callable], Callable]:
+    """A decorator that times an LSP handler, and profiles it when asked to"""
+
+    def decorator(function: Callable) -> Callable:
+        return metrics.timed(f"handler/{name}")(profiler.profiled(name)(function))
+
+    return decorator
+
 
 medford_server = MEDFORDLanguageServer()
 
 #### #### #### LSP METHODS #### #### ####
 
 
+@medford_server.feature(INITIALIZE)
+@_handler(INITIALIZE)
+def initialize(ls: MEDFORDLanguageServer, params: InitializeParams):
+    """Initialize request, after the server has built its capabilities."""
+    ls.configure(params.initialization_options)
+
+    # pygls doesn't build the pull diagnostics capability itself
+    ls.server_capabilities.diagnostic_provider = DiagnosticOptions(
+        inter_file_dependencies=False, workspace_diagnostics=True
+    )
+    text_document = params.capabilities.text_document
+    ls.pull_diagnostics = bool(text_document and text_document.diagnostic)
+
+
+@medford_server.feature(INITIALIZED)
+@_handler(INITIALIZED)
+def initialized(ls: MEDFORDLanguageServer, _params: InitializedParams):
+    """Initialized notification. The handshake is done, so it is time to load
+    what was put off to answer it quickly."""
+    ls.warm_up()
+    _get_symbol_index(ls)
+
+    # Files changed outside of the editor are outlined again for the symbol
+    # index, if the client can watch them for us
+    workspace = ls.client_capabilities.workspace
+    watched = workspace and workspace.did_change_watched_files
+    if watched and watched.dynamic_registration:
+        ls.register_capability(
+            RegistrationParams(
+                registrations=[
+                    Registration(
+                        id=str(uuid.uuid4()),
+                        method=WORKSPACE_DID_CHANGE_WATCHED_FILES,
+                        register_options=DidChangeWatchedFilesRegistrationOptions(
+                            watchers=[
+                                FileSystemWatcher(
+                                    glob_pattern=f"**/*{MEDFORD_EXTENSION}"
+                                )
+                            ]
+                        ),
+                    )
+                ]
+            )
+        )
+
+
+@medford_server.feature(WORKSPACE_DID_CHANGE_CONFIGURATION)
+@_handler(WORKSPACE_DID_CHANGE_CONFIGURATION)
+def did_change_configuration(
+    ls: MEDFORDLanguageServer, params: DidChangeConfigurationParams
+):
+    """Workspace did change configuration notification."""
+    ls.configure(params.settings)
+
+
+@medford_server.feature(WORKSPACE_DID_CHANGE_WATCHED_FILES)
+@_handler(WORKSPACE_DID_CHANGE_WATCHED_FILES)
+async def did_change_watched_files(
+    ls: MEDFORDLanguageServer, params: DidChangeWatchedFilesParams
+):
+    """Workspace did change watched files notification."""
+    index = await _get_symbol_index(ls)
+    for change in params.changes:
+        path = to_fs_path(change.uri)
+        if not path or not path.endswith(MEDFORD_EXTENSION):
+            continue
+        if change.type == FileChangeType.Deleted:
+            index.remove(path)
+        else:
+            index.update(path)
+
+
 @medford_server.feature(TEXT_DOCUMENT_DID_CHANGE)
+@_handler(TEXT_DOCUMENT_DID_CHANGE)
 def did_change(ls: MEDFORDLanguageServer, params: DidChangeTextDocumentParams):
     """Text document did change notification."""
-    _generate_semantic_diagnostics(ls, params)
+    # Tokenizing is incremental and quick, so syntax errors are shown right away.
+    # The semantic validation waits for the edits to settle down.
+    uri = params.text_document.uri
+    version = params.text_document.version
+    _generate_syntactic_diagnostics(ls, uri, version)
+    ls.scheduler.schedule(uri, version)
 
 
 @medford_server.feature(TEXT_DOCUMENT_DID_OPEN)
+@_handler(TEXT_DOCUMENT_DID_OPEN)
 def did_open(ls: MEDFORDLanguageServer, params: DidOpenTextDocumentParams):
     """Text document did open notification."""
-    _generate_semantic_diagnostics(ls, params)
+    ls.scheduler.schedule(
+        params.text_document.uri, params.text_document.version, delay=0
+    )
+
+
+@medford_server.feature(TEXT_DOCUMENT_DID_CLOSE)
+@_handler(TEXT_DOCUMENT_DID_CLOSE)
+def did_close(ls: MEDFORDLanguageServer, params: DidCloseTextDocumentParams):
+    """Text document did close notification."""
+    # The document's state is kept around (until it is evicted) in case the
+    # document is opened again.
+    ls.scheduler.close(params.text_document.uri)
+
+    # Some clients clear a document's Diagnostics when it is closed
+    ls.forget_published(params.text_document.uri)
+
+    # Version numbers start over when the document is opened again
+    state = ls.documents.peek(params.text_document.uri)
+    if state:
+        state.version = None
+        state.spans.version = None
+        state.semantic_tokens = SemanticTokenCache()
 
 
 @medford_server.feature(TEXT_DOCUMENT_DID_SAVE)
+@_handler(TEXT_DOCUMENT_DID_SAVE)
 def did_save(ls: MEDFORDLanguageServer, params: DidSaveTextDocumentParams):
     """Text document did save notification."""
-    _generate_semantic_diagnostics(ls, params)
+    doc = ls.workspace.get_document(params.text_document.uri)
+    ls.scheduler.schedule(doc.uri, doc.version, delay=0)
+
+    # Once the document is closed, the symbol index has what was saved
+    path = to_fs_path(doc.uri)
+    if path and ls.symbol_index is not None and ls.symbol_index.done():
+        ls.symbol_index.result().update(path)
 
 
 @medford_server.feature(TEXT_DOCUMENT_COMPLETION, CompletionOptions(trigger_characters=["@", "-"]))
+@_handler(TEXT_DOCUMENT_COMPLETION)
 def completions(ls: MEDFORDLanguageServer, params: CompletionParams) -> CompletionList:
     """Request for completion items"""
     return _generate_completions(ls, params)
 
 
 @medford_server.feature(TEXT_DOCUMENT_HOVER)
+@_handler(TEXT_DOCUMENT_HOVER)
 def hover(ls: MEDFORDLanguageServer, params: HoverParams) -> Hover:
     """Request for hover"""
     return _generate_hover(ls, params)
 
 
+@medford_server.feature(TEXT_DOCUMENT_DEFINITION)
+@_handler(TEXT_DOCUMENT_DEFINITION)
+def definition(
+    ls: MEDFORDLanguageServer, params: DefinitionParams
+) -> Optional[Location]:
+    """Request for the definition of the macro under the cursor"""
+    return _generate_definition(ls, params)
+
+
+@medford_server.feature(TEXT_DOCUMENT_REFERENCES)
+@_handler(TEXT_DOCUMENT_REFERENCES)
+def references(
+    ls: MEDFORDLanguageServer, params: ReferenceParams
+) -> Optional[List[Location]]:
+    """Request for the uses of the macro under the cursor"""
+    return _generate_references(ls, params)
+
+
+@medford_server.feature(TEXT_DOCUMENT_DOCUMENT_SYMBOL)
+@_handler(TEXT_DOCUMENT_DOCUMENT_SYMBOL)
+def document_symbol(
+    ls: MEDFORDLanguageServer, params: DocumentSymbolParams
+) -> Optional[List[DocumentSymbol]]:
+    """Request for the outline of a document"""
+    doc = ls.workspace.get_document(params.text_document.uri)
+    if ls.documents.get(doc.uri).background is not None:
+        return None
+    return document_symbols(doc.lines, _get_spans(ls, doc))
+
+
+@medford_server.feature(WORKSPACE_SYMBOL)
+@_handler(WORKSPACE_SYMBOL)
+async def workspace_symbol(
+    ls: MEDFORDLanguageServer, params: WorkspaceSymbolParams
+) -> List[SymbolInformation]:
+    """Request for the symbols in the workspace that match a query"""
+    return await _generate_workspace_symbols(ls, params)
+
+
+@medford_server.feature(TEXT_DOCUMENT_SEMANTIC_TOKENS_FULL, LEGEND)
+@_handler(TEXT_DOCUMENT_SEMANTIC_TOKENS_FULL)
+def semantic_tokens_full(
+    ls: MEDFORDLanguageServer, params: SemanticTokensParams
+) -> Optional[SemanticTokens]:
+    """Request for the semantic tokens of a whole document"""
+    doc = ls.workspace.get_document(params.text_document.uri)
+    state = ls.documents.get(doc.uri)
+
+    # The client is asked to refresh them once the document is tokenized
+    if state.background is not None:
+        return None
+
+    spans = _get_spans(ls, doc)
+    return state.semantic_tokens.full(spans)
+
+
+@medford_server.feature(TEXT_DOCUMENT_SEMANTIC_TOKENS_FULL_DELTA, LEGEND)
+@_handler(TEXT_DOCUMENT_SEMANTIC_TOKENS_FULL_DELTA)
+def semantic_tokens_delta(
+    ls: MEDFORDLanguageServer, params: SemanticTokensDeltaParams
+) -> Optional[Union[SemanticTokens, SemanticTokensDelta]]:
+    """Request for the changes to a document's semantic tokens since the last
+    request"""
+    doc = ls.workspace.get_document(params.text_document.uri)
+    state = ls.documents.get(doc.uri)
+
+    if state.background is not None:
+        return None
+
+    spans = _get_spans(ls, doc)
+    return state.semantic_tokens.delta(spans, params.previous_result_id)
+
+
+@medford_server.feature(TEXT_DOCUMENT_SEMANTIC_TOKENS_RANGE, LEGEND)
+@_handler(TEXT_DOCUMENT_SEMANTIC_TOKENS_RANGE)
+def semantic_tokens_range(
+    ls: MEDFORDLanguageServer, params: SemanticTokensRangeParams
+) -> SemanticTokens:
+    """Request for the semantic tokens of part of a document, which clients send
+    for the part they are showing"""
+    doc = ls.workspace.get_document(params.text_document.uri)
+    (first, last) = (params.range.start.line, params.range.end.line)
+
+    # Large documents are validated around what the client is showing first
+    ls.documents.get(doc.uri).visible = (first, last)
+
+    return encode_range(_spans_between(ls, doc, first, last + 1), first)
+
+
+@medford_server.feature(TEXT_DOCUMENT_DIAGNOSTIC)
+@_handler(TEXT_DOCUMENT_DIAGNOSTIC)
+async def document_diagnostic(
+    ls: MEDFORDLanguageServer, params: DocumentDiagnosticParams
+) -> DocumentDiagnosticReport:
+    """Request for a document's Diagnostics, unchanged if the client already has
+    them"""
+    (result_id, diagnostics) = await _pull_document(ls, params.text_document.uri)
+
+    if result_id is not None and result_id == params.previous_result_id:
+        return RelatedUnchangedDocumentDiagnosticReport(result_id=result_id)
+    return RelatedFullDocumentDiagnosticReport(items=diagnostics, result_id=result_id)
+
+
+@medford_server.feature(WORKSPACE_DIAGNOSTIC)
+@_handler(WORKSPACE_DIAGNOSTIC)
+async def workspace_diagnostic(
+    ls: MEDFORDLanguageServer, params: WorkspaceDiagnosticParams
+) -> WorkspaceDiagnosticReport:
+    """Request for the Diagnostics of every MEDFORD file in the workspace"""
+    previous = {result.uri: result.value for result in params.previous_result_ids}
+    return WorkspaceDiagnosticReport(items=await _pull_workspace(ls, previous))
+
+
 #### #### #### CUSTOM COMMANDS #### #### ####
 
 
+@medford_server.command(MEDFORDLanguageServer.CMD_CACHE_STATS)
+@_handler(MEDFORDLanguageServer.CMD_CACHE_STATS)
+def cache_stats(ls: MEDFORDLanguageServer, *_args) -> dict:
+    """Reports the validation cache's hit and miss counts"""
+    return ls.cache.stats()
+
+
+@medford_server.command(MEDFORDLanguageServer.CMD_STATS)
+def stats(ls: MEDFORDLanguageServer, *_args) -> dict:
+    """Reports the latency percentiles of each validation phase and handler"""
+    return ls.stats()
+
+
+@medford_server.command(MEDFORDLanguageServer.CMD_PROFILE)
+def profile(ls: MEDFORDLanguageServer, args: Optional[list]) -> dict:
+    """Profiles the next requests, see profiler.py. The argument is an object
+    with the number of "requests" to profile, the number of "seconds" to
+    profile for and the "directory" to write the profiles to, all optional, or
+    "stop". Without an argument, reports on the profiler."""
+    options = (args or [None])[0]
+    if options is None:
+        return profiler.status()
+    if options == "stop":
+        return profiler.stop()
+    if not isinstance(options, dict):
+        raise ValueError(f"Expected profiling options or 'stop', got {options!r}")
+
+    return profiler.start(
+        options.get("requests"),
+        options.get("seconds"),
+        options.get("directory") or ls.profile_directory,
+    )
+
+
+@medford_server.command(MEDFORDLanguageServer.CMD_SET_VALIDATION_MODES)
+def set_validation_modes(ls: MEDFORDLanguageServer, args: Optional[list]) -> list:
+    """Switches the modes documents are validated in to the modes given as
+    arguments, and reports the modes. Without arguments, only reports them."""
+    if args:
+        ls.set_validation_modes(parse_modes(args))
+    return [str(mode) for mode in ls.validation_modes]
+
+
+@medford_server.command(MEDFORDLanguageServer.CMD_VALIDATE_WORKSPACE)
+@_handler(MEDFORDLanguageServer.CMD_VALIDATE_WORKSPACE)
+async def validate_workspace(ls: MEDFORDLanguageServer, args: Optional[list]) -> dict:
+    """Validates every MEDFORD file in the workspace, or in the folders given
+    as arguments, and reports how many files and Diagnostics there were"""
+    return await _validate_workspace(ls, args or [])
+
+
 #### #### #### HELPERS #### #### ####
 
 
+async def _log_stats(ls: MEDFORDLanguageServer, interval: float) -> None:
+    """Logs the server's latency statistics every so often, until cancelled"""
+    while True:
+        await asyncio.sleep(interval)
+        _stats_logger.info(f"{ls.CMD_STATS} {json.dumps(ls.stats())}")
+
+
+def _fingerprint(diagnostics: List[Diagnostic]) -> int:
+    """Hashes everything about a list of Diagnostics that the client displays"""
+    return hash(
+        tuple(
+            (
+                _range_key(diag.range),
+                diag.severity,
+                diag.code,
+                diag.source,
+                diag.message,
+                tuple(
+                    (info.location.uri, _range_key(info.location.range), info.message)
+                    for info in diag.related_information or ()
+                ),
+            )
+            for diag in diagnostics
+        )
+    )
+
+
+def _range_key(range_: Range) -> Tuple[int, int, int, int]:
+    """A Range as a hashable tuple"""
+    return (
+        range_.start.line,
+        range_.start.character,
+        range_.end.line,
+        range_.end.character,
+    )
+
+
 def _generate_syntactic_diagnostics(
-    ls: MEDFORDLanguageServer,
-    params: Union[
-        DidChangeTextDocumentParams,
-        DidSaveTextDocumentParams,
-        DidOpenTextDocumentParams,
-    ],
-) -> None:
-    """Wrapper around validation function to request and display Diagnostics
-    Parameters: the Language Server, textDocument parameters
-       Returns: none
-       Effects: Displays diagnostics
+    ls: MEDFORDLanguageServer, uri: str, version: Optional[int]
+) -> Optional[CompactDetails]:
+    """Tokenizes a document and displays its syntax Diagnostics right away
+    Parameters: the Language Server, the document's uri and version
+       Returns: The tokenized document, empty if it has syntax errors, or None if
+                it could not be tokenized
+       Effects: Stores the tokenization in the document's state, and displays
+                the syntax Diagnostics
+     Notes: A document without syntax errors goes on to semantic validation.
+            Publishing the empty list here would clear the previous semantic
+            Diagnostics until the new ones arrive, so we hold off unless the
+            empty list removes syntax errors that were being displayed.
     """
 
     # Get the current document from the text editor
-    doc = ls.workspace.get_document(params.text_document.uri)
+    doc = ls.workspace.get_document(uri)
+    state = ls.documents.get(uri)
+
+    # A large document is tokenized in the background the first time, see
+    # _load_in_background
+    if state.background is not None or _needs_loading(ls, doc.source, state):
+        return None
+
+    # The spans and the tokenizer share one split of the document, see
+    # SpanMap.update
+    lines = doc.source.splitlines()
+    state.spans.update(lines, version)
 
     # Get diagnostics on the document
     try:
-        (details, diagnostics) = validate_syntax(doc)
+        (details, diagnostics) = state.tokenizer.validate(doc, state.spans, lines)
     except ValueError as err:
         logging.warning(err)
-        return
+        return None
 
     # Publish the diagnostics
-    ls.publish_diagnostics(doc.uri, diagnostics)
+    if diagnostics or state.syntax_diagnostics or not details:
+        ls.publish_diagnostics(doc.uri, diagnostics, version)
+        state.diagnostics = diagnostics
 
-    # Store the defined macros in the languge server
-    if details:
-        ls.macros = details[0].macro_dictionary
+    # Store the results in the document's state
+    # Hashing a large document takes a while, so the contents are only hashed
+    # once they are validated, see _generate_semantic_diagnostics
+    state.version = version
+    state.source_hash = None
+    state.details = details
+    state.macros = state.tokenizer.macros
+    state.exported = None
+    state.syntax_diagnostics = diagnostics
+    state.semantic = {}
+    state.modes = None
+    state.estimate_size(len(doc.source))
+    ls.documents.evict()
 
+    return details
 
-def _generate_semantic_diagnostics(
-    ls: MEDFORDLanguageServer,
-    params: Union[
-        DidSaveTextDocumentParams,
-        DidOpenTextDocumentParams,
-        DidChangeTextDocumentParams,
-    ],
+
+@metrics.timed("phase/validation")
+async def _generate_semantic_diagnostics(
+    ls: MEDFORDLanguageServer, uri: str, version: Optional[int]
 ) -> None:
     """Wrapper around validation function to request and display Diagnostics
-    Parameters: the Language Server, DidSaveTextDocument parameters
+    Parameters: the Language Server, the document's uri and the version of the
+                document the validation was scheduled for
        Returns: none
-       Effects: Displays diagnostics
+       Effects: Displays the syntax Diagnostics, then the semantic Diagnostics
+                once they are ready, unless the document has changed since
     """
-    doc = ls.workspace.get_document(params.text_document.uri)
+    if not ls.scheduler.is_latest(uri, version):
+        return
 
-    try:
-        (details, diagnostics) = validate_data(doc, ls.validation_mode)
-    except ValueError as err:
-        logging.warning(err)
+    doc = ls.workspace.get_document(uri)
+    state = ls.documents.get(uri)
+    source = doc.source
+    source_hash = hash_source(source)
+    modes = ls.validation_modes
+
+    # Nothing has changed since the last validation, which is the case for a
+    # save, or when a document is opened again.
+    if state.is_validated(source_hash, modes):
+        state.version = version
+        ls.publish_diagnostics(doc.uri, state.diagnostics, version)
+        return
+
+    # Or these contents were validated before, in some of the modes at least:
+    # by this document in other modes, or by some version of a document with
+    # these same contents. Only the models of the other modes need building.
+    validated = state.source_hash == source_hash and state.modes is not None
+    semantic = dict(state.semantic) if validated else {}
+    for mode in modes:
+        cached = None if mode in semantic else ls.cache.get(uri, source_hash, mode)
+        if cached is not None:
+            if not validated:
+                _restore_validation(state, source_hash, cached)
+                validated = True
+            semantic[mode] = cached.semantic_diagnostics
+
+    if validated:
+        missing = tuple(mode for mode in modes if mode not in semantic)
+        if missing and state.exported is not None:
+            try:
+                errors = await ls.pool.model_validation(state.exported, missing)
+            except ValueError as err:
+                logging.warning(err)
+                return
+
+            if not ls.scheduler.is_latest(uri, version):
+                return
+
+            spans = _get_spans(ls, doc)
+            for mode in missing:
+                semantic[mode] = semantic_errors_to_diagnostics(errors[mode], spans)
+
+        # Contents with syntax errors aren't validated in any mode
+        elif missing:
+            semantic.update((mode, []) for mode in missing)
+
+        _finish_validation(ls, doc, state, version, modes, semantic, missing)
         return
 
-    # Store the defined macros in the languge server
+    # A large document that hasn't been tokenized yet gets the Diagnostics of
+    # the lines the client is showing first
+    if _needs_loading(ls, source, state):
+        with metrics.timer("phase/window"):
+            window = validate_window(source, uri, *state.visible)
+        ls.publish_diagnostics(doc.uri, window, version)
+
+        if not await _load_in_background(ls, doc, state):
+            return
+        if not ls.scheduler.is_latest(uri, version):
+            return
+
+    # The first phase: syntax, unless it already ran on these contents. It
+    # leaves them unhashed, so they are hashed here instead.
+    syntax_ran = state.source_hash is None and state.version == doc.version
+    if state.modes is None and doc.version is not None and syntax_ran:
+        details = state.details
+    else:
+        details = _generate_syntactic_diagnostics(ls, uri, version)
+        if details is None:
+            return
+    state.source_hash = source_hash
+
+    # The second phase: semantics, exporting the document once for every mode
+    semantic = {mode: [] for mode in modes}
     if details:
-        ls.macros = details[0].macro_dictionary
+        try:
+            (exported, errors) = await ls.pool.validate_modes(details, modes)
+        except ValueError as err:
+            logging.warning(err)
+            return
+
+        # The document may have moved on while the workers were busy
+        if not ls.scheduler.is_latest(uri, version):
+            return
+
+        state.exported = exported
+        semantic = {
+            mode: semantic_errors_to_diagnostics(errors[mode], state.spans)
+            for mode in modes
+        }
+
+    _finish_validation(ls, doc, state, version, modes, semantic, modes)
+
+
+def _restore_validation(
+    state: DocumentState, source_hash: str, cached: CachedValidation
+) -> None:
+    """Brings a document's state back to a validation of the same contents
+    Parameters: The document's state, the hash of its contents and the cached
+                results of validating them in some mode
+       Returns: None
+       Effects: Replaces the state's tokenization and exported dict, and
+                forgets the modes it was validated in
+    """
+    state.source_hash = source_hash
+    state.details = cached.details
+    state.macros = cached.macros
+    state.exported = cached.exported
+    state.syntax_diagnostics = cached.syntax_diagnostics
+    state.semantic = {}
+
+
+def _finish_validation(
+    ls: MEDFORDLanguageServer,
+    doc: Document,
+    state: DocumentState,
+    version: Optional[int],
+    modes: Modes,
+    semantic: Dict[ValidationMode, List[Diagnostic]],
+    fresh: Modes,
+) -> None:
+    """Displays the Diagnostics of a document validated in several modes
+    Parameters: The Language Server, the document, its state and the version
+                validated, the modes, the semantic Diagnostics found in each,
+                and the modes that were just validated rather than cached
+       Returns: None
+       Effects: Publishes the Diagnostics, stores them in the document's state,
+                and caches the results of the modes just validated
+    """
+    diagnostics = state.syntax_diagnostics + merge_mode_diagnostics(semantic, modes)
+    ls.publish_diagnostics(doc.uri, diagnostics, version)
+
+    state.version = version
+    state.semantic = semantic
+    state.diagnostics = diagnostics
+    state.modes = modes
+    state.estimate_size(len(doc.source))
+    ls.documents.evict()
+
+    for mode in fresh:
+        ls.cache.put(
+            state.source_hash,
+            mode,
+            CachedValidation(
+                doc.uri,
+                state.details,
+                state.macros,
+                state.exported,
+                state.syntax_diagnostics,
+                semantic[mode],
+            ),
+        )
+
+
+def _needs_loading(
+    ls: MEDFORDLanguageServer, source: str, state: DocumentState
+) -> bool:
+    """Determines if a document is too large to tokenize on the event loop, and
+    has not been tokenized yet"""
+    return state.tokenizer.line_count == 0 and len(source) >= ls.large_document_size
+
 
-    ls.publish_diagnostics(doc.uri, diagnostics)
+async def _load_in_background(
+    ls: MEDFORDLanguageServer, doc: Document, state: DocumentState
+) -> bool:
+    """Tokenizes a large document off of the event loop
+    Parameters: The Language Server, the document and its state
+       Returns: True if the document was tokenized
+       Effects: Starts the tokenization, unless it is already running, and waits
+                for it. The results are put in the document's state, see
+                _install_background.
+     Notes: The document may be edited in the meantime. The tokenizer and spans
+            catch up with those edits incrementally, like any others.
+    """
+    if state.background is None:
+        state.background = asyncio.get_event_loop().run_in_executor(
+            None, _tokenize_document, doc.source, doc.version
+        )
+        state.background.add_done_callback(
+            lambda future: _install_background(ls, state, future)
+        )
+
+    # Waiting doesn't cancel the tokenization if this validation is cancelled
+    await asyncio.wait([state.background])
+    return state.tokenizer.line_count > 0
+
+
+def _tokenize_document(
+    source: str, version: Optional[int]
+) -> Tuple[IncrementalTokenizer, SpanMap]:
+    """Tokenizes a document from scratch, see _load_in_background
+    Parameters: The document's contents and version
+       Returns: A tokenizer and spans for the document
+       Effects: None
+    """
+    lines = source.splitlines()
+    tokenizer = IncrementalTokenizer()
+    tokenizer.update(lines, source)
+    spans = SpanMap()
+    spans.update(lines, version)
+    return (tokenizer, spans)
+
+
+def _install_background(
+    ls: MEDFORDLanguageServer, state: DocumentState, future: asyncio.Future
+) -> None:
+    """Puts the results of a background tokenization in a document's state
+    Parameters: The Language Server, the document's state and the finished
+                tokenization
+       Returns: None
+       Effects: Replaces the document's tokenizer and spans, and asks the client
+                to refresh its semantic tokens. Failures are logged.
+    """
+    state.background = None
+    if future.cancelled():
+        return
+    if future.exception() is not None:
+        logging.warning(f"Could not tokenize {state.uri}: {future.exception()!r}")
+        return
+
+    (state.tokenizer, state.spans) = future.result()
+    state.semantic_tokens = SemanticTokenCache()
+
+    # The document may have been closed while it was being tokenized
+    if state.uri not in ls.workspace.documents:
+        state.spans.version = None
+
+    workspace = ls.client_capabilities.workspace
+    if (
+        workspace
+        and workspace.semantic_tokens
+        and workspace.semantic_tokens.refresh_support
+    ):
+        ls.semantic_tokens_refresh()
+
+
+async def _validate_workspace(ls: MEDFORDLanguageServer, folders: List[str]) -> dict:
+    """Validates the MEDFORD files in the workspace and displays their Diagnostics
+    Parameters: The Language Server, and the folders to search, as paths or uris.
+                If there are none, the workspace's folders are searched.
+       Returns: The number of files validated, the number of Diagnostics found,
+                and how long it took in seconds
+       Effects: Validates batches of files across a pool of worker processes,
+                displaying each batch's Diagnostics as it finishes, and reports
+                progress to the client if it supports it
+     Notes: Open documents are skipped, the server already keeps their
+            Diagnostics up to date, and from their contents in the editor
+            rather than on disk.
+    """
+    start = time.perf_counter()
+
+    paths = await _closed_files(ls, folders)
+
+    window = ls.client_capabilities.window
+    token = str(uuid.uuid4()) if window and window.work_done_progress else None
+    if token:
+        await ls.progress.create_async(token)
+        ls.progress.begin(
+            token,
+            WorkDoneProgressBegin(
+                title="Validating MEDFORD files",
+                message=f"0/{len(paths)}",
+                percentage=0,
+            ),
+        )
+
+    (done, files, count) = (0, 0, 0)
+    try:
+        async for (size, results) in _validate_files(ls, paths):
+            for (uri, diagnostics) in results:
+                ls.publish_diagnostics(uri, diagnostics)
+                count += len(diagnostics)
+
+            done += size
+            files += len(results)
+            if token:
+                ls.progress.report(
+                    token,
+                    WorkDoneProgressReport(
+                        message=f"{done}/{len(paths)}",
+                        percentage=done * 100 // max(1, len(paths)),
+                    ),
+                )
+    finally:
+        if token:
+            ls.progress.end(
+                token, WorkDoneProgressEnd(message=f"{count} problems in {files} files")
+            )
+
+    return {
+        "files": files,
+        "diagnostics": count,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+async def _closed_files(ls: MEDFORDLanguageServer, folders: List[str]) -> List[str]:
+    """Finds the MEDFORD files in the workspace that are not open
+    Parameters: The Language Server, and the folders to search, as paths or uris.
+                If there are none, the workspace's folders are searched.
+       Returns: The files' paths
+       Effects: Walks the folders, off of the event loop
+    """
+    paths = await asyncio.get_event_loop().run_in_executor(
+        None, find_medford_files, _workspace_roots(ls, folders)
+    )
+    return [p for p in paths if from_fs_path(p) not in ls.workspace.documents]
+
+
+def _workspace_roots(ls: MEDFORDLanguageServer, folders: List[str]) -> List[str]:
+    """Finds the folders to look for MEDFORD files in
+    Parameters: The Language Server, and the folders to search, as paths or uris
+       Returns: The folders' paths, the workspace's folders if there are none
+       Effects: None
+    """
+    roots = [to_fs_path(f) if f.startswith("file:") else f for f in folders]
+    if not roots:
+        roots = [to_fs_path(f.uri) for f in ls.workspace.folders.values()]
+    if not roots and ls.workspace.root_path:
+        roots = [ls.workspace.root_path]
+    return roots
+
+
+async def _validate_files(
+    ls: MEDFORDLanguageServer, paths: List[str]
+) -> AsyncIterator[Tuple[int, List[FileResult]]]:
+    """Validates files in batches, on a pool of their own
+    Parameters: The Language Server and the paths of the files
+       Returns: An iterator over the batches as they finish, each the number of
+                files in the batch and the results of the ones that could be
+                validated
+       Effects: Starts and shuts down the pool
+         Notes: The pool is started while the server's threads are running, so
+                its workers are started from a fork server rather than forked
+                from the server (see validation_pool._context). It only lives
+                as long as the sweep, so its workers' memory is given back.
+    """
+    pool = ValidationPool(ls.workspace_workers)
+
+    async def validate(batch: List[str]) -> tuple:
+        return (len(batch), await pool.run(validate_files, batch, ls.validation_modes))
+
+    try:
+        pending = [validate(batch) for batch in batches(paths, pool.workers)]
+        for finished in asyncio.as_completed(pending):
+            yield await finished
+    finally:
+        pool.shutdown()
+
+
+async def _pull_document(
+    ls: MEDFORDLanguageServer, uri: str
+) -> Tuple[Optional[str], List[Diagnostic]]:
+    """Brings an open document's Diagnostics up to date, for a pull
+    Parameters: The Language Server and the document's uri
+       Returns: The Diagnostics' result id, and the Diagnostics. The id is None
+                if the document could not be validated, or changed while it was.
+       Effects: Waits for the document's pending validation, or validates it
+                right away if it has not been
+    """
+    doc = ls.workspace.get_document(uri)
+    source_hash = hash_source(doc.source)
+    modes = ls.validation_modes
+
+    if not ls.documents.get(uri).is_validated(source_hash, modes):
+        pending = ls.scheduler.pending(uri)
+        if pending is None:
+            pending = ls.scheduler.schedule(uri, doc.version, delay=0)
+        # Waiting doesn't raise if the validation is cancelled by another edit
+        await asyncio.wait([pending])
+
+    state = ls.documents.get(uri)
+    if state.is_validated(source_hash, modes):
+        return (state.result_id, state.diagnostics)
+    return (None, state.diagnostics)
+
+
+async def _pull_workspace(
+    ls: MEDFORDLanguageServer, previous: Dict[str, str]
+) -> List[WorkspaceDocumentDiagnosticReport]:
+    """Brings the Diagnostics of every MEDFORD file in the workspace up to date,
+    for a pull
+    Parameters: The Language Server, and the result ids the client already has,
+                by uri
+       Returns: A report for each file, unchanged if the client is up to date
+       Effects: Validates the open documents that need it, and the closed files
+                that changed since they were last pulled, remembering the
+                results of the latter
+    """
+    reports = []
+
+    for uri in list(ls.workspace.documents):
+        (result_id, diagnostics) = await _pull_document(ls, uri)
+        version = ls.workspace.get_document(uri).version
+        reports.append(_report(uri, version, result_id, diagnostics, previous))
+
+    paths = await _closed_files(ls, [])
+    hashes = await asyncio.get_event_loop().run_in_executor(None, hash_files, paths)
+
+    # Closed files are identified by their contents just like open ones
+    result_ids = {
+        from_fs_path(path): diagnostic_result_id(source_hash, ls.validation_modes)
+        for (path, source_hash) in hashes
+    }
+    known = {
+        uri: pulled
+        for (uri, pulled) in ls.file_diagnostics.items()
+        if result_ids.get(uri) == pulled[0]
+    }
+    stale = [path for (path, _) in hashes if from_fs_path(path) not in known]
+
+    async for (_, results) in _validate_files(ls, stale):
+        for (uri, diagnostics) in results:
+            known[uri] = (result_ids[uri], diagnostics)
+
+    ls.file_diagnostics = known
+    for (uri, (result_id, diagnostics)) in known.items():
+        reports.append(_report(uri, None, result_id, diagnostics, previous))
+
+    return reports
+
+
+def _report(
+    uri: str,
+    version: Optional[int],
+    result_id: Optional[str],
+    diagnostics: List[Diagnostic],
+    previous: Dict[str, str],
+) -> WorkspaceDocumentDiagnosticReport:
+    """Reports a file's Diagnostics for a workspace pull, unchanged if the client
+    already has them"""
+    if result_id is not None and previous.get(uri) == result_id:
+        return WorkspaceUnchangedDocumentDiagnosticReport(
+            uri=uri, version=version, result_id=result_id
+        )
+    return WorkspaceFullDocumentDiagnosticReport(
+        uri=uri, version=version, items=diagnostics, result_id=result_id
+    )
 
 
 def _generate_hover(ls: MEDFORDLanguageServer, params: HoverParams) -> Hover:
 
     doc = ls.workspace.get_document(params.text_document.uri)
-    line = doc.lines[params.position.line]
-    line_no = doc.lines.index(line)
+    spans = _line_spans(ls, doc, params.position.line)
 
-    return resolve_hover(line, line_no, ls.tokens)
+    return resolve_hover(spans, params.position, ls.tokens)
+
+
+def _generate_definition(
+    ls: MEDFORDLanguageServer, params: DefinitionParams
+) -> Optional[Location]:
+    """Finds the definition of the macro under the cursor: the one a use refers
+    to, or the definition itself
+    Parameters: The language server and the definition parameters
+       Returns: The definition's location, or None if the cursor is not on a
+                macro, or the macro is not defined
+       Effects: None
+    """
+    doc = ls.workspace.get_document(params.text_document.uri)
+    position = params.position
+    name = macro_at(_line_spans(ls, doc, position.line), position.character)
+    if name is None or ls.documents.get(doc.uri).background is not None:
+        return None
+
+    place = _get_spans(ls, doc).macro_index.definition(name, position.line)
+    return _location(doc.uri, place) if place else None
+
+
+def _generate_references(
+    ls: MEDFORDLanguageServer, params: ReferenceParams
+) -> Optional[List[Location]]:
+    """Finds the uses of the macro under the cursor, and its definitions if the
+    client asks for them
+    Parameters: The language server and the reference parameters
+       Returns: The locations, in order, or None if the cursor is not on a macro
+       Effects: None
+    """
+    doc = ls.workspace.get_document(params.text_document.uri)
+    position = params.position
+    name = macro_at(_line_spans(ls, doc, position.line), position.character)
+    if name is None or ls.documents.get(doc.uri).background is not None:
+        return None
+
+    index = _get_spans(ls, doc).macro_index
+    places = index.uses(name)
+    if params.context.include_declaration:
+        places = sorted(index.definitions(name) + places)
+    return [_location(doc.uri, place) for place in places]
+
+
+def _location(uri: str, place: Place) -> Location:
+    """The Location of a place in a document, see macro_index.Place"""
+    (line, start, end) = place
+    return Location(
+        uri=uri,
+        range=Range(
+            start=Position(line=line, character=start),
+            end=Position(line=line, character=end),
+        ),
+    )
+
+
+def _get_symbol_index(ls: MEDFORDLanguageServer) -> asyncio.Future:
+    """Looks up the workspace's symbol index, loading it if it has not been
+    Parameters: The language server
+       Returns: A future for the index
+       Effects: Starts loading the index off of the event loop, the first time
+    """
+    if ls.symbol_index is None:
+        ls.symbol_index = asyncio.get_event_loop().run_in_executor(
+            None, load_index, _workspace_roots(ls, [])
+        )
+    return ls.symbol_index
+
+
+async def _generate_workspace_symbols(
+    ls: MEDFORDLanguageServer, params: WorkspaceSymbolParams
+) -> List[SymbolInformation]:
+    """Finds the symbols in the workspace that match a query
+    Parameters: The language server and the workspace symbol parameters
+       Returns: The matching symbols, best first, see symbol_index.py
+       Effects: Waits for the symbol index to load. Outlines the open documents
+                that changed since they were last outlined.
+    """
+    index: SymbolIndex = await _get_symbol_index(ls)
+
+    # Open documents are outlined as they are in the editor
+    overrides = {}
+    for doc in list(ls.workspace.documents.values()):
+        path = to_fs_path(doc.uri)
+        if path and ls.documents.get(doc.uri).background is None:
+            overrides[path] = _get_outline(ls, doc)
+
+    return [
+        SymbolInformation(
+            name=symbol.label,
+            kind=symbol.kind,
+            location=Location(uri=from_fs_path(path), range=symbol.selection_range),
+            container_name=f"@{symbol.major}" if symbol.major else None,
+        )
+        for (path, symbol) in index.search(params.query, overrides)
+    ]
+
+
+def _get_outline(ls: MEDFORDLanguageServer, doc: Document) -> List[Symbol]:
+    """Looks up the outline of an open document, see symbols.py
+    Parameters: The language server and the document
+       Returns: The document's symbols
+       Effects: Outlines the document, if it changed since it was last outlined
+    """
+    state = ls.documents.get(doc.uri)
+    if state.outline is None or state.outline[0] != doc.version:
+        state.outline = (doc.version, outline(doc.lines, _get_spans(ls, doc)))
+    return state.outline[1]
 
 
 def _generate_completions(
@@ -186,23 +1361,59 @@ def _generate_completions(
     """
 
     doc = ls.workspace.get_document(params.text_document.uri)
-    line = doc.lines[params.position.line]
+    spans = _line_spans(ls, doc, params.position.line)
 
     clist: Optional[CompletionList] = None
 
-    if line[params.position.character - 1] == "@":
-        if params.position.character == 1:
-            clist = generate_major_token_list(ls.tokens)
-        elif (
-            line[params.position.character - 2] == "`" and params.position.character > 2
-        ):
-            clist = generate_macro_list(ls.macros, params.position.line)
-    elif line[params.position.character - 1] == "-" and is_requesting_minor_token(
-        line, params.position.character
-    ):
-        clist = generate_minor_token_list(ls.tokens, line, params.position.character)
+    if spans.macro_at(params.position.character):
+        macros = _get_spans(ls, doc).macro_index
+        clist = generate_macro_list(macros, params.position.line)
+    else:
+        clist = generate_token_list(ls.tokens, spans, params.position.character)
 
     if clist:
         return clist
     else:
         return NO_COMPLETIONS
+
+
+def _get_spans(ls: MEDFORDLanguageServer, doc: Document) -> SpanMap:
+    """Looks up the spans of a document, bringing them up to date if they are not
+    Parameters: The language server and the document
+       Returns: The document's span map
+       Effects: Scans the lines that changed since the spans were last updated
+    """
+    spans = ls.documents.get(doc.uri).spans
+
+    # Splitting the source into lines takes a while on a large document, so it
+    # is only split when the spans are out of date
+    if doc.version is None or doc.version != spans.version:
+        spans.update(doc.source.splitlines(), doc.version)
+    return spans
+
+
+def _spans_between(
+    ls: MEDFORDLanguageServer, doc: Document, first: int, stop: int
+) -> List[LineSpans]:
+    """Looks up the spans of some of the lines of a document
+    Parameters: The language server, the document, and the first line and the
+                line after the last
+       Returns: The spans of the lines that exist
+       Effects: Brings the document's spans up to date, see _get_spans. While a
+                large document is being tokenized, only these lines are scanned.
+    """
+    if ls.documents.get(doc.uri).background is not None:
+        lines = LineIndex(doc.source, stop)
+        return [scan_line(lines[line]) for line in range(first, len(lines))]
+
+    spans = _get_spans(ls, doc)
+    return [spans[line] for line in range(first, min(stop, len(spans)))]
+
+
+def _line_spans(ls: MEDFORDLanguageServer, doc: Document, line: int) -> LineSpans:
+    """Looks up the spans of a line of a document, see _spans_between
+    Parameters: The language server, the document and the line
+       Returns: The line's spans, blank if the line does not exist
+       Effects: Brings the document's spans up to date
+    """
+    return next(iter(_spans_between(ls, doc, line, line + 1)), BLANK_LINE)
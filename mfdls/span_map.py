@@ -0,0 +1,319 @@
+"""span_map.py
+
+On: October 2026
+
+Records where things are on each line of a MEDFORD document: the major and
+minor tokens, the name of a macro being defined, references to macros,
+template markers, and where the value starts. Hover, completion, diagnostics
+and semantic tokens look positions up here instead of scanning the line's text
+on every request.
+
+The spans of a line only depend on the line itself, so when the document
+changes only the edited lines are scanned again. Positions are indices into
+the line, like the rest of the server uses.
+"""
+import re
+from enum import IntEnum
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from mfdls.macro_index import MacroIndex
+
+# A reference to a macro, `@Name or `@{Name}. Names may be empty, because they
+# are still being typed.
+_MACRO_REFERENCE = re.compile(r"`@(?:\{(\w*)\}?|(\w*))")
+
+# Mirrors MEDFORD.medford_detail.detail
+_COMMENT_HEAD = "#"
+_COMMENT_FLAG = "# "
+_DETAIL_HEAD = "@"
+_MACRO_HEAD = "`@"
+_TEMPLATE_FLAG = "[..]"
+
+
+class LineKind(IntEnum):
+    """What a line of a MEDFORD document is"""
+
+    BLANK = 0
+    COMMENT = 1
+    TOKEN = 2
+    MACRO = 3
+    CONTINUATION = 4
+
+
+class MacroReference(NamedTuple):
+    """A reference to a macro, the span covers the macro's name"""
+
+    name: str
+    start: int
+    end: int
+
+
+class LineSpans(NamedTuple):
+    """Where things are on a single line"""
+
+    kind: LineKind
+
+    # Where the line's content starts, after any indentation
+    start: int = 0
+
+    # Where the token (@Major-Minor) or macro definition (`@Name) ends
+    token_end: int = 0
+
+    # The names in a token line, minor is empty if there is none
+    major: str = ""
+    minor: str = ""
+
+    # The name of the macro a macro definition defines
+    macro: str = ""
+
+    # Where the value (or the macro's replacement) starts, and where the line's
+    # content ends, before any comment
+    value_start: int = 0
+    end: int = 0
+
+    # The macros that a token line's value refers to
+    macros: Tuple[MacroReference, ...] = ()
+
+    # Where the template markers ([..]) left on the line start
+    templates: Tuple[int, ...] = ()
+
+    @property
+    def major_end(self) -> int:
+        """Where the major token ends, which is where a minor token's dash is"""
+        return self.start + len(_DETAIL_HEAD) + len(self.major)
+
+    def token_at(self, character: int) -> bool:
+        """Determines if a position is on the line's token or macro definition"""
+        return (
+            self.kind in (LineKind.TOKEN, LineKind.MACRO)
+            and self.start <= character <= self.token_end
+        )
+
+    def macro_at(self, character: int) -> Optional[MacroReference]:
+        """Finds the macro reference a position is on, if there is one"""
+        for reference in self.macros:
+            if reference.start <= character <= reference.end:
+                return reference
+        return None
+
+
+BLANK_LINE = LineSpans(LineKind.BLANK)
+
+
+def scan_line(line: str) -> LineSpans:
+    """Finds the spans on a line, the same way detail.FromLine reads the line
+    Parameters: The line, with or without its line ending
+       Returns: The spans
+       Effects: None
+    """
+    content = line.rstrip()
+    start = len(content) - len(content.lstrip())
+
+    if content.startswith(_COMMENT_HEAD, start):
+        return LineSpans(LineKind.COMMENT, start, end=len(content))
+
+    if _COMMENT_FLAG in content:
+        content = content.split(_COMMENT_FLAG, 1)[0].rstrip()
+    text = content[start:]
+
+    if not text:
+        return BLANK_LINE
+
+    space = text.find(" ")
+    token_end = start + (space if space != -1 else len(text))
+    value_start = token_end + 1 if space != -1 else token_end
+
+    if text.startswith(_MACRO_HEAD):
+        return LineSpans(
+            LineKind.MACRO,
+            start,
+            token_end,
+            macro=content[start + len(_MACRO_HEAD) : token_end],
+            value_start=value_start,
+            end=len(content),
+            templates=_templates(content, value_start),
+        )
+
+    if text.startswith(_DETAIL_HEAD):
+        (major, _, minor) = content[start + len(_DETAIL_HEAD) : token_end].partition(
+            "-"
+        )
+        macros = tuple(
+            _macro_reference(match)
+            for match in _MACRO_REFERENCE.finditer(content, value_start)
+        )
+        return LineSpans(
+            LineKind.TOKEN,
+            start,
+            token_end,
+            major=major,
+            minor=minor,
+            value_start=value_start,
+            end=len(content),
+            macros=macros,
+            templates=_templates(content, value_start),
+        )
+
+    return LineSpans(
+        LineKind.CONTINUATION,
+        start,
+        start,
+        value_start=start,
+        end=len(content),
+        templates=_templates(content, start),
+    )
+
+
+def _templates(content: str, start: int) -> Tuple[int, ...]:
+    """Finds the template markers in a line's content, from a position on"""
+    found = []
+    position = content.find(_TEMPLATE_FLAG, start)
+    while position != -1:
+        found.append(position)
+        position = content.find(_TEMPLATE_FLAG, position + len(_TEMPLATE_FLAG))
+    return tuple(found)
+
+
+def _macro_reference(match: re.Match) -> MacroReference:
+    """Converts a match of _MACRO_REFERENCE, curled or not, to a MacroReference"""
+    group = 1 if match.group(1) is not None else 2
+    return MacroReference(match.group(group), match.start(group), match.end(group))
+
+
+class SpanMap:
+    """The spans of every line of a document"""
+
+    def __init__(self) -> None:
+        self._lines: List[str] = []
+        self._spans: List[LineSpans] = []
+
+        # The version of the document the spans are for. Version numbers start
+        # over when a document is opened again, so this is cleared when it is
+        # closed.
+        self.version: Optional[int] = None
+
+        # The region that changed since take_changes was last called, see
+        # changed_region, or None if nothing did
+        self._changes: Optional[Tuple[int, int, int]] = None
+
+        # Where the document's macros are defined and used, kept up to date
+        # along with the spans
+        self.macro_index = MacroIndex()
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def __getitem__(self, line_no: int) -> LineSpans:
+        """The spans of a line, blank if the line does not exist"""
+        if 0 <= line_no < len(self._spans):
+            return self._spans[line_no]
+        return BLANK_LINE
+
+    def update(self, lines: List[str], version: Optional[int] = None) -> None:
+        """Brings the spans up to date with a new version of the document
+        Parameters: The document's lines, and its version
+           Returns: None
+           Effects: Scans the lines that changed since the last update, unless
+                    the spans are already for this version
+         Notes: The lines are kept rather than copied, so they can be shared
+                with the tokenizer, and must not be changed afterwards. Every
+                update should split its lines the same way, with or without
+                line endings, or all of them are scanned again.
+        """
+        if version is not None and version == self.version:
+            return
+
+        (prefix, old_end, new_end) = changed_region(self._lines, lines)
+        old_spans = self._spans[prefix:old_end]
+        self._spans[prefix:old_end] = [
+            scan_line(line) for line in lines[prefix:new_end]
+        ]
+        self._lines = lines
+        self.version = version
+
+        if prefix != old_end or prefix != new_end:
+            region = (prefix, old_end, new_end)
+            self._changes = (
+                compose_regions(self._changes, region) if self._changes else region
+            )
+            self.macro_index.update(
+                region,
+                self._lines[prefix:new_end],
+                self._spans[prefix:new_end],
+                old_spans,
+            )
+
+    def take_changes(self) -> Optional[Tuple[int, int, int]]:
+        """Collects the region of the document that changed since the last call
+        Parameters: None
+           Returns: The region, as changed_region describes it, covering every
+                    update since the last call, or None if nothing changed
+           Effects: Starts collecting changes over
+         Notes: For the semantic tokens, which only re-encode what changed.
+        """
+        (changes, self._changes) = (self._changes, None)
+        return changes
+
+
+class LazySpans:
+    """The spans of the lines of a document that is too large to scan whole,
+    scanned as they are looked up. Stands in for a SpanMap where the spans are
+    only read."""
+
+    def __init__(self, lines: Sequence[str]):
+        self._lines = lines
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def __getitem__(self, line_no: int) -> LineSpans:
+        """The spans of a line, blank if the line does not exist"""
+        if 0 <= line_no < len(self._lines):
+            return scan_line(self._lines[line_no])
+        return BLANK_LINE
+
+
+def changed_region(old: List[str], new: List[str]) -> Tuple[int, int, int]:
+    """Finds the region of a document that changed between two versions
+    Parameters: The old and new versions of the document, split into lines
+       Returns: The first line that changed, and the ends of the changed region
+                in the old and new documents. Everything after the ends is
+                the same in both.
+       Effects: None
+    """
+    limit = min(len(old), len(new))
+
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+
+    suffix = 0
+    while (
+        suffix < limit - prefix
+        and old[len(old) - suffix - 1] == new[len(new) - suffix - 1]
+    ):
+        suffix += 1
+
+    return (prefix, len(old) - suffix, len(new) - suffix)
+
+
+def compose_regions(
+    first: Tuple[int, int, int], second: Tuple[int, int, int]
+) -> Tuple[int, int, int]:
+    """Combines the regions changed by two successive edits
+    Parameters: The region changed by the first edit and the region changed by
+                the second, each as changed_region describes it
+       Returns: The region the two changed together, from the document before
+                the first edit to the document after the second
+       Effects: None
+    """
+    (first_prefix, first_old, first_new) = first
+    (second_prefix, second_old, second_new) = second
+
+    # The first line that neither edit touched, in the document between them
+    untouched = max(first_new, second_old)
+    return (
+        min(first_prefix, second_prefix),
+        untouched - (first_new - first_old),
+        untouched + (second_new - second_old),
+    )
@@ -0,0 +1,294 @@
+"""symbol_index.py
+
+On: October 2026
+
+An index of the symbols (see symbols.py) of every MEDFORD file in a workspace,
+for workspace/symbol. Outlining thousands of files on every query would take
+far too long, so each file's outline is kept along with the file's size,
+modification time and hash, and only files that changed are outlined again.
+A file whose size and modification time are the same is taken to be the same,
+and one whose contents hash the same only has its modification time updated.
+
+The index is kept in the server's cache directory (see token_cache.cache_dir),
+one file per set of workspace folders, so that a restarted server only looks
+at what changed while it was not running.
+
+Queries match names case-insensitively, the names that start with the query
+first, then the ones that contain its characters in order. The names are
+joined into one string, so both are a bisection or a regular expression over
+it rather than a loop over every symbol.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from mfdls.document_state import hash_source
+from mfdls.line_source import iter_lines
+from mfdls.symbols import Symbol, outline
+from mfdls.token_cache import atomic_write_json, cache_dir
+from mfdls.workspace import find_medford_files
+
+# The most symbols a query answers with. Clients filter and rank the results
+# again as the query grows, and ask again.
+MAX_RESULTS = 256
+
+# Bumped whenever the layout of the index file, or of the symbols, changes
+_FORMAT = 1
+
+
+class FileSymbols(NamedTuple):
+    """The symbols of a file, and what the file was like when they were found"""
+
+    mtime: int
+    size: int
+    source_hash: str
+    symbols: List[Symbol]
+
+
+class _Search:
+    """The names of every symbol in the index, arranged to be searched"""
+
+    def __init__(self, entries: List[Tuple[str, Symbol]]):
+        self.entries = entries
+        keys = [symbol.label.lower() for (_, symbol) in entries]
+
+        # The entries by name, for prefixes
+        self.order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.sorted_keys = [keys[index] for index in self.order]
+
+        # Every name on a line of its own, for everything else
+        self.joined = "\n".join(keys)
+        self.starts = array("I", [0])
+        for key in keys:
+            self.starts.append(self.starts[-1] + len(key) + 1)
+
+    def search(self, query: str, limit: int) -> List[Tuple[str, Symbol]]:
+        """Finds the symbols whose names match a query, see the module notes"""
+        if not self.entries:
+            return []
+
+        query = query.lower()
+        first = bisect_left(self.sorted_keys, query)
+        last = min(bisect_right(self.sorted_keys, query + "\uffff"), first + limit)
+        found = self.order[first:last]
+
+        if len(found) < limit:
+            prefixed = set(found)
+            for match in _fuzzy(query).finditer(self.joined):
+                index = bisect_right(self.starts, match.start()) - 1
+                if index not in prefixed:
+                    found.append(index)
+                    if len(found) >= limit:
+                        break
+
+        return [self.entries[index] for index in found]
+
+
+class SymbolIndex:
+    """The symbols of the MEDFORD files in a workspace"""
+
+    def __init__(self, path: Optional[Path] = None):
+        # Where the index is kept between runs, if anywhere
+        self.path = path
+
+        self._files: Dict[str, FileSymbols] = {}
+        self._search: Optional[_Search] = None
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    @classmethod
+    def load(cls, path: Optional[Path]) -> "SymbolIndex":
+        """Reads an index kept by an earlier run
+        Parameters: Where the index is kept
+           Returns: The index, empty if there was none or it could not be read
+           Effects: None
+        """
+        index = cls(path)
+        if path is None:
+            return index
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            if stored.get("format") == _FORMAT:
+                index._files = {
+                    name: FileSymbols(
+                        mtime,
+                        size,
+                        source_hash,
+                        [Symbol(*symbol) for symbol in symbols],
+                    )
+                    for (name, (mtime, size, source_hash, symbols)) in stored[
+                        "files"
+                    ].items()
+                }
+        except OSError:
+            pass
+        except (ValueError, TypeError, AttributeError, KeyError):
+            logging.warning(f"Ignoring malformed symbol index {path}")
+
+        return index
+
+    def save(self) -> None:
+        """Keeps the index for the next run
+        Parameters: None
+           Returns: None
+           Effects: Creates the cache directory if needed, and replaces the
+                    index file atomically. Failures are logged.
+        """
+        if self.path is None:
+            return
+
+        stored = {"format": _FORMAT, "files": self._files}
+        atomic_write_json(self.path, stored)
+
+    def refresh(self, paths: Iterable[str]) -> int:
+        """Brings the index up to date with the files in the workspace
+        Parameters: The paths of every MEDFORD file in the workspace
+           Returns: The number of files that were added, changed or removed
+           Effects: Outlines the files that changed, and forgets the ones that
+                    are gone
+        """
+        paths = set(paths)
+        gone = [path for path in self._files if path not in paths]
+        for path in gone:
+            del self._files[path]
+
+        changed = len(gone) + sum(self.update(path) for path in sorted(paths))
+        if gone:
+            self._search = None
+        return changed
+
+    def update(self, path: str) -> bool:
+        """Brings the symbols of a file up to date
+        Parameters: The file's path
+           Returns: True if the file was added, changed or removed
+           Effects: Reads the file if its size or modification time changed, and
+                    outlines it if its contents did. Failures are logged.
+        """
+        known = self._files.get(path)
+        try:
+            stat = os.stat(path)
+            if known and (known.mtime, known.size) == (stat.st_mtime_ns, stat.st_size):
+                return False
+
+            with open(path, "r", encoding="utf-8") as f:
+                source = f.read()
+        except (OSError, UnicodeDecodeError) as err:
+            if not isinstance(err, FileNotFoundError):
+                logging.warning(f"Could not read {path}: {err}")
+            return self.remove(path)
+
+        source_hash = hash_source(source)
+        if known and known.source_hash == source_hash:
+            self._files[path] = known._replace(
+                mtime=stat.st_mtime_ns, size=stat.st_size
+            )
+            return False
+
+        self._files[path] = FileSymbols(
+            stat.st_mtime_ns, stat.st_size, source_hash, outline(iter_lines(source))
+        )
+        self._search = None
+        return True
+
+    def remove(self, path: str) -> bool:
+        """Forgets the symbols of a file
+        Parameters: The file's path
+           Returns: True if the index had any
+           Effects: Removes the file from the index
+        """
+        if self._files.pop(path, None) is None:
+            return False
+        self._search = None
+        return True
+
+    def search(
+        self,
+        query: str,
+        overrides: Optional[Dict[str, List[Symbol]]] = None,
+        limit: int = MAX_RESULTS,
+    ) -> List[Tuple[str, Symbol]]:
+        """Finds the symbols matching a query, see the module notes
+        Parameters: The query, empty for every symbol, the symbols of files
+                    whose contents in the editor stand in for the ones on disk,
+                    by path, and the most symbols to find
+           Returns: The path and symbol of each match, best first
+           Effects: Arranges the names to be searched, if they changed
+        """
+        overrides = overrides or {}
+        found = _Search(
+            [
+                (path, symbol)
+                for (path, symbols) in overrides.items()
+                for symbol in symbols
+            ]
+        ).search(query, limit)
+
+        if self._search is None:
+            self._search = _Search(
+                [
+                    (path, symbol)
+                    for (path, known) in self._files.items()
+                    for symbol in known.symbols
+                ]
+            )
+        # The index is searched for more than it needs, in case some of its
+        # matches are in the files that were overridden
+        hidden = sum(
+            len(self._files[path].symbols) for path in overrides if path in self._files
+        )
+        for (path, symbol) in self._search.search(query, limit + hidden):
+            if len(found) >= limit:
+                break
+            if path not in overrides:
+                found.append((path, symbol))
+
+        return found
+
+
+def load_index(roots: List[str]) -> SymbolIndex:
+    """Loads the symbol index of a workspace, and brings it up to date
+    Parameters: The workspace's folders
+       Returns: The index
+       Effects: Walks the folders, outlines the files that changed since the
+                index was kept, and keeps it again if any did
+    """
+    index = SymbolIndex.load(index_path(roots))
+    if index.refresh(find_medford_files(roots)):
+        index.save()
+    return index
+
+
+def index_path(roots: Iterable[str]) -> Path:
+    """Determines where the symbol index of a workspace is kept
+    Parameters: The workspace's folders
+       Returns: The path to the index file, in the server's cache directory
+       Effects: None
+    """
+    digest = hashlib.sha256()
+    for root in sorted(os.path.abspath(root) for root in roots):
+        digest.update(root.encode("utf-8") + b"\0")
+    return cache_dir() / f"symbols-{digest.hexdigest()[:16]}.json"
+
+
+def _fuzzy(query: str) -> re.Pattern:
+    """A pattern matching the lines that contain a query's characters in order.
+    Each character skips ahead to the next one it could match, so the pattern
+    never backtracks."""
+    return re.compile(
+        "^"
+        + "".join(
+            f"[^\n{re.escape(char)}]*{re.escape(char)}"
+            for char in query
+            if char != "\n"
+        ),
+        re.MULTILINE,
+    )
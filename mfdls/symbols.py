@@ -0,0 +1,169 @@
+"""symbols.py
+
+On: October 2026
+
+Outlines a MEDFORD document: the block each major token starts (@Contributor
+Jane Doe, and the @Contributor-... lines under it), and the macros it defines.
+The outline is read off the spans of each line (see span_map.py), so it needs
+neither the parser nor a valid document, and closed files are outlined a line
+at a time, without holding on to their contents.
+"""
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from lsprotocol.types import DocumentSymbol, Position, Range, SymbolKind
+
+from mfdls.span_map import LazySpans, LineKind, LineSpans, SpanMap, scan_line
+
+
+class Symbol(NamedTuple):
+    """A block or macro definition in a document's outline"""
+
+    # The block's name (the value of its token line) or the macro's name
+    name: str
+
+    # The block's major token, empty for a macro
+    major: str
+
+    # The (0-indexed) line it starts on, where its token starts, and where the
+    # line's content ends
+    line: int
+    start: int
+    end: int
+
+    # The last line with content in the block, the definition's line for a macro
+    last_line: int
+
+    @property
+    def kind(self) -> SymbolKind:
+        """How the client should show the symbol"""
+        return SymbolKind.Class if self.major else SymbolKind.Constant
+
+    @property
+    def label(self) -> str:
+        """The symbol's name, or its token if the block has no name"""
+        return self.name or f"@{self.major}"
+
+    @property
+    def range(self) -> Range:
+        """The lines of the block, whole"""
+        return _range(self.line, self.start, self.last_line + 1, 0)
+
+    @property
+    def selection_range(self) -> Range:
+        """The block's token line, or the definition"""
+        return _range(self.line, self.start, self.line, self.end)
+
+
+# A line of a block: its minor token, value, line and the columns of the token
+# and of the line's content
+_Field = Tuple[str, str, int, int, int, int]
+
+
+def outline(
+    lines: Iterable[str], spans: Optional[Union[SpanMap, LazySpans]] = None
+) -> List[Symbol]:
+    """Outlines a document
+    Parameters: The document's lines, and their spans if they have already been
+                scanned
+       Returns: The document's symbols, in order
+       Effects: None
+    """
+    return [symbol for (symbol, _) in _blocks(lines, spans)]
+
+
+def document_symbols(
+    lines: Iterable[str], spans: Optional[Union[SpanMap, LazySpans]] = None
+) -> List[DocumentSymbol]:
+    """Outlines a document for the client, with the lines of each block
+    Parameters: The document's lines, and their spans if they have already been
+                scanned
+       Returns: A DocumentSymbol for each symbol, in order
+       Effects: None
+    """
+    return [
+        DocumentSymbol(
+            name=symbol.label,
+            detail=f"@{symbol.major}" if symbol.major else None,
+            kind=symbol.kind,
+            range=symbol.range,
+            selection_range=symbol.selection_range,
+            children=[
+                DocumentSymbol(
+                    name=minor,
+                    detail=value,
+                    kind=SymbolKind.Field,
+                    range=_range(line, start, line, end),
+                    selection_range=_range(line, start, line, token_end),
+                )
+                for (minor, value, line, start, token_end, end) in fields
+            ],
+        )
+        for (symbol, fields) in _blocks(lines, spans)
+    ]
+
+
+def _blocks(
+    lines: Iterable[str], spans: Optional[Union[SpanMap, LazySpans]]
+) -> Iterator[Tuple[Symbol, List[_Field]]]:
+    """Walks the blocks and macro definitions of a document
+    Parameters: The document's lines, and their spans if they have already been
+                scanned
+       Returns: An iterator over the symbols, each with the minor token lines
+                of its block
+       Effects: None
+    """
+    # The lines may be an iterator, so they can only be walked once. The spans
+    # are looked up by line, the way the rest of the server reads them.
+    scanned: Iterator[Tuple[str, LineSpans]]
+    if spans is None:
+        scanned = ((text, scan_line(text)) for text in lines)
+    else:
+        scanned = ((text, spans[line]) for (line, text) in enumerate(lines))
+
+    current: Optional[Symbol] = None
+    fields: List[_Field] = []
+    last_line = 0
+    for (line, (text, line_spans)) in enumerate(scanned):
+        kind = line_spans.kind
+        if kind in (LineKind.BLANK, LineKind.COMMENT):
+            continue
+
+        if kind == LineKind.MACRO or (kind == LineKind.TOKEN and not line_spans.minor):
+            if current is not None:
+                yield (current._replace(last_line=last_line), fields)
+            current = Symbol(
+                line_spans.macro or text[line_spans.value_start : line_spans.end],
+                line_spans.major,
+                line,
+                line_spans.start,
+                line_spans.end,
+                line,
+            )
+            fields = []
+        elif (
+            kind == LineKind.TOKEN
+            and current is not None
+            and line_spans.major == current.major
+        ):
+            fields.append(
+                (
+                    line_spans.minor,
+                    text[line_spans.value_start : line_spans.end],
+                    line,
+                    line_spans.start,
+                    line_spans.token_end,
+                    line_spans.end,
+                )
+            )
+        last_line = line
+
+    if current is not None:
+        yield (current._replace(last_line=last_line), fields)
+
+
+def _range(line: int, start: int, last_line: int, end: int) -> Range:
+    """A Range from a position on one line to a position on another"""
+    return Range(
+        start=Position(line=line, character=start),
+        end=Position(line=last_line, character=end),
+    )
@@ -0,0 +1,162 @@
+"""token_cache.py
+
+On: October 2026
+
+Keeps the token dictionary that medford_tokens.py extracts from the parser's
+schema in the user's cache directory. Extracting it means importing pydantic
+and the parser's models and walking the whole schema, which is most of the
+time it takes the server to start. The cached copy is keyed on the installed
+version of the parser, and on hashes of the models and of the extraction code,
+so it is rebuilt whenever any of them change. Reading it does not import
+pydantic or the models.
+
+The hover contents and completion lists are built from the token dictionary
+(see token_index.py), so they come along for free.
+"""
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from mfdls.pip_helpers import installed_version
+
+# Set this to put the cache somewhere other than the user's cache directory
+CACHE_DIR_VARIABLE = "MFDLS_CACHE_DIR"
+
+_MODELS_MODULE = "MEDFORD.medford_models"
+_TOKENS_FILE = Path(__file__).with_name("medford_tokens.py")
+
+
+def load_available_tokens() -> Dict[str, List[str]]:
+    """Loads the token dictionary from the cache, extracting it if needed
+    Parameters: None
+       Returns: A dict mapping major tokens to their associated minor tokens,
+                exactly as medford_tokens.get_available_tokens returns it
+       Effects: Writes the cache if it was missing or stale
+    """
+    path = cache_path()
+
+    tokens = _read(path) if path else None
+    if tokens is not None:
+        return tokens
+
+    # pylint: disable-next=C0415
+    from mfdls.medford_tokens import get_available_tokens
+
+    tokens = get_available_tokens()
+    if path:
+        atomic_write_json(path, tokens)
+
+    return tokens
+
+
+def cache_path() -> Optional[Path]:
+    """Determines where the token dictionary for the installed parser is cached
+    Parameters: None
+       Returns: The path to the cache file, or None if the parser's models
+                cannot be found
+       Effects: None
+    """
+    key = _cache_key()
+    if key is None:
+        return None
+    return cache_dir() / f"tokens-{key}.json"
+
+
+def cache_dir() -> Path:
+    """The directory the server caches things in
+    Parameters: None
+       Returns: The path to the directory, which may not exist yet
+       Effects: None
+    """
+    override = os.environ.get(CACHE_DIR_VARIABLE)
+    if override:
+        return Path(override)
+
+    if sys.platform == "win32":
+        base = Path(os.environ.get("LOCALAPPDATA", Path.home() / "AppData" / "Local"))
+        return base / "mfdls" / "Cache"
+    if sys.platform == "darwin":
+        return Path.home() / "Library" / "Caches" / "mfdls"
+
+    base = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    return base / "mfdls"
+
+
+def atomic_write_json(path: Path, data: Any) -> bool:
+    """Writes JSON to a file in the cache
+    Parameters: The path to the file and the data to write
+       Returns: True if the file was written
+       Effects: Creates the file's directory if needed. The file is replaced
+                atomically, so servers starting at the same time never see half
+                of one. Failures are logged, a cache can always be rebuilt.
+    """
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        (handle, temp) = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    except OSError as err:
+        logging.warning(f"Could not write {path}: {err}")
+        return False
+
+    try:
+        with os.fdopen(handle, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(temp, path)
+    except OSError as err:
+        logging.warning(f"Could not write {path}: {err}")
+        Path(temp).unlink(missing_ok=True)
+        return False
+    return True
+
+
+def _cache_key() -> Optional[str]:
+    """Builds the cache key from the parser's version, and the contents of the
+    parser's models and of the code that extracts the tokens from them
+    Parameters: None
+       Returns: The key, or None if the parser's models cannot be found
+       Effects: None
+         Notes: Finding the models' file imports the (empty) MEDFORD package,
+                but not the models themselves.
+    """
+    try:
+        spec = importlib.util.find_spec(_MODELS_MODULE)
+    except ModuleNotFoundError:
+        return None
+    if spec is None or spec.origin is None:
+        return None
+
+    digest = hashlib.sha256(installed_version("medford").encode("utf-8"))
+    try:
+        digest.update(Path(spec.origin).read_bytes())
+        digest.update(_TOKENS_FILE.read_bytes())
+    except OSError:
+        return None
+
+    return digest.hexdigest()[:16]
+
+
+def _read(path: Path) -> Optional[Dict[str, List[str]]]:
+    """Reads a cached token dictionary
+    Parameters: The path to the cache file
+       Returns: The token dictionary, or None if the file is missing or invalid
+       Effects: None
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            tokens = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(tokens, dict) or not all(
+        isinstance(minors, list) and all(isinstance(m, str) for m in minors)
+        for minors in tokens.values()
+    ):
+        logging.warning(f"Ignoring malformed token cache {path}")
+        return None
+
+    return tokens
@@ -0,0 +1,160 @@
+"""token_index.py
+
+On: October 2026
+
+An index of the tokens that MEDFORD defines, built once when the server starts.
+The token names are interned, and everything that completion and hover send
+back to the text editor (the completion lists, and the hover contents) is
+built up front, so that answering a request is just a lookup. A prefix trie
+over the major tokens, and one over each major token's minor tokens, serves
+completion requests for partially typed tokens.
+
+The lists and contents handed out are shared between requests, so they must not
+be modified.
+"""
+import sys
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from lsprotocol.types import CompletionItem, CompletionList, MarkedString
+
+
+class _TrieNode:
+    """A node in a prefix trie, holding the completions for every token that
+    starts with the prefix leading to it"""
+
+    __slots__ = ("children", "completions")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.completions: Optional[CompletionList] = None
+
+
+class PrefixTrie:
+    """A prefix trie over a set of names, answering with prebuilt CompletionLists"""
+
+    def __init__(self, names: Tuple[str, ...]):
+        self._root = _TrieNode()
+
+        # Collect the names under each node first, so each node's list is built
+        # exactly once, in the order the names were given.
+        below: Dict[int, List[str]] = {}
+        nodes = [self._root]
+        for name in names:
+            node = self._root
+            below.setdefault(id(node), []).append(name)
+            for char in name:
+                if char not in node.children:
+                    node.children[char] = _TrieNode()
+                    nodes.append(node.children[char])
+                node = node.children[char]
+                below.setdefault(id(node), []).append(name)
+
+        items = {name: CompletionItem(label=name) for name in names}
+        for node in nodes:
+            node.completions = CompletionList(
+                is_incomplete=False,
+                items=[items[name] for name in below.get(id(node), [])],
+            )
+
+    def complete(self, prefix: str = "") -> Optional[CompletionList]:
+        """Finds the names that start with a prefix
+        Parameters: The prefix, empty for every name
+           Returns: A CompletionList of the matching names, or None if no names match
+           Effects: None
+        """
+        node = self._root
+        for char in prefix:
+            child = node.children.get(char)
+            if child is None:
+                return None
+            node = child
+        return node.completions
+
+
+class TokenIndex:
+    """An immutable index of the major tokens and their minor tokens"""
+
+    def __init__(self, tokens: Dict[str, List[str]]):
+        self._minors: Mapping[str, Tuple[str, ...]] = MappingProxyType(
+            {
+                sys.intern(major): tuple(sys.intern(minor) for minor in minors)
+                for major, minors in tokens.items()
+            }
+        )
+        self._majors = tuple(self._minors.keys())
+
+        self._major_trie = PrefixTrie(self._majors)
+        self._minor_tries = {
+            major: PrefixTrie(minors) for (major, minors) in self._minors.items()
+        }
+
+        self._major_hovers = {
+            major: _create_contents_major(major, minors)
+            for (major, minors) in self._minors.items()
+        }
+        self._minor_hovers = {
+            major: _create_contents_minor(major, minors)
+            for (major, minors) in self._minors.items()
+        }
+
+    def __contains__(self, major: str) -> bool:
+        return major in self._minors
+
+    @property
+    def majors(self) -> Tuple[str, ...]:
+        """The major tokens, in the order the parser defines them"""
+        return self._majors
+
+    @property
+    def tokens(self) -> Mapping[str, Tuple[str, ...]]:
+        """A read-only mapping of the major tokens to their minor tokens"""
+        return self._minors
+
+    def complete_major(self, prefix: str = "") -> Optional[CompletionList]:
+        """Completes a major token
+        Parameters: The part of the token typed so far
+           Returns: The major tokens starting with that prefix, or None if there
+                    are none
+           Effects: None
+        """
+        return self._major_trie.complete(prefix)
+
+    def complete_minor(self, major: str, prefix: str = "") -> Optional[CompletionList]:
+        """Completes a minor token
+        Parameters: The major token and the part of the minor token typed so far
+           Returns: The major token's minor tokens starting with that prefix, or
+                    None if the major token is user-defined or none match
+           Effects: None
+        """
+        trie = self._minor_tries.get(major)
+        if trie is None:
+            return None
+        return trie.complete(prefix)
+
+    def major_hover(self, major: str) -> Optional[List[MarkedString]]:
+        """The hover contents of a major token, or None if it is user-defined"""
+        return self._major_hovers.get(major)
+
+    def minor_hover(self, major: str) -> Optional[str]:
+        """The hover contents of a major token's minor tokens, or None if the
+        major token is user-defined"""
+        return self._minor_hovers.get(major)
+
+
+def _create_contents_major(major: str, minors: Tuple[str, ...]) -> List[MarkedString]:
+    """Generates a contents property for the Hover of a Major Token.
+    Parameters: The token and its minor tokens
+       Returns: A formatted contents property
+       Effects: None
+    """
+    return ["Major Token: @" + major, "Associated Minor Tokens: " + ", ".join(minors)]
+
+
+def _create_contents_minor(major: str, minors: Tuple[str, ...]) -> str:
+    """Generates a contents property for the Hover of a Minor Token.
+    Parameters: The minor token's major token and its minor tokens
+       Returns: A formatted contents property
+       Effects: None
+    """
+    return f"Other minor tokens of @{major}: " + ", ".join(minors)
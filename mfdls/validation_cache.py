@@ -0,0 +1,137 @@
+"""validation_cache.py
+
+On: October 2026
+
+A bounded cache of validation results, keyed on the hash of a document's
+contents, the mode it was validated in and the version of the medford parser
+that validated it. Editors open, save and switch between the same files all
+the time, and byte-identical contents always validate the same way, so there
+is no need to run them through the parser again.
+
+A document validated in several modes has an entry for each of them, so that
+the results of one mode are found again whichever other modes it is validated
+alongside.
+"""
+import copy
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from lsprotocol.types import Diagnostic
+
+from mfdls.compact_details import CompactDetails
+from mfdls.medford_validation import ExportedDict, ValidationMode
+from mfdls.pip_helpers import installed_version
+
+DEFAULT_CACHE_SIZE = 128
+
+
+class CachedValidation(NamedTuple):
+    """The results of validating a document in a mode"""
+
+    uri: str
+    details: CompactDetails
+    macros: Dict[str, Tuple[int, str]]
+    exported: Optional[ExportedDict]
+    syntax_diagnostics: List[Diagnostic]
+    semantic_diagnostics: List[Diagnostic]
+
+
+# Content hash, validation mode and parser version
+CacheKey = Tuple[str, ValidationMode, str]
+
+
+class ValidationCache:
+    """A least recently used cache of validation results"""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[CacheKey, CachedValidation]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(
+        self, uri: str, source_hash: str, mode: ValidationMode
+    ) -> Optional[CachedValidation]:
+        """Looks up the results of validating a document
+        Parameters: The document's uri, the hash of its contents and the mode
+                    it is being validated in
+           Returns: The cached results, or None if there are none. If the results
+                    were cached for another document with the same contents, the
+                    diagnostics are changed to point at this document.
+           Effects: Counts the hit or miss, marks the entry as recently used
+        """
+        key = (source_hash, mode, installed_version("medford"))
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+
+        if entry.uri != uri:
+            entry = entry._replace(
+                uri=uri,
+                syntax_diagnostics=retarget(entry.syntax_diagnostics, entry.uri, uri),
+                semantic_diagnostics=retarget(
+                    entry.semantic_diagnostics, entry.uri, uri
+                ),
+            )
+
+        return entry
+
+    def put(
+        self, source_hash: str, mode: ValidationMode, entry: CachedValidation
+    ) -> None:
+        """Caches the results of validating a document
+        Parameters: The hash of the document's contents, the mode it was validated
+                    in and the results
+           Returns: None
+           Effects: May evict the least recently used entry
+        """
+        key = (source_hash, mode, installed_version("medford"))
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > max(0, self.max_entries):
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Empties the cache, but keeps the counters
+        Parameters: None
+           Returns: None
+           Effects: Removes every entry
+        """
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Reports on how well the cache is doing
+        Parameters: None
+           Returns: The hit and miss counts and the number of entries
+           Effects: None
+        """
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+
+def retarget(
+    diagnostics: List[Diagnostic], old_uri: str, new_uri: str
+) -> List[Diagnostic]:
+    """Points any related information in a list of diagnostics at another document
+    Parameters: The diagnostics, the uri they point to, and the uri they should
+                point to instead
+       Returns: The updated diagnostics, copied if they needed to change
+       Effects: None
+    """
+    retargeted = []
+    for diag in diagnostics:
+        if diag.related_information:
+            diag = copy.deepcopy(diag)
+            for info in diag.related_information or []:
+                if info.location.uri == old_uri:
+                    info.location.uri = new_uri
+        retargeted.append(diag)
+    return retargeted
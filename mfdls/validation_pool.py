@@ -0,0 +1,238 @@
+"""validation_pool.py
+
+On: October 2026
+
+Runs the semantic stage of validation (detailparser, export, and the pydantic
+models) in a pool of worker processes, so that a large document validating
+does not hold up the server's event loop, and with it hover and completion.
+Only plain data crosses the process boundary: the tokenized details go in
+and the semantic errors come out, to be converted to Diagnostics by the server.
+The pool can run other picklable work too, like validating a batch of files
+from the workspace.
+
+A document validated in several modes is only exported once. The models are
+what takes the time, and pydantic holds the GIL while it builds them, so with
+more than one worker process each mode's model is built on a worker of its own,
+from the same exported dict.
+
+The pool can be made of threads instead (see parse_context.py for how the
+parser is kept from tripping over itself). Threads share the GIL, so they only
+validate one document at a time, but they start instantly, share the server's
+memory and don't need anything pickled.
+"""
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import (
+    BrokenExecutor,
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import Any, Callable, Optional, Sequence, Tuple, TypeVar
+
+from MEDFORD.medford_detail import detail
+
+from mfdls.medford_validation import (
+    ExportedDict,
+    ModeErrors,
+    Modes,
+    export_details,
+    load_parser,
+    mode_errors,
+    model_validation,
+    validate_modes,
+)
+from mfdls.metrics import merge, timed_call
+from mfdls import profiler
+
+_T = TypeVar("_T")
+
+# Default number of worker processes. Zero validates on the event loop.
+DEFAULT_WORKERS = 1
+
+
+class ValidationPool:
+    """A resizable pool of pre-warmed worker processes, or threads"""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, threads: bool = False):
+        self._workers = workers
+        self._threads = threads
+        self._executor: Optional[Executor] = None
+
+    @property
+    def workers(self) -> int:
+        """The number of worker processes, zero if validating on the event loop"""
+        return self._workers
+
+    @property
+    def threads(self) -> bool:
+        """Whether the workers are threads rather than processes"""
+        return self._threads
+
+    def start(self) -> None:
+        """Starts the worker processes, if they are not already running
+        Parameters: None
+           Returns: None
+           Effects: Spawns the workers, and has each of them import MEDFORD
+         Notes: Processes are only forked while this process has no other
+                threads (see _context), so it is best to call this before the
+                server starts any. Pools started later, by resize or after a
+                worker dies, start their workers from a fork server.
+        """
+        if self._workers <= 0 or self._executor is not None:
+            return
+
+        if self._threads:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._workers,
+                thread_name_prefix="mfdls-validation",
+                initializer=_warm_up,
+            )
+            return
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=self._workers,
+            mp_context=_context(),
+            initializer=_warm_up,
+        )
+
+        # The executor only spawns workers as it needs them, so give it
+        # something to do.
+        for _ in range(self._workers):
+            self._executor.submit(_warm_up)
+
+    def resize(self, workers: int, threads: Optional[bool] = None) -> None:
+        """Changes the number of workers, or what they are
+        Parameters: The new number of workers, zero to validate on the event loop,
+                    and whether they should be threads (unchanged if None)
+           Returns: None
+           Effects: Replaces the pool. Running validations are allowed to finish.
+        """
+        workers = max(0, workers)
+        threads = self._threads if threads is None else threads
+        if workers == self._workers and threads == self._threads:
+            return
+
+        self.shutdown()
+        self._workers = workers
+        self._threads = threads
+        self.start()
+
+    def shutdown(self) -> None:
+        """Stops the worker processes
+        Parameters: None
+           Returns: None
+           Effects: Shuts down the pool without waiting for the workers
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def validate_modes(
+        self, details: Sequence[detail], modes: Modes
+    ) -> Tuple[ExportedDict, ModeErrors]:
+        """Performs a semantic validation on the workers, in several modes
+        Parameters: The tokenized document and the modes to validate in
+           Returns: The exported dict and the errors found in each mode, as
+                    plain data
+           Effects: See run
+             Notes: The document is exported on one worker, and the models are
+                    built as model_validation builds them.
+        """
+        if not self._concurrent(modes):
+            return await self._profiled(validate_modes, details, modes)
+
+        final_dict = await self._profiled(export_details, details)
+        return (final_dict, await self.model_validation(final_dict, modes))
+
+    async def model_validation(
+        self, final_dict: ExportedDict, modes: Modes
+    ) -> ModeErrors:
+        """Builds the models of several modes from a document's exported dict
+        Parameters: The exported dict and the modes to validate in
+           Returns: The errors found in each mode, as plain data
+           Effects: See run
+             Notes: With more than one worker process, each model is built on a
+                    worker of its own, otherwise they are built one after
+                    another on the same worker.
+        """
+        if not self._concurrent(modes):
+            return await self.run(model_validation, final_dict, modes)
+
+        found = await asyncio.gather(
+            *(self.run(mode_errors, final_dict, mode) for mode in modes)
+        )
+        return dict(zip(modes, found))
+
+    def _concurrent(self, modes: Modes) -> bool:
+        """Whether the models of some modes should be built on separate workers"""
+        return len(modes) > 1 and self._workers > 1 and not self._threads
+
+    async def _profiled(self, function: Callable[..., _T], *args: Any) -> _T:
+        """Runs a step of semantic validation on a worker process, profiled on
+        the worker if the profiler is waiting for one, see run"""
+        # Profiled on the worker, which writes out the profile itself
+        target = profiler.claim("semantic_validation")
+        if target is not None:
+            return await self.run(profiler.profiled_call, target, function, *args)
+        return await self.run(function, *args)
+
+    async def run(self, function: Callable[..., _T], *args: Any) -> _T:
+        """Runs a function on a worker process
+        Parameters: The function and its arguments, which must all be picklable
+           Returns: Whatever the function returns
+           Effects: Starts the pool if needed. If a worker dies, the pool is
+                    replaced and the function is run again.
+        """
+        if self._workers <= 0:
+            return function(*args)
+
+        self.start()
+        loop = asyncio.get_event_loop()
+
+        # The workers send back what they measured along with the results
+        try:
+            (result, samples) = await loop.run_in_executor(
+                self._executor, timed_call, function, *args
+            )
+        except BrokenExecutor:
+            logging.warning("Validation worker died, restarting the pool")
+            self.shutdown()
+            self.start()
+            (result, samples) = await loop.run_in_executor(
+                self._executor, timed_call, function, *args
+            )
+        merge(samples)
+        return result
+
+
+def _context() -> multiprocessing.context.BaseContext:
+    """Picks how to start worker processes
+    Parameters: None
+       Returns: A fork context where the platform supports it and this process
+                has no other threads, since forked workers inherit the already
+                imported parser. Forking copies whatever locks other threads
+                hold, which can deadlock the workers, so once there are threads
+                a forkserver context where the platform supports it. Otherwise
+                the platform's default.
+       Effects: Has the fork server import the parser before it forks workers
+    """
+    methods = multiprocessing.get_all_start_methods()
+    if "fork" in methods and threading.active_count() == 1:
+        return multiprocessing.get_context("fork")
+
+    if "forkserver" in methods:
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__, "MEDFORD.medford"])
+        return context
+
+    return multiprocessing.get_context()
+
+
+def _warm_up() -> None:
+    """Imports the parser and the pydantic models in a worker, which is the slow
+    part of starting one.
+    """
+    load_parser()
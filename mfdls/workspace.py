@@ -0,0 +1,202 @@
+"""workspace.py
+
+On: October 2026
+
+Finds and validates the MEDFORD files in a workspace, whether or not they are
+open in the text editor. Files are validated in batches, so that a sweep over
+thousands of small files spends its time validating rather than passing
+files back and forth between processes. Everything here can run in a worker
+process: paths go in, and (uri, Diagnostics) pairs come out.
+"""
+import logging
+import os
+from typing import Iterable, Iterator, List, Optional, Set, Tuple, TypeVar, Union
+
+from lsprotocol.types import Diagnostic
+from pygls.uris import from_fs_path
+from pygls.workspace import Document
+
+from mfdls.document_state import hash_source
+from mfdls.line_source import Buffer, LineIndex, map_file
+from mfdls.medford_syntax import validate_buffer, validate_syntax
+from mfdls.medford_validation import (
+    ModeErrors,
+    Modes,
+    merge_mode_diagnostics,
+    semantic_errors_to_diagnostics,
+    validate_modes,
+)
+from mfdls.span_map import LazySpans, SpanMap
+
+MEDFORD_EXTENSION = ".mfd"
+
+# Directories that never hold records worth validating, on top of hidden ones
+_SKIPPED_DIRECTORIES = frozenset(("node_modules", "__pycache__", "venv"))
+
+# The most files validated in one batch. Smaller batches report progress more
+# often and balance better between workers, bigger ones spend less time in
+# process overhead.
+MAX_BATCH_SIZE = 32
+
+# How many batches each worker should get, at least, so a few slow files don't
+# leave the other workers idle at the end of the sweep
+_BATCHES_PER_WORKER = 4
+
+# Files at least this big are read a line at a time through a memory map,
+# rather than into memory and then into a list of lines
+MAPPED_FILE_SIZE = 8 * 1024 * 1024
+
+FileResult = Tuple[str, List[Diagnostic]]
+
+_T = TypeVar("_T")
+
+
+def find_medford_files(roots: Iterable[str]) -> List[str]:
+    """Finds the MEDFORD files under a set of directories
+    Parameters: The directories to search
+       Returns: The paths of the files, sorted and without duplicates
+       Effects: None
+    """
+    paths: Set[str] = set()
+    for root in roots:
+        for (directory, subdirectories, files) in os.walk(root):
+            # Prune in place, so os.walk does not descend into them
+            subdirectories[:] = [
+                sub
+                for sub in subdirectories
+                if not sub.startswith(".") and sub not in _SKIPPED_DIRECTORIES
+            ]
+            paths.update(
+                os.path.join(directory, name)
+                for name in files
+                if name.endswith(MEDFORD_EXTENSION)
+            )
+    return sorted(paths)
+
+
+def batches(paths: List[_T], workers: int) -> Iterator[List[_T]]:
+    """Splits files into batches to validate
+    Parameters: The files (their paths, or anything else that identifies them)
+                and the number of workers that will
+                validate them
+       Returns: An iterator over the batches
+       Effects: None
+    """
+    size = -(-len(paths) // max(1, workers * _BATCHES_PER_WORKER))
+    size = min(MAX_BATCH_SIZE, max(1, size))
+    for start in range(0, len(paths), size):
+        yield paths[start : start + size]
+
+
+def hash_files(paths: List[str]) -> List[Tuple[str, str]]:
+    """Hashes the contents of files, to tell which have changed
+    Parameters: The paths of the files
+       Returns: The path and hash (see document_state.hash_source) of each file
+                that could be read
+       Effects: Reads the files. Failures are logged.
+    """
+    hashes = []
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                hashes.append((path, hash_source(f.read())))
+        except (OSError, UnicodeDecodeError) as err:
+            logging.warning(f"Could not read {path}: {err}")
+    return hashes
+
+
+def validate_files(paths: List[str], modes: Modes) -> List[FileResult]:
+    """Validates a batch of MEDFORD files
+    Parameters: The paths of the files and the modes to validate in
+       Returns: The uri and Diagnostics of each file that could be validated
+       Effects: Reads the files
+    """
+    results = []
+    for path in paths:
+        result = validate_file(path, modes)
+        if result is not None:
+            results.append(result)
+    return results
+
+
+def validate_file(path: str, modes: Modes) -> Optional[FileResult]:
+    """Validates a MEDFORD file, syntax and semantics
+    Parameters: The path to the file and the modes to validate in
+       Returns: The file's uri and Diagnostics, or None if the file could not be
+                read or validated
+       Effects: Reads the file. Failures are logged.
+    """
+    uri = from_fs_path(path)
+    source = None
+    try:
+        if os.path.getsize(path) < MAPPED_FILE_SIZE:
+            with open(path, "r", encoding="utf-8") as f:
+                source = f.read()
+    except (OSError, UnicodeDecodeError) as err:
+        logging.warning(f"Could not read {path}: {err}")
+        return None
+
+    # One broken file should not stop the rest of the sweep, so anything the
+    # parser raises is logged and the file skipped.
+    try:
+        if source is None:
+            with map_file(path) as buffer:
+                return (uri, validate_mapped(uri, buffer, modes))
+        return (uri, validate_source(uri, source, modes))
+    # pylint: disable-next=W0703
+    except Exception as err:
+        logging.warning(f"Could not validate {path}: {err!r}")
+        return None
+
+
+def validate_source(uri: str, source: str, modes: Modes) -> List[Diagnostic]:
+    """Validates the contents of a MEDFORD file, syntax and semantics
+    Parameters: The file's uri and contents, and the modes to validate in
+       Returns: The file's Diagnostics
+       Effects: None
+         Notes: Raises whatever the parser raises on documents it can't handle
+    """
+    doc = Document(uri, source)
+    spans = SpanMap()
+    spans.update(doc.lines)
+
+    (details, diagnostics) = validate_syntax(doc, spans)
+    if details:
+        (_, errors) = validate_modes(details, modes)
+        diagnostics += _merge_modes(errors, modes, spans)
+
+    return diagnostics
+
+
+def validate_mapped(uri: str, buffer: Buffer, modes: Modes) -> List[Diagnostic]:
+    """Validates the contents of a large MEDFORD file, syntax and semantics,
+    without holding a copy of its lines
+    Parameters: The file's uri, its bytes (see line_source.map_file), and the
+                modes to validate in
+       Returns: The file's Diagnostics
+       Effects: None
+         Notes: Raises whatever the parser raises on documents it can't handle,
+                and UnicodeDecodeError if the file isn't UTF-8
+    """
+    (details, diagnostics) = validate_buffer(buffer, uri)
+    if details:
+        (_, errors) = validate_modes(details, modes)
+        if any(errors.values()):
+            spans = LazySpans(LineIndex(buffer))
+            diagnostics += _merge_modes(errors, modes, spans)
+
+    return diagnostics
+
+
+def _merge_modes(
+    errors: ModeErrors, modes: Modes, spans: Union[SpanMap, LazySpans]
+) -> List[Diagnostic]:
+    """Converts the semantic errors found in each mode to Diagnostics, see
+    medford_validation.merge_mode_diagnostics"""
+    return merge_mode_diagnostics(
+        {
+            mode: semantic_errors_to_diagnostics(mode_errors, spans)
+            for (mode, mode_errors) in errors.items()
+        },
+        modes,
+    )
@@ -0,0 +1,47 @@
+from mfdls.check import ResultCache, check, to_sarif
+from mfdls.medford_validation import ValidationMode
+
+BROKEN = "@MEDFORD Example\n@MEDFORD-Version 2.0\n@Keyword `@Missing\n"
+
+
+def test_results_are_cached(tmp_path):
+    (tmp_path / "a.mfd").write_text(BROKEN)
+    (tmp_path / "b.mfd").write_text(BROKEN)
+    paths = [str(tmp_path / "a.mfd"), str(tmp_path / "b.mfd")]
+    cache_file = tmp_path / "cache" / "check.json"
+
+    cache = ResultCache(cache_file)
+    first = check(paths, ValidationMode.OTHER, 0, cache)
+    assert not any(r.cached for r in first)
+    assert first[0].diagnostics == first[1].diagnostics
+
+    # Nothing is written until the cache is saved
+    assert not cache_file.exists()
+    cache.save()
+
+    second = check(paths, ValidationMode.OTHER, 0, ResultCache(cache_file))
+    assert all(r.cached for r in second)
+    assert [r.diagnostics for r in second] == [r.diagnostics for r in first]
+
+    # Other modes are validated separately
+    third = check(paths, ValidationMode.BAGIT, 0, ResultCache(cache_file))
+    assert not third[0].cached
+
+
+def test_unreadable_files_are_reported(tmp_path):
+    (tmp_path / "a.mfd").write_text(BROKEN)
+    paths = [str(tmp_path / "a.mfd"), str(tmp_path / "missing.mfd")]
+
+    reports = check(paths, ValidationMode.OTHER, 0)
+    assert reports[0].error is None and reports[0].diagnostics
+    assert reports[1].error
+
+    sarif = to_sarif(reports)["runs"][0]
+    assert sarif["results"][0]["ruleId"] == reports[0].diagnostics[0].code
+    assert sarif["results"][0]["locations"][0]["physicalLocation"]["region"] == {
+        "startLine": 3,
+        "startColumn": 12,
+        "endLine": 3,
+        "endColumn": 19,
+    }
+    assert not sarif["invocations"][0]["executionSuccessful"]
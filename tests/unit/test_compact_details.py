@@ -0,0 +1,95 @@
+import pickle
+
+from pygls.workspace import Document
+
+from mfdls.compact_details import CompactDetails, Names
+from mfdls.medford_syntax import validate_syntax
+
+DOCUMENT = "\n".join(
+    [
+        "@MEDFORD Example record",
+        "@MEDFORD-Version 1.0",
+        "`@Lab Tufts BCB",
+        "",
+        "@Contributor Liam Strand",
+        "@Contributor-Association `@Lab",
+        "# Andrew is next",
+        "@Contributor Andrew Powers   ",
+        "@Contributor-Association `@{Lab} at URI",
+        "  which continues on this line # with a comment",
+        "",
+        "   and on this one",
+        "@Keyword coral # inline comment",
+        "\t@Keyword symbiosis",
+        "@Keyword a  b",
+    ]
+)
+
+
+def _details(details):
+    return [
+        (
+            d.Major_Tokens,
+            d.Combined_Major_Token,
+            d.Minor_Token,
+            d.Line_Number,
+            d.Depth,
+            d.Data,
+        )
+        for d in details
+    ]
+
+
+def _compact():
+    (details, _) = validate_syntax(Document("file://fake_doc.mfd", DOCUMENT))
+    return (
+        details,
+        CompactDetails.from_details(DOCUMENT, DOCUMENT.splitlines(), details),
+    )
+
+
+def test_round_trip():
+    (details, compact) = _compact()
+
+    assert len(compact) == len(details)
+    assert _details(compact) == _details(details)
+    assert _details(compact.to_details()) == _details(details)
+    assert _details([compact[-1]]) == _details(details[-1:])
+
+    # Only the values with macros in them are copied (the parser repeats the
+    # detail before a comment, so the first one is there twice)
+    assert sorted(compact.overrides) == [3, 4, 6]
+
+
+def test_pickle_and_shift():
+    (details, compact) = _compact()
+
+    assert _details(pickle.loads(pickle.dumps(compact))) == _details(details)
+
+    # Two lines added to the top of the document
+    source = "# one\n# two\n" + DOCUMENT
+    shifted = CompactDetails(source, compact.names)
+    shifted.extend(compact, compact.find(4), len(compact), 2)
+
+    expected = [
+        (majors, combined, minor, line + 2, depth, data)
+        for (majors, combined, minor, line, depth, data) in _details(details)
+        if line > 4
+    ]
+    assert _details(shifted) == expected
+
+
+def test_names_past_16_bits():
+    # Every partly typed token a session sees stays in the table
+    names = Names()
+    for index in range(70000):
+        names.index(f"Token{index}")
+
+    (details, _) = validate_syntax(Document("file://fake_doc.mfd", DOCUMENT))
+    compact = CompactDetails.from_details(
+        DOCUMENT, DOCUMENT.splitlines(), details, names
+    )
+
+    assert max(compact.majors) >= 70000
+    assert _details(compact) == _details(details)
+    assert _details(pickle.loads(pickle.dumps(compact))) == _details(details)
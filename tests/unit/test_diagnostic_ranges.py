@@ -0,0 +1,105 @@
+from pygls.workspace import Document
+
+from mfdls.medford_incremental import IncrementalTokenizer
+from mfdls.medford_syntax import validate_syntax, validate_window
+from mfdls.medford_validation import semantic_errors_to_diagnostics
+from mfdls.span_map import SpanMap
+
+SOURCE = "\n".join(
+    [
+        "@MEDFORD Example record",
+        "`@Lab Tufts BCB",
+        "@Contributor Liam Strand",
+        "@Contributor-Association `@Lab and `@{Ship}",
+        "@Keyword [..]",
+        "  @Date-Note `@Nowhere",
+        "`@Lab Somewhere else",
+        "",
+    ]
+)
+
+
+def ranges(diagnostics):
+    return [
+        (
+            d.code,
+            (d.range.start.line, d.range.start.character),
+            (d.range.end.line, d.range.end.character),
+        )
+        for d in diagnostics
+    ]
+
+
+def test_syntax_ranges():
+    doc = Document("file:///a.mfd", SOURCE)
+    spans = SpanMap()
+    spans.update(doc.lines)
+
+    (_, scanned) = validate_syntax(doc)
+    (_, from_spans) = IncrementalTokenizer().validate(doc, spans)
+
+    assert ranges(scanned) == ranges(from_spans)
+    assert sorted(ranges(scanned)) == [
+        ("duplicated_macro", (1, 2), (1, 5)),
+        ("no_desc", (5, 2), (5, 12)),
+        ("remaining_template", (4, 9), (4, 13)),
+        ("unexpected_macro", (3, 38), (3, 42)),
+        ("unexpected_macro", (5, 15), (5, 22)),
+    ]
+    duplicated = next(d for d in scanned if d.code == "duplicated_macro")
+    assert duplicated.related_information[0].location.range.start.line == 6
+
+
+def test_window_ranges():
+    (_, scanned) = validate_syntax(Document("file:///a.mfd", SOURCE))
+
+    # Starts from the @Contributor block, with the macros defined above it
+    window = validate_window(SOURCE, "file:///a.mfd", 3, 5)
+
+    assert sorted(ranges(window)) == sorted(
+        r for r in ranges(scanned) if 3 <= r[1][0] <= 5
+    )
+    assert len(window) == 4
+
+
+def test_semantic_ranges():
+    spans = SpanMap()
+    spans.update(SOURCE.splitlines())
+    errors = [
+        (3, "missing_field", "field required", ("Contributor",)),
+        (4, "value_error", "not a valid thing", ("Contributor", "Association")),
+        (2, "value_error", "not a macro", ()),
+        (-1, "value_error", "nowhere", ()),
+    ]
+
+    assert ranges(semantic_errors_to_diagnostics(errors, spans)) == [
+        ("missing_field", (2, 0), (2, 12)),
+        ("value_error", (3, 25), (3, 43)),
+        ("value_error", (1, 0), (2, 0)),
+        ("value_error", (0, 0), (1, 0)),
+    ]
+    assert ranges(semantic_errors_to_diagnostics(errors[:1])) == [
+        ("missing_field", (2, 0), (3, 0))
+    ]
+
+
+def test_semantic_ranges_on_other_lines():
+    spans = SpanMap()
+    spans.update(SOURCE.splitlines())
+    errors = [
+        # About @MEDFORD-Version, but reported on the @MEDFORD line
+        (1, "value_error", "Version 2.0 is not a valid version.", ("MEDFORD",)),
+        (3, "value_error", "invalid date format", ("Date", "desc")),
+        (3, "missing_field", "field required", ("Contributor", "Role")),
+        # Without the tokens, the message has to name the line's token
+        (4, "value_error", "Association is not valid", ()),
+        (4, "value_error", "not a valid thing", ()),
+    ]
+
+    assert ranges(semantic_errors_to_diagnostics(errors, spans)) == [
+        ("value_error", (0, 0), (1, 0)),
+        ("value_error", (2, 0), (3, 0)),
+        ("missing_field", (2, 0), (3, 0)),
+        ("value_error", (3, 25), (3, 43)),
+        ("value_error", (3, 0), (4, 0)),
+    ]
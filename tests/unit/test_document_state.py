@@ -0,0 +1,43 @@
+from mfdls.document_state import DocumentStore, hash_source
+from mfdls.medford_validation import ValidationMode
+
+
+def test_least_recently_used_is_evicted():
+    store = DocumentStore(max_documents=2)
+    store.get("file://a.mfd")
+    store.get("file://b.mfd")
+    store.get("file://a.mfd")
+    store.get("file://c.mfd")
+    store.evict()
+
+    assert "file://a.mfd" in store
+    assert "file://b.mfd" not in store
+    assert "file://c.mfd" in store
+
+
+def test_memory_cap_keeps_most_recent():
+    store = DocumentStore(max_bytes=1000)
+    store.get("file://a.mfd").estimate_size(600)
+    store.get("file://b.mfd").estimate_size(600)
+    store.evict()
+
+    assert len(store) == 1
+    assert "file://b.mfd" in store
+
+
+def test_result_id_follows_validated_contents():
+    state = DocumentStore().get("file://a.mfd")
+    assert state.result_id is None
+
+    state.source_hash = hash_source("@MEDFORD a\n")
+    state.modes = (ValidationMode.OTHER,)
+    first = state.result_id
+
+    state.modes = (ValidationMode.BAGIT,)
+    assert state.result_id != first
+
+    state.modes = (ValidationMode.OTHER, ValidationMode.BAGIT)
+    assert state.result_id not in (first, None)
+
+    state.modes = (ValidationMode.OTHER,)
+    assert state.result_id == first
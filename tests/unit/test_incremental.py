@@ -0,0 +1,123 @@
+import random
+
+import pytest
+from pygls.workspace import Document
+
+from mfdls.medford_incremental import IncrementalTokenizer
+from mfdls.medford_syntax import _tokenize, validate_syntax
+from mfdls.parse_context import ParseContext
+
+FAKE_DOCUMENT_URI = "file://fake_doc.mfd"
+
+BASE_DOCUMENT = [
+    "@MEDFORD Example record",
+    "@MEDFORD-Version 1.0",
+    "`@Lab Tufts BCB",
+    "",
+    "@Contributor Liam Strand",
+    "@Contributor-Association `@Lab",
+    "# Andrew is next",
+    "@Contributor Andrew Powers",
+    "@Contributor-Association `@{Lab} at URI",
+    "  which continues on this line",
+    "@Keyword coral",
+    "@Keyword symbiosis",
+]
+
+# Lines that the random edits draw from. They cover novel details, minor
+# tokens, macro definitions and uses, continuations, comments and the lines
+# that the medford parser reports syntax errors on.
+LINE_POOL = [
+    "@Contributor Polina Shpilker",
+    "@Contributor-Email polina@example.com",
+    "@Contributor-Role [..]",
+    "@Funding-ID 12345",
+    "@Keyword `@Lab",
+    "@Keyword `@Missing",
+    "`@Lab Somewhere else",
+    "`@Ship R/V Tiny",
+    "@Data_Ref The data",
+    "@Data_Ref-URI `@{Ship}",
+    "  and a continuation",
+    "more continuation",
+    "# a comment",
+    "@Keyword value # with an inline comment",
+    "",
+]
+
+
+def _details(details):
+    return [
+        (d.Major_Tokens, d.Minor_Token, d.Line_Number, d.Depth, d.Data) for d in details
+    ]
+
+
+def _incremental(tokenizer):
+    """Validates with a tokenizer, along with the macros it ends up with"""
+
+    def validate(doc):
+        (details, diagnostics) = tokenizer.validate(doc)
+        return (details, diagnostics, tokenizer.macros)
+
+    return validate
+
+
+def _full(doc):
+    """Validates from scratch, along with the macros the whole document defines"""
+    (details, diagnostics) = validate_syntax(doc)
+    context = ParseContext()
+    _tokenize(doc.source.splitlines(), 0, context)
+    return (details, diagnostics, context.macros)
+
+
+def _run(validate, lines):
+    """Returns the outcome of a validation, or the type of exception it raised"""
+    doc = Document(FAKE_DOCUMENT_URI, "\n".join(lines))
+    try:
+        (details, diagnostics, macros) = validate(doc)
+    # pylint: disable-next=W0703
+    except Exception as err:
+        return type(err)
+    return (_details(details), diagnostics, dict(macros))
+
+
+def _edit(rng, lines):
+    """Applies a random insertion, deletion or replacement to a document"""
+    lines = list(lines)
+    # Leave the first line alone so the document always starts with a token
+    pos = rng.randrange(1, len(lines) + 1)
+    action = rng.choice(("insert", "delete", "replace", "block"))
+
+    if action == "insert" or len(lines) < 3:
+        lines.insert(pos, rng.choice(LINE_POOL))
+    elif action == "delete":
+        del lines[min(pos, len(lines) - 1)]
+    elif action == "replace":
+        lines[min(pos, len(lines) - 1)] = rng.choice(LINE_POOL)
+    else:
+        end = min(len(lines), pos + rng.randrange(0, 4))
+        lines[pos:end] = rng.sample(LINE_POOL, rng.randrange(0, 4))
+
+    return lines
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_incremental_matches_full_parse(seed):
+    rng = random.Random(seed)
+    tokenizer = IncrementalTokenizer()
+    lines = BASE_DOCUMENT
+
+    for _ in range(50):
+        lines = _edit(rng, lines)
+        assert _run(_incremental(tokenizer), lines) == _run(_full, lines)
+
+
+def test_only_edited_block_is_retokenized():
+    tokenizer = IncrementalTokenizer()
+    lines = BASE_DOCUMENT * 20
+    tokenizer.validate(Document(FAKE_DOCUMENT_URI, "\n".join(lines)))
+    assert tokenizer.last_retokenized == len(lines)
+
+    lines[100] = lines[100] + " edited"
+    tokenizer.validate(Document(FAKE_DOCUMENT_URI, "\n".join(lines)))
+    assert tokenizer.last_retokenized < 5
@@ -0,0 +1,47 @@
+import random
+
+from mfdls.line_source import LineIndex, iter_lines, line_starts, map_file
+
+BREAKS = ["\n", "\r\n", "\r", "\x0b", "\x1c", "\x85", "\u2028", "\n\n", ""]
+
+
+def test_lines_match_splitlines():
+    rng = random.Random(22)
+    for _ in range(500):
+        text = "".join(
+            rng.choice(["@Keyword coral", "é", "  ", ""]) + rng.choice(BREAKS)
+            for _ in range(rng.randint(0, 8))
+        )
+        lines = text.splitlines()
+
+        assert list(iter_lines(text)) == lines
+        assert list(iter_lines(text.encode())) == lines
+        assert list(LineIndex(text)) == lines
+        assert list(LineIndex(text.encode())) == lines
+
+        offsets = [0] + [len(line) for line in text.splitlines(True)]
+        for (line, start) in enumerate(line_starts(text)[: len(lines)]):
+            assert start == sum(offsets[: line + 1])
+
+        for stop in range(len(lines) + 2):
+            assert list(LineIndex(text, stop)) == lines[:stop]
+
+
+def test_index_of_mapped_file(tmp_path):
+    path = tmp_path / "a.mfd"
+    path.write_bytes("@MEDFORD Example\r\n@Keyword coral\n@Keyword récif".encode())
+
+    with map_file(str(path)) as buffer:
+        lines = LineIndex(buffer)
+        assert list(lines) == ["@MEDFORD Example", "@Keyword coral", "@Keyword récif"]
+        assert [lines.line_of(offset) for offset in (0, 17, 18, 33, 40)] == [
+            0,
+            0,
+            1,
+            2,
+            2,
+        ]
+
+    (tmp_path / "empty.mfd").write_bytes(b"")
+    with map_file(str(tmp_path / "empty.mfd")) as buffer:
+        assert not list(iter_lines(buffer))
@@ -0,0 +1,61 @@
+import random
+
+from mfdls.macro_index import macro_at
+from mfdls.span_map import SpanMap, scan_line
+
+SOURCE = [
+    "@MEDFORD Example record",
+    "`@Lab Tufts BCB # a comment",
+    "@Contributor-Association `@Lab and `@{Ship}",
+    "`@Ship R/V Tiny",
+    "@Contributor-Association `@Ship",
+    "`@Lab Somewhere else",
+    "@Keyword `@Lab",
+]
+
+
+def _index(lines):
+    spans = SpanMap()
+    spans.update(lines)
+    return spans.macro_index
+
+
+def test_lookups():
+    index = _index(SOURCE)
+
+    assert index.visible(3) == {"Lab": (2, "Tufts BCB")}
+    assert index.visible(7) == {"Lab": (6, "Somewhere else"), "Ship": (4, "R/V Tiny")}
+
+    # The use before the redefinition refers to the first definition, and a
+    # macro used before it is defined to its definition further down
+    assert index.definition("Lab", 2) == (1, 2, 5)
+    assert index.definition("Lab", 6) == (5, 2, 5)
+    assert index.definition("Ship", 2) == (3, 2, 6)
+    assert index.definition("Nowhere", 2) is None
+
+    assert index.uses("Lab") == [(2, 27, 30), (6, 11, 14)]
+    assert index.definitions("Lab") == [(1, 2, 5), (5, 2, 5)]
+
+    assert macro_at(scan_line(SOURCE[2]), 38) == "Ship"
+    assert macro_at(scan_line(SOURCE[3]), 1) == "Ship"
+    assert macro_at(scan_line(SOURCE[2]), 5) is None
+
+
+def test_updates_match_a_fresh_index():
+    rng = random.Random(23)
+    pool = ["`@Lab Tufts", "`@Ship Tiny", "@Keyword `@Lab `@{Ship}", "", "more"]
+
+    spans = SpanMap()
+    lines = []
+    for version in range(300):
+        start = rng.randrange(len(lines) + 1)
+        end = rng.randrange(start, min(len(lines), start + 3) + 1)
+        lines[start:end] = rng.choices(pool, k=rng.randrange(4))
+        spans.update(list(lines), version)
+
+        fresh = _index(lines)
+        line = rng.randrange(len(lines) + 1)
+        assert spans.macro_index.visible(line) == fresh.visible(line)
+        for name in ("Lab", "Ship"):
+            assert spans.macro_index.uses(name) == fresh.uses(name)
+            assert spans.macro_index.definitions(name) == fresh.definitions(name)
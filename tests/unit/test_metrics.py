@@ -0,0 +1,62 @@
+import asyncio
+import inspect
+
+from mfdls import metrics
+
+
+def setup_function():
+    metrics.reset()
+
+
+def test_percentiles():
+    for ms in range(1, 101):
+        metrics.record("phase/export", ms / 1000)
+
+    summary = metrics.stats()["phase"]["export"]
+
+    assert summary["count"] == 100
+    assert (summary["p50_ms"], summary["p95_ms"], summary["p99_ms"]) == (50, 95, 99)
+    assert summary["max_ms"] == 100
+
+
+def test_window_rolls_over():
+    for _ in range(metrics.WINDOW):
+        metrics.record("handler/hover", 1.0)
+    for _ in range(metrics.WINDOW):
+        metrics.record("handler/hover", 0.001)
+
+    summary = metrics.stats()["handler"]["hover"]
+
+    assert summary["count"] == 2 * metrics.WINDOW
+    assert summary["max_ms"] == 1
+
+
+def test_timed_keeps_signatures():
+    @metrics.timed("handler/sync")
+    def sync(ls, params):
+        return params
+
+    @metrics.timed("handler/async")
+    async def later(ls, params):
+        return params
+
+    assert list(inspect.signature(sync).parameters) == ["ls", "params"]
+    assert asyncio.iscoroutinefunction(later)
+    assert sync(None, 1) == 1
+    assert asyncio.run(later(None, 2)) == 2
+    assert {"sync", "async"} <= set(metrics.stats()["handler"])
+
+
+def test_timed_call_collects_samples():
+    def work():
+        with metrics.timer("phase/models"):
+            return 3
+
+    (result, samples) = metrics.timed_call(work)
+
+    assert result == 3
+    assert [name for (name, _) in samples] == ["phase/models"]
+
+    metrics.reset()
+    metrics.merge(samples)
+    assert metrics.stats()["phase"]["models"]["count"] == 1
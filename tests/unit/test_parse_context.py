@@ -0,0 +1,81 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from MEDFORD.medford_detail import detail
+from pygls.workspace import Document
+
+from mfdls.medford_incremental import IncrementalTokenizer
+from mfdls.medford_syntax import validate_syntax
+from mfdls.medford_validation import ValidationMode, semantic_validation
+from mfdls.parse_context import ParseContext
+
+BLOCKS = [
+    "@Contributor Polina Shpilker\n@Contributor-Association `@Lab",
+    "@Keyword `@Lab",
+    "@Date 2022-06-01\n@Date-Note `@{Ship}",
+    "@Keyword coral\n  and a continuation",
+    "@Funding Someone generous\n@Funding-ID 12345",
+    "@Date last summer\n@Date-Note `@Lab",
+]
+
+
+def _document(seed):
+    """A document whose macros differ from those of the documents around it,
+    and every so often, a syntax error"""
+    rng = random.Random(seed)
+    lines = [
+        "@MEDFORD Stress test",
+        "@MEDFORD-Version 1.0",
+        f"`@Lab Lab number {seed}",
+        f"`@Ship R/V {seed}",
+    ]
+    lines.extend(rng.choice(BLOCKS) for _ in range(20))
+    if seed % 8 == 0:
+        lines.append("@Keyword `@Missing")
+    return "\n".join(lines)
+
+
+def _validate(source):
+    """Validates a document every way the server does, reducing the results to
+    plain data"""
+    doc = Document("file://stress.mfd", source)
+    (details, diagnostics) = validate_syntax(doc)
+    (incremental, _) = IncrementalTokenizer().validate(doc)
+
+    try:
+        (exported, errors) = semantic_validation(details, ValidationMode.OTHER)
+    # The parser has bugs of its own, which should at least be the same bugs
+    # pylint: disable-next=W0703
+    except Exception as err:
+        (exported, errors) = (None, repr(err))
+
+    return (
+        [(d.Line_Number, d.Data) for d in details],
+        [(d.Line_Number, d.Data) for d in incremental],
+        [(d.range.start.line, d.message) for d in diagnostics],
+        repr(exported),
+        errors,
+    )
+
+
+def test_concurrent_validations_match_serial(capsys):
+    sources = [_document(seed) for seed in range(64)]
+    serial = [_validate(source) for source in sources]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for _ in range(3):
+            assert list(pool.map(_validate, sources)) == serial
+
+    # Nothing the parser printed went to stdout, which is the LSP's channel
+    assert capsys.readouterr().out == ""
+
+
+def test_contexts_have_their_own_macros():
+    with ParseContext() as outer:
+        detail.macro_dictionary["Lab"] = (1, "Tufts BCB")
+        with ParseContext({"Ship": (2, "R/V Tiny")}) as inner:
+            assert dict(detail.macro_dictionary) == {"Ship": (2, "R/V Tiny")}
+        assert dict(detail.macro_dictionary) == {"Lab": (1, "Tufts BCB")}
+
+    assert outer.macros == {"Lab": (1, "Tufts BCB")}
+    assert inner.macros == {"Ship": (2, "R/V Tiny")}
@@ -0,0 +1,42 @@
+import asyncio
+import pstats
+
+from mfdls import profiler
+
+
+def teardown_function():
+    profiler.stop()
+
+
+def test_profiles_the_next_requests(tmp_path):
+    @profiler.profiled("textDocument/hover")
+    def hover(line):
+        return sum(range(line))
+
+    profiler.start(requests=2, directory=str(tmp_path))
+    results = [hover(10) for _ in range(3)]
+
+    assert results == [45, 45, 45]
+    profiles = sorted(tmp_path.glob("textDocument_hover-*.pstats"))
+    assert len(profiles) == 2
+    assert pstats.Stats(str(profiles[0])).total_calls > 0
+    assert profiler.status()["active"] is False
+
+
+def test_off_by_default(tmp_path):
+    @profiler.profiled("textDocument/hover")
+    def hover():
+        return None
+
+    hover()
+
+    assert profiler.claim("textDocument/hover") is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_leaves_coroutines_alone():
+    async def validate():
+        return None
+
+    assert profiler.profiled("medford/validateWorkspace")(validate) is validate
+    assert asyncio.iscoroutinefunction(validate)
@@ -0,0 +1,126 @@
+import pytest
+from lsprotocol.types import (
+    Diagnostic,
+    Position,
+    Range,
+    TextDocumentContentChangeEvent_Type2,
+    TextDocumentItem,
+    VersionedTextDocumentIdentifier,
+)
+from mock import Mock
+from pygls.workspace import Workspace
+
+from mfdls import server
+from mfdls.server import MEDFORDLanguageServer
+
+URI = "file:///a.mfd"
+
+# Valid syntax, but not a valid document
+SOURCE = "@MEDFORD Example\n@MEDFORD-Version 2.0\n@Date 01/01/2020\n"
+SEMANTIC = ["Version 2.0 is not a valid version.", "invalid date format"]
+SYNTAX = "Unexpected macro 'Missing' on line 4."
+
+
+def _diagnostic(message):
+    return Diagnostic(
+        range=Range(
+            start=Position(line=0, character=0), end=Position(line=0, character=8)
+        ),
+        message=message,
+    )
+
+
+def test_identical_diagnostics_are_not_published_again():
+    ls = MEDFORDLanguageServer()
+    ls.lsp.notify = Mock()
+
+    ls.publish_diagnostics("file://a.mfd", [_diagnostic("Missing @Date")], 1)
+    ls.publish_diagnostics("file://a.mfd", [_diagnostic("Missing @Date")], 2)
+    ls.publish_diagnostics("file://b.mfd", [_diagnostic("Missing @Date")], 1)
+    ls.publish_diagnostics("file://a.mfd", [], 3)
+
+    assert ls.lsp.notify.call_count == 3
+    assert ls.publishes == {"sent": 3, "skipped": 1}
+
+    ls.forget_published("file://a.mfd")
+    ls.publish_diagnostics("file://a.mfd", [], 4)
+    assert ls.lsp.notify.call_count == 4
+
+
+def _server():
+    ls = MEDFORDLanguageServer()
+    ls.lsp.workspace = Workspace("file:///", None)
+    ls.pool.resize(0)
+    ls.publish_diagnostics = Mock()
+    ls.workspace.put_document(
+        TextDocumentItem(uri=URI, language_id="medford", version=1, text=SOURCE)
+    )
+    return ls
+
+
+def _edit(ls, version, text):
+    ls.workspace.update_document(
+        VersionedTextDocumentIdentifier(uri=URI, version=version),
+        TextDocumentContentChangeEvent_Type2(text=text),
+    )
+    server._generate_syntactic_diagnostics(ls, URI, version)
+
+
+def _published(ls):
+    """The version and messages of everything published since the last call"""
+    published = [
+        (version, [diag.message for diag in diagnostics])
+        for (_, diagnostics, version) in (
+            call.args for call in ls.publish_diagnostics.call_args_list
+        )
+    ]
+    ls.publish_diagnostics.reset_mock()
+    return published
+
+
+@pytest.mark.asyncio
+async def test_syntax_is_published_before_semantics():
+    ls = _server()
+    await ls.scheduler.schedule(URI, 1, delay=0)
+
+    # The syntax phase found nothing, so only the merged result is published
+    [(version, messages)] = _published(ls)
+    assert version == 1
+    assert all(any(m.startswith(s) for m in messages) for s in SEMANTIC)
+    state = ls.documents.get(URI)
+    assert (
+        state.diagnostics
+        == state.syntax_diagnostics + state.semantic[ls.validation_modes[0]]
+    )
+
+    # Syntax errors are published straight away
+    _edit(ls, 2, SOURCE + "@Keyword `@Missing\n")
+    assert _published(ls) == [(2, [SYNTAX])]
+
+    # Clearing them publishes the empty list...
+    _edit(ls, 3, SOURCE)
+    assert _published(ls) == [(3, [])]
+
+    # ...but otherwise it is held back, leaving the semantic Diagnostics alone
+    _edit(ls, 4, SOURCE + "@Keyword coral\n")
+    assert _published(ls) == []
+
+
+@pytest.mark.asyncio
+async def test_semantics_of_an_old_version_are_dropped():
+    ls = _server()
+    validate_modes = ls.pool.validate_modes
+
+    async def edited_meanwhile(details, modes):
+        result = await validate_modes(details, modes)
+        _edit(ls, 2, SOURCE + "@Keyword coral\n")
+        ls.scheduler.schedule(URI, 2, delay=60)
+        return result
+
+    ls.pool.validate_modes = edited_meanwhile
+    ls.scheduler.schedule(URI, 1, delay=60)
+    await server._generate_semantic_diagnostics(ls, URI, 1)
+    ls.scheduler.close(URI)
+
+    assert _published(ls) == []
+    assert ls.documents.get(URI).modes is None
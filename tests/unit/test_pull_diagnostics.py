@@ -0,0 +1,132 @@
+import pytest
+from lsprotocol.types import (
+    DocumentDiagnosticParams,
+    PreviousResultId,
+    RelatedFullDocumentDiagnosticReport,
+    RelatedUnchangedDocumentDiagnosticReport,
+    TextDocumentContentChangeEvent_Type2,
+    TextDocumentIdentifier,
+    TextDocumentItem,
+    VersionedTextDocumentIdentifier,
+    WorkspaceDiagnosticParams,
+    WorkspaceFullDocumentDiagnosticReport,
+    WorkspaceUnchangedDocumentDiagnosticReport,
+)
+from pygls.uris import from_fs_path
+from pygls.workspace import Workspace
+
+from mfdls import server
+from mfdls.server import MEDFORDLanguageServer
+
+SOURCE = "@MEDFORD Example\n@MEDFORD-Version 2.0\n@Date 01/01/2020\n"
+
+
+def _server(root):
+    ls = MEDFORDLanguageServer()
+    ls.lsp.workspace = Workspace(from_fs_path(str(root)), None)
+    ls.pull_diagnostics = True
+    ls.pool.resize(0)
+    ls.workspace_workers = 0
+    return ls
+
+
+def _open(ls, uri, text):
+    ls.workspace.put_document(
+        TextDocumentItem(uri=uri, language_id="medford", version=1, text=text)
+    )
+
+
+async def _pull_document(ls, uri, previous=None):
+    return await server.document_diagnostic(
+        ls,
+        DocumentDiagnosticParams(
+            text_document=TextDocumentIdentifier(uri=uri),
+            previous_result_id=previous,
+        ),
+    )
+
+
+async def _pull_workspace(ls, previous):
+    report = await server.workspace_diagnostic(
+        ls,
+        WorkspaceDiagnosticParams(
+            previous_result_ids=[
+                PreviousResultId(uri=uri, value=value)
+                for (uri, value) in previous.items()
+            ]
+        ),
+    )
+    return {item.uri: item for item in report.items}
+
+
+@pytest.mark.asyncio
+async def test_document_pull_is_unchanged_until_an_edit(tmp_path):
+    ls = _server(tmp_path)
+    uri = from_fs_path(str(tmp_path / "open.mfd"))
+    _open(ls, uri, SOURCE)
+
+    first = await _pull_document(ls, uri)
+    assert isinstance(first, RelatedFullDocumentDiagnosticReport)
+    assert first.result_id is not None
+    assert first.items
+
+    again = await _pull_document(ls, uri, first.result_id)
+    assert isinstance(again, RelatedUnchangedDocumentDiagnosticReport)
+    assert again.result_id == first.result_id
+
+    ls.workspace.update_document(
+        VersionedTextDocumentIdentifier(uri=uri, version=2),
+        TextDocumentContentChangeEvent_Type2(text=SOURCE + "@Keyword `@Missing\n"),
+    )
+    edited = await _pull_document(ls, uri, first.result_id)
+    assert isinstance(edited, RelatedFullDocumentDiagnosticReport)
+    assert edited.result_id not in (None, first.result_id)
+    assert any("Missing" in diag.message for diag in edited.items)
+
+
+@pytest.mark.asyncio
+async def test_workspace_pull_reuses_closed_files(tmp_path, monkeypatch):
+    validated = []
+
+    def validate_files(paths, modes):
+        validated.extend(paths)
+        return server_validate_files(paths, modes)
+
+    server_validate_files = server.validate_files
+    monkeypatch.setattr(server, "validate_files", validate_files)
+
+    (first_path, second_path) = (tmp_path / "a.mfd", tmp_path / "b.mfd")
+    first_path.write_text(SOURCE)
+    second_path.write_text(SOURCE)
+    (first, second) = (from_fs_path(str(first_path)), from_fs_path(str(second_path)))
+
+    ls = _server(tmp_path)
+    opened = from_fs_path(str(tmp_path / "open.mfd"))
+    _open(ls, opened, SOURCE)
+
+    reports = await _pull_workspace(ls, {})
+    assert set(reports) == {first, second, opened}
+    assert all(
+        isinstance(report, WorkspaceFullDocumentDiagnosticReport)
+        for report in reports.values()
+    )
+    assert sorted(validated) == [str(first_path), str(second_path)]
+    assert set(ls.file_diagnostics) == {first, second}
+
+    # Nothing changed, so nothing is validated again
+    previous = {uri: report.result_id for (uri, report) in reports.items()}
+    validated.clear()
+    reports = await _pull_workspace(ls, previous)
+    assert all(
+        isinstance(report, WorkspaceUnchangedDocumentDiagnosticReport)
+        for report in reports.values()
+    )
+    assert validated == []
+
+    # Only the closed file that changed is
+    second_path.write_text(SOURCE + "@Keyword `@Missing\n")
+    reports = await _pull_workspace(ls, previous)
+    assert isinstance(reports[first], WorkspaceUnchangedDocumentDiagnosticReport)
+    assert isinstance(reports[second], WorkspaceFullDocumentDiagnosticReport)
+    assert reports[second].result_id != previous[second]
+    assert validated == [str(second_path)]
@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+from mfdls.scheduler import ValidationScheduler
+
+
+@pytest.mark.asyncio
+async def test_burst_is_coalesced():
+    validated = []
+
+    async def validate(uri, version):
+        validated.append((uri, version))
+
+    scheduler = ValidationScheduler(validate, debounce=0.05)
+    for version in range(20):
+        scheduler.schedule("file://a.mfd", version)
+        await asyncio.sleep(0.001)
+
+    await asyncio.sleep(0.1)
+
+    assert validated == [("file://a.mfd", 19)]
+
+
+@pytest.mark.asyncio
+async def test_superseded_versions_are_not_latest():
+    async def validate(uri, version):
+        pass
+
+    scheduler = ValidationScheduler(validate, debounce=0)
+    await scheduler.schedule("file://a.mfd", 1)
+    scheduler.schedule("file://a.mfd", 2)
+
+    assert not scheduler.is_latest("file://a.mfd", 1)
+    assert scheduler.is_latest("file://a.mfd", 2)
+
+    scheduler.close("file://a.mfd")
+    assert not scheduler.is_latest("file://a.mfd", 2)
@@ -0,0 +1,65 @@
+import random
+
+from lsprotocol.types import SemanticTokens
+
+from mfdls.semantic_tokens import SemanticTokenCache, encode_line
+from mfdls.span_map import SpanMap, scan_line
+
+_LINES = [
+    "@MEDFORD-Version 1.0",
+    "`@Lab Tufts BCB",
+    "@Contributor [..] of `@Lab",
+    "@Contributor-Association `@{Lab}",
+    "    continued [..]",
+    "# a comment",
+    "",
+]
+
+
+def test_encode_line():
+    assert encode_line(scan_line("  @Contributor-Association `@Lab [..]")) == (
+        (0, 2, 12, 0, 0) + (0, 12, 12, 1, 0) + (0, 15, 3, 2, 0) + (0, 4, 4, 4, 0)
+    )
+    assert encode_line(scan_line("`@Lab Tufts")) == (0, 0, 5, 2, 1)
+    assert encode_line(scan_line("")) == ()
+
+
+def test_deltas_match_full_encoding():
+    rng = random.Random(0)
+    lines = [rng.choice(_LINES) for _ in range(50)]
+    spans = SpanMap()
+    spans.update(list(lines))
+    cache = SemanticTokenCache()
+    full = cache.full(spans)
+    data = list(full.data)
+    result_id = full.result_id
+
+    for _ in range(200):
+        # A few edits between requests, each replacing, adding or removing lines
+        for _ in range(rng.randint(1, 3)):
+            start = rng.randrange(len(lines) + 1)
+            end = min(len(lines), start + rng.randint(0, 3))
+            lines[start:end] = [rng.choice(_LINES) for _ in range(rng.randint(0, 3))]
+            spans.update(list(lines))
+
+        delta = cache.delta(spans, result_id)
+        for edit in delta.edits:
+            data[edit.start : edit.start + edit.delete_count] = edit.data
+        result_id = delta.result_id
+
+        expected = SemanticTokenCache().full(_fresh(lines))
+        assert data == expected.data
+
+
+def test_stale_result_gets_full_encoding():
+    spans = _fresh(_LINES)
+    cache = SemanticTokenCache()
+    cache.full(spans)
+
+    assert isinstance(cache.delta(spans, "stale"), SemanticTokens)
+
+
+def _fresh(lines):
+    spans = SpanMap()
+    spans.update(list(lines))
+    return spans
@@ -0,0 +1,62 @@
+import random
+
+from lsprotocol.types import HoverParams, Position, TextDocumentIdentifier
+from mock import Mock
+from pygls.workspace import Document
+
+from mfdls.document_state import DocumentStore
+from mfdls.server import _generate_hover
+from mfdls.span_map import LineKind, MacroReference, SpanMap, scan_line
+from mfdls.token_index import TokenIndex
+
+
+def test_scan_line():
+    token = scan_line("  @Contributor-Association `@Lab and `@{Ship}s # a comment\n")
+    assert token.kind == LineKind.TOKEN
+    assert (token.start, token.major_end, token.token_end) == (2, 14, 26)
+    assert (token.major, token.minor, token.value_start) == (
+        "Contributor",
+        "Association",
+        27,
+    )
+    assert token.macros == (
+        MacroReference("Lab", 29, 32),
+        MacroReference("Ship", 40, 44),
+    )
+
+    macro = scan_line("`@Lab Tufts BCB")
+    assert (macro.kind, macro.macro, macro.token_end) == (LineKind.MACRO, "Lab", 5)
+
+    assert scan_line("# @Contributor").kind == LineKind.COMMENT
+    assert scan_line("   \n").kind == LineKind.BLANK
+    assert scan_line("more of the value").kind == LineKind.CONTINUATION
+
+
+def test_updates_match_a_fresh_scan():
+    rng = random.Random(10)
+    pool = ["@Contributor Liam", "`@Lab Tufts", "@Keyword `@Lab", "", "# note", "more"]
+
+    spans = SpanMap()
+    lines = []
+    for version in range(300):
+        start = rng.randrange(len(lines) + 1)
+        end = rng.randrange(start, min(len(lines), start + 3) + 1)
+        lines[start:end] = rng.choices(pool, k=rng.randrange(4))
+
+        spans.update(list(lines), version)
+        assert [spans[i] for i in range(len(lines))] == [scan_line(l) for l in lines]
+
+
+def test_hover_on_duplicated_line():
+    doc = Document(
+        "file:///a.mfd", "@MEDFORD x\n@Contributor Liam\n@Contributor Liam\n"
+    )
+    ls = Mock()
+    ls.workspace.get_document.return_value = doc
+    ls.documents = DocumentStore()
+    ls.tokens = TokenIndex({"Contributor": ["Email"]})
+
+    hover = _generate_hover(
+        ls, HoverParams(TextDocumentIdentifier(doc.uri), Position(2, 3))
+    )
+    assert hover.range.start.line == 2
@@ -0,0 +1,77 @@
+import os
+
+from mfdls.symbol_index import SymbolIndex
+from mfdls.symbols import Symbol, document_symbols, outline
+
+SOURCE = [
+    "@MEDFORD Example record",
+    "@MEDFORD-Version 2.0",
+    "`@Lab Tufts BCB",
+    "",
+    "@Contributor Jane Doe",
+    "@Contributor-Email jane@example.org",
+    "  continued",
+    "# a comment",
+    "@Contributor",
+]
+
+
+def test_outline():
+    assert outline(SOURCE) == [
+        Symbol("Example record", "MEDFORD", 0, 0, 23, 1),
+        Symbol("Lab", "", 2, 0, 15, 2),
+        Symbol("Jane Doe", "Contributor", 4, 0, 21, 6),
+        Symbol("", "Contributor", 8, 0, 12, 8),
+    ]
+
+    symbols = document_symbols(SOURCE)
+    assert [symbol.name for symbol in symbols] == [
+        "Example record",
+        "Lab",
+        "Jane Doe",
+        "@Contributor",
+    ]
+    assert [(child.name, child.detail) for child in symbols[2].children] == [
+        ("Email", "jane@example.org")
+    ]
+    assert symbols[2].range.end.line == 7
+
+
+def test_index(tmp_path):
+    first = tmp_path / "first.mfd"
+    second = tmp_path / "second.mfd"
+    first.write_text("@Contributor Jane Doe\n@Paper Janelle's paper\n")
+    second.write_text("@Contributor John Smith\n")
+    paths = [str(first), str(second)]
+
+    index = SymbolIndex(tmp_path / "index.json")
+    assert index.refresh(paths) == 2
+    index.save()
+
+    def names(query, overrides=None):
+        return [symbol.name for (_, symbol) in index.search(query, overrides)]
+
+    # Prefixes first, then the names with the query's letters in order
+    assert names("jane") == ["Jane Doe", "Janelle's paper"]
+    assert names("jdoe") == ["Jane Doe"]
+    assert names("JSm") == ["John Smith"]
+    assert names("xyz") == []
+
+    # Open documents stand in for their files
+    assert names("j", {str(second): [Symbol("Jim", "Contributor", 0, 0, 16, 0)]}) == [
+        "Jim",
+        "Jane Doe",
+        "Janelle's paper",
+    ]
+
+    # Only the files that changed are outlined again
+    index = SymbolIndex.load(tmp_path / "index.json")
+    assert index.refresh(paths) == 0
+    second.write_text("@Contributor Jean Smith\n")
+    os.utime(second, ns=(0, 0))
+    assert index.refresh(paths) == 1
+    assert names("jean") == ["Jean Smith"]
+
+    second.unlink()
+    assert index.refresh([str(first)]) == 1
+    assert names("s") == ["Janelle's paper"]
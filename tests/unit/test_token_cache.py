@@ -0,0 +1,37 @@
+import json
+
+from mfdls import token_cache
+from mfdls.medford_tokens import get_available_tokens
+
+
+def test_tokens_are_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv(token_cache.CACHE_DIR_VARIABLE, str(tmp_path))
+    path = token_cache.cache_path()
+
+    assert token_cache.load_available_tokens() == get_available_tokens()
+    assert json.loads(path.read_text()) == get_available_tokens()
+
+    # The cached copy is what gets loaded
+    path.write_text(json.dumps({"Lab": ["Name"]}))
+    assert token_cache.load_available_tokens() == {"Lab": ["Name"]}
+
+
+def test_malformed_cache_is_rebuilt(tmp_path, monkeypatch):
+    monkeypatch.setenv(token_cache.CACHE_DIR_VARIABLE, str(tmp_path))
+    path = token_cache.cache_path()
+    path.write_text('{"Lab": "Name"')
+
+    assert token_cache.load_available_tokens() == get_available_tokens()
+    assert json.loads(path.read_text()) == get_available_tokens()
+
+
+def test_cache_files_are_written_whole(tmp_path):
+    path = tmp_path / "nested" / "cache.json"
+    assert token_cache.atomic_write_json(path, {"a": [1]})
+    assert json.loads(path.read_text()) == {"a": [1]}
+    assert list(path.parent.iterdir()) == [path]
+
+    # A file where the directory should be
+    blocker = tmp_path / "blocker"
+    blocker.write_text("")
+    assert not token_cache.atomic_write_json(blocker / "cache.json", {"a": [1]})
@@ -0,0 +1,55 @@
+from lsprotocol.types import Position
+
+from mfdls.completions import generate_token_list
+from mfdls.hover import resolve_hover
+from mfdls.span_map import scan_line
+from mfdls.token_index import TokenIndex
+
+TOKENS = {
+    "Contributor": ["Association", "Email", "ORCID", "Role"],
+    "Code": ["Primary", "Ref"],
+    "Date": ["Note"],
+}
+
+
+def labels(clist):
+    return [item.label for item in clist.items]
+
+
+def test_prefix_completion():
+    index = TokenIndex(TOKENS)
+
+    assert labels(index.complete_major()) == ["Contributor", "Code", "Date"]
+    assert labels(index.complete_major("Co")) == ["Contributor", "Code"]
+    assert labels(index.complete_major("Con")) == ["Contributor"]
+    assert index.complete_major("Cx") is None
+
+    assert labels(index.complete_minor("Contributor", "")) == TOKENS["Contributor"]
+    assert labels(index.complete_minor("Contributor", "O")) == ["ORCID"]
+    assert index.complete_minor("Lab", "") is None
+
+    line = scan_line("@Contributor-E")
+    assert labels(generate_token_list(index, line, 14)) == ["Email"]
+    assert labels(generate_token_list(index, line, 13)) == TOKENS["Contributor"]
+    assert labels(generate_token_list(index, line, 3)) == ["Contributor", "Code"]
+    assert generate_token_list(index, scan_line("@Date 01/01/2020"), 10) is None
+
+
+def test_hover_contents():
+    index = TokenIndex(TOKENS)
+
+    major = resolve_hover(scan_line("@Contributor Liam"), Position(3, 4), index)
+    assert major.contents == [
+        "Major Token: @Contributor",
+        "Associated Minor Tokens: Association, Email, ORCID, Role",
+    ]
+    assert major.range.start.line == 3
+
+    minor = resolve_hover(scan_line("@Code-Ref somewhere"), Position(0, 6), index)
+    assert minor.contents == "Other minor tokens of @Code: Primary, Ref"
+
+    assert resolve_hover(scan_line("@Lab Tufts"), Position(0, 1), index).contents == []
+
+    # Only the token itself has a hover
+    value = resolve_hover(scan_line("@Code-Ref somewhere"), Position(0, 12), index)
+    assert value.contents == []
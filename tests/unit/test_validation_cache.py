@@ -0,0 +1,81 @@
+from lsprotocol.types import (
+    Diagnostic,
+    DiagnosticRelatedInformation,
+    Location,
+    Position,
+    Range,
+)
+
+from mfdls import validation_cache
+from mfdls.compact_details import CompactDetails
+from mfdls.medford_validation import ValidationMode
+from mfdls.validation_cache import CachedValidation, ValidationCache
+
+RANGE = Range(start=Position(line=0, character=0), end=Position(line=0, character=8))
+
+
+def _entry(uri, message="Missing @Date"):
+    duplicate = Diagnostic(
+        range=RANGE,
+        message="Duplicated macro",
+        related_information=[
+            DiagnosticRelatedInformation(
+                location=Location(uri=uri, range=RANGE), message="First defined here"
+            )
+        ],
+    )
+    return CachedValidation(
+        uri,
+        CompactDetails(),
+        {},
+        None,
+        [duplicate],
+        [Diagnostic(range=RANGE, message=message)],
+    )
+
+
+def test_hits_need_the_same_contents_mode_and_parser(monkeypatch):
+    monkeypatch.setattr(validation_cache, "installed_version", lambda _: "1.0")
+    cache = ValidationCache()
+    entry = _entry("file://a.mfd")
+    cache.put("abc", ValidationMode.OTHER, entry)
+
+    assert cache.get("file://a.mfd", "abc", ValidationMode.OTHER) == entry
+    assert cache.get("file://a.mfd", "abc", ValidationMode.BAGIT) is None
+    assert cache.get("file://a.mfd", "def", ValidationMode.OTHER) is None
+
+    monkeypatch.setattr(validation_cache, "installed_version", lambda _: "1.1")
+    assert cache.get("file://a.mfd", "abc", ValidationMode.OTHER) is None
+
+    assert cache.stats() == {"hits": 1, "misses": 3, "entries": 1}
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ValidationCache(max_entries=2)
+    cache.put("a", ValidationMode.OTHER, _entry("file://a.mfd"))
+    cache.put("b", ValidationMode.OTHER, _entry("file://b.mfd"))
+    assert cache.get("file://a.mfd", "a", ValidationMode.OTHER) is not None
+
+    cache.put("c", ValidationMode.OTHER, _entry("file://c.mfd"))
+
+    assert len(cache) == 2
+    assert cache.get("file://b.mfd", "b", ValidationMode.OTHER) is None
+    assert cache.get("file://a.mfd", "a", ValidationMode.OTHER) is not None
+    assert cache.get("file://c.mfd", "c", ValidationMode.OTHER) is not None
+
+
+def test_diagnostics_are_retargeted_to_the_document():
+    cache = ValidationCache()
+    entry = _entry("file://a.mfd")
+    cache.put("abc", ValidationMode.OTHER, entry)
+
+    found = cache.get("file://b.mfd", "abc", ValidationMode.OTHER)
+
+    assert found.uri == "file://b.mfd"
+    (duplicate,) = found.syntax_diagnostics
+    assert duplicate.related_information[0].location.uri == "file://b.mfd"
+    assert found.semantic_diagnostics == entry.semantic_diagnostics
+
+    # The cached entry still points at the document it came from
+    (original,) = entry.syntax_diagnostics
+    assert original.related_information[0].location.uri == "file://a.mfd"
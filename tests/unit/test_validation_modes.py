@@ -0,0 +1,70 @@
+import pytest
+from lsprotocol.types import Diagnostic, Position, Range
+from pygls.workspace import Document
+
+from mfdls.medford_syntax import validate_syntax
+from mfdls.medford_validation import (
+    ValidationMode,
+    merge_mode_diagnostics,
+    parse_modes,
+    semantic_validation,
+    validate_modes,
+)
+
+SOURCE = "@MEDFORD Example\n@MEDFORD-Version 2.0\n@Date 01/01/2020\n"
+
+MODES = (ValidationMode.OTHER, ValidationMode.BCODMO, ValidationMode.BAGIT)
+
+
+def _diagnostic(line, message):
+    return Diagnostic(
+        range=Range(
+            start=Position(line=line, character=0),
+            end=Position(line=line + 1, character=0),
+        ),
+        message=message,
+    )
+
+
+def test_modes_share_one_export():
+    (details, _) = validate_syntax(Document("file://a.mfd", SOURCE))
+    (exported, errors) = validate_modes(details, MODES)
+
+    assert list(errors) == list(MODES)
+    for mode in MODES:
+        assert semantic_validation(details, mode) == (exported, errors[mode])
+
+
+def test_merge_mode_diagnostics():
+    found = {
+        ValidationMode.OTHER: [_diagnostic(1, "invalid"), _diagnostic(2, "missing")],
+        ValidationMode.BAGIT: [
+            _diagnostic(2, "missing"),
+            _diagnostic(2, "missing"),
+        ],
+    }
+
+    # A single mode's Diagnostics are left alone
+    assert (
+        merge_mode_diagnostics(found, (ValidationMode.OTHER,))
+        is found[ValidationMode.OTHER]
+    )
+
+    merged = merge_mode_diagnostics(found, (ValidationMode.OTHER, ValidationMode.BAGIT))
+    assert [(d.range.start.line, d.source) for d in merged] == [
+        (1, "MEDFORD (OTHER)"),
+        (2, "MEDFORD (OTHER, BAGIT)"),
+        (2, "MEDFORD (BAGIT)"),
+    ]
+
+
+def test_parse_modes():
+    assert parse_modes("bagit") == (ValidationMode.BAGIT,)
+    assert parse_modes(["OTHER", "BCODMO", "other"]) == (
+        ValidationMode.OTHER,
+        ValidationMode.BCODMO,
+    )
+    with pytest.raises(ValueError):
+        parse_modes(["DATACITE"])
+    with pytest.raises(ValueError):
+        parse_modes([])
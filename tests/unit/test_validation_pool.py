@@ -0,0 +1,80 @@
+import os
+import threading
+
+import pytest
+
+from mfdls import validation_pool
+from mfdls.validation_pool import ValidationPool
+
+
+def _exit_once(marker):
+    """Kills the worker the first time it is called"""
+    if not os.path.exists(marker):
+        with open(marker, "w", encoding="utf-8"):
+            pass
+        os._exit(1)
+    return os.getpid()
+
+
+@pytest.mark.asyncio
+async def test_no_workers_runs_in_process():
+    pool = ValidationPool(0)
+    assert await pool.run(os.getpid) == os.getpid()
+    assert await pool.run(sorted, [3, 1, 2]) == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_workers_run_in_other_processes():
+    pool = ValidationPool(2)
+    try:
+        pids = {await pool.run(os.getpid) for _ in range(4)}
+        assert os.getpid() not in pids
+        assert await pool.run(sorted, [3, 1, 2]) == [1, 2, 3]
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_dead_worker_restarts_the_pool(tmp_path):
+    pool = ValidationPool(1)
+    try:
+        pid = await pool.run(_exit_once, str(tmp_path / "died"))
+        assert pid != os.getpid()
+        assert (tmp_path / "died").exists()
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_resize():
+    pool = ValidationPool(1)
+    try:
+        pool.resize(2)
+        assert (pool.workers, pool.threads) == (2, False)
+        assert await pool.run(os.getpid) != os.getpid()
+
+        pool.resize(2, True)
+        assert (pool.workers, pool.threads) == (2, True)
+        assert await pool.run(threading.current_thread) != threading.main_thread()
+
+        pool.resize(0)
+        assert await pool.run(threading.current_thread) == threading.main_thread()
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_workers_are_not_forked_while_threads_run():
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait)
+    thread.start()
+
+    pool = ValidationPool(1)
+    try:
+        if "forkserver" in validation_pool.multiprocessing.get_all_start_methods():
+            assert validation_pool._context().get_start_method() == "forkserver"
+        assert await pool.run(os.getpid) != os.getpid()
+    finally:
+        pool.shutdown()
+        stop.set()
+        thread.join()
@@ -0,0 +1,53 @@
+from mfdls.medford_validation import ValidationMode
+from mfdls import workspace
+from mfdls.workspace import batches, find_medford_files, validate_file, validate_files
+
+VALID = "@MEDFORD Example\n@MEDFORD-Version 2.0\n"
+
+
+def test_find_medford_files(tmp_path):
+    (tmp_path / "records" / "deep").mkdir(parents=True)
+    (tmp_path / ".git").mkdir()
+    (tmp_path / "a.mfd").write_text(VALID)
+    (tmp_path / "records" / "deep" / "b.mfd").write_text(VALID)
+    (tmp_path / "records" / "notes.txt").write_text(VALID)
+    (tmp_path / ".git" / "c.mfd").write_text(VALID)
+
+    # Overlapping roots don't produce duplicates
+    found = find_medford_files([str(tmp_path), str(tmp_path / "records")])
+
+    assert found == [
+        str(tmp_path / "a.mfd"),
+        str(tmp_path / "records" / "deep" / "b.mfd"),
+    ]
+
+
+def test_batches_cover_every_file():
+    paths = [str(i) for i in range(1000)]
+
+    for workers in (0, 1, 8, 64):
+        split = list(batches(paths, workers))
+        assert [p for batch in split for p in batch] == paths
+        assert max(len(batch) for batch in split) <= 32
+
+
+def test_validate_file(tmp_path, monkeypatch):
+    path = tmp_path / "a.mfd"
+    path.write_text(VALID + "@Keyword `@Missing\n")
+
+    (uri, diagnostics) = validate_file(str(path), (ValidationMode.OTHER,))
+
+    assert uri == path.as_uri()
+    assert any(d.range.start.line == 2 for d in diagnostics)
+
+    # Large files are read through a memory map, to the same result
+    monkeypatch.setattr(workspace, "MAPPED_FILE_SIZE", 0)
+    assert validate_file(str(path), (ValidationMode.OTHER,)) == (uri, diagnostics)
+
+
+def test_unreadable_files_are_skipped(tmp_path):
+    path = tmp_path / "a.mfd"
+    path.write_bytes(b"@MEDFORD \xff\xfe\n")
+
+    assert validate_file(str(tmp_path / "missing.mfd"), (ValidationMode.OTHER,)) is None
+    assert validate_files([str(path)], (ValidationMode.OTHER,)) == []